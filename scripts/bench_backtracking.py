@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Rule Backtracking Benchmark
+
+Runs every API surface rule, and the regex-driven infra scanners, over a
+corpus of adversarial inputs at doubling sizes and checks that time grows
+about linearly with input size. The corpus is built from each rule's own
+words, so every start position looks like a possible match:
+- openers: the words followed by ( { [ that are never closed
+- minified: one endless line of small closed calls, no newlines
+- whitespace: the words separated by long runs of spaces, tabs and newlines
+- quotes: the words followed by quotes that are never closed
+- keyed: x = word({ word: ... assignments and object keys, never closed
+
+A rule's growth exponent is log(t_max / t_min) / log(size_max / size_min)
+for its worst input; 1.0 is linear and 2.0 quadratic. Rules that finish the
+largest input under --floor seconds pass regardless, since their timings are
+mostly noise. The rule time budget stays on (--budget), so a catastrophic
+pattern is reported as a timeout instead of hanging the run.
+
+Run: python3 aidev/scripts/bench_backtracking.py [--size CHARS] [--steps N] [--max-exponent X]
+     [--rules SUBSTR] [--json PATH]
+Exits with status 1 if any rule scales worse than --max-exponent.
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import scan_api_surface
+import scan_infra
+from scanlib import TIMEOUT_KEY, RuleSet, WorkTree, set_rule_budget
+
+# Infra scanners have no rule table: the file each one reads and the words
+# (or phrases) its patterns look for.
+INFRA_CASES = {
+    "scan_wrangler_config": ("wrangler.toml", ["[[r2_buckets]]\n", "[[kv_namespaces]]\n",
+                                               "[durable_objects]", "binding", "name", "id"]),
+    "scan_sst_config": ("sst.config.ts", ["new sst.Table", "stack", "fields", "new Bucket"]),
+    "scan_terraform": ("main.tf", ['resource "aws_s3_bucket" "', "name"]),
+    "scan_sql_migrations": ("schema.sql", ["CREATE TABLE users", "CREATE TABLE IF NOT EXISTS t",
+                                           "id INTEGER"]),
+}
+
+
+def pattern_words(pattern):
+    """Identifier-like words a pattern looks for, in order, without regex syntax."""
+    text = re.sub(r"\\[A-Za-z]|\[(?:\\.|[^\]])*\]|\(\?[:=!<P]*", " ", pattern)
+    words = []
+    for word in re.findall(r"[A-Za-z_]\w+", text):
+        if word not in words:
+            words.append(word)
+    return words or ["x"]
+
+
+CORPUS = {
+    "openers": lambda words: " ".join(f"{w}({{[" for w in words) + " ",
+    "minified": lambda words: "".join(f"{w}.x({{a:{w}}});" for w in words),
+    "whitespace": lambda words: "".join(f"{w}{' ' * 12}\t\n" for w in words),
+    "quotes": lambda words: " ".join(f"{w} \"{w} '" for w in words) + " ",
+    "keyed": lambda words: " ".join(f"{w} = {w}({{ {w}: " for w in words) + " ",
+}
+
+
+def adversarial(family, words, size):
+    """size characters of one corpus family, built by repeating its unit."""
+    unit = CORPUS[family](words)
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def api_cases(only):
+    """(name, words, run(content)) for every API surface rule."""
+    for suffixes, names, _, rules in scan_api_surface.DETECTORS:
+        rel = f"bench{suffixes[0]}" if suffixes else names[0]
+        for rule in rules:
+            if only and only not in rule.id:
+                continue
+            ruleset = RuleSet([rule])
+
+            def run(content, ruleset=ruleset, rel=rel):
+                found = defaultdict(list)
+                ruleset.run(content, rel, found)
+                return bool(found[TIMEOUT_KEY])
+
+            yield rule.id, list(rule.literals) + pattern_words(rule.regex.pattern), run
+
+
+def infra_cases(only, work_dir):
+    """(name, words, run(content)) for the regex-driven infra scanners."""
+    for name, (fname, words) in INFRA_CASES.items():
+        if only and only not in name:
+            continue
+        scanner = getattr(scan_infra, name)
+
+        def run(content, scanner=scanner, fname=fname):
+            (work_dir / fname).write_text(content)
+            found = scanner(WorkTree(work_dir), fname)
+            return any(f["type"] == "rule_timeout" for f in found)
+
+        yield name, words, run
+
+
+def time_case(run, content, repeat):
+    """Best wall time of repeat runs, and whether any run hit the budget."""
+    best, timed_out = None, False
+    for _ in range(repeat):
+        start = time.perf_counter()
+        timed_out |= run(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, timed_out
+
+
+def measure(words, run, sizes, repeat):
+    """Per-family timings, worst family first."""
+    rows = []
+    for family in CORPUS:
+        times, timed_out = [], False
+        for size in sizes:
+            seconds, hit = time_case(run, adversarial(family, words, size), repeat)
+            times.append(seconds)
+            timed_out |= hit
+            if hit:
+                break
+        exponent = (math.log(max(times[-1], 1e-9) / max(times[0], 1e-9))
+                    / math.log(sizes[-1] / sizes[0])) if len(times) == len(sizes) else None
+        rows.append({"family": family, "times": [round(t, 5) for t in times],
+                     "exponent": round(exponent, 2) if exponent is not None else None,
+                     "timeout": timed_out})
+    return sorted(rows, key=lambda r: (not r["timeout"], -(r["exponent"] or 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check scanner rules scale linearly on adversarial input.")
+    parser.add_argument("--size", type=int, default=16000,
+                        help="Smallest input in characters (default: 16000)")
+    parser.add_argument("--steps", type=int, default=4,
+                        help="Number of doubling sizes (default: 4)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Time each input this many times and keep the best (default: 3)")
+    parser.add_argument("--max-exponent", type=float, default=1.3,
+                        help="Fail rules whose time grows faster than size**X (default: 1.3)")
+    parser.add_argument("--floor", type=float, default=0.01,
+                        help="Rules faster than this on the largest input pass (default: 0.01)")
+    parser.add_argument("--budget", type=float, default=10.0,
+                        help="Rule time budget while benchmarking, in seconds (default: 10)")
+    parser.add_argument("--rules", help="Only rules or scanners whose name contains this")
+    parser.add_argument("--json", type=Path, help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    set_rule_budget(args.budget)
+    sizes = [args.size * 2 ** i for i in range(args.steps)]
+    results = []
+    failed = 0
+    print(f"Sizes: {', '.join(str(s) for s in sizes)} chars\n")
+    print(f"{'rule':32s} {'worst input':12s} {'seconds':>9s} {'exponent':>9s}  verdict")
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = list(api_cases(args.rules)) + list(infra_cases(args.rules, Path(tmp)))
+        for name, words, run in cases:
+            rows = measure(words, run, sizes, args.repeat)
+            worst = rows[0]
+            if worst["timeout"]:
+                verdict = "TIMEOUT"
+            elif worst["times"][-1] < args.floor or worst["exponent"] <= args.max_exponent:
+                verdict = "ok"
+            else:
+                verdict = "SUPERLINEAR"
+            failed += verdict != "ok"
+            exponent = f"{worst['exponent']:.2f}" if worst["exponent"] is not None else "-"
+            print(f"{name:32s} {worst['family']:12s} {worst['times'][-1]:9.4f} {exponent:>9s}  {verdict}")
+            results.append({"rule": name, "verdict": verdict, "inputs": rows})
+
+    print(f"\n{len(results) - failed}/{len(results)} rules scale near-linearly")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"sizes": sizes, "max_exponent": args.max_exponent, "results": results},
+                      f, indent=2)
+        print(f"Written to {args.json}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Scanner Benchmark
+
+Times scan_api_surface, scan_infra, scan_products and scan_imports over synthetic orgs
+built by synth_org.py, at increasing org sizes, and reports throughput as
+files/sec and MB/sec over everything in the org (node_modules and vendor
+included), so numbers stay comparable as scanners learn to skip more.
+
+The largest org is generated once under --work-dir and smaller sizes scan
+a prefix of it. Only the scan phase is timed, with the findings cache off;
+report building and JSON writing are not included.
+
+Run: python3 aidev/scripts/bench_scanners.py [--sizes 10,100,1000] [--jobs N] [--repeat R]
+     [--scale X] [--source git] [--json PATH]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from functools import partial
+from pathlib import Path
+
+import scan_api_surface
+import scan_imports
+import scan_infra
+import scan_products
+from scanlib import add_jobs_argument, scan_repos
+from synth_org import generate_org
+
+AIDEV_DIR = Path(__file__).resolve().parent.parent
+WORK_DIR = AIDEV_DIR / ".bench"
+
+SCANNERS = {
+    "api_surface": scan_api_surface.scan_repo,
+    "infra": scan_infra.scan_repo,
+    "products": scan_products.scan_repo,
+    "imports": scan_imports.scan_repo,
+}
+
+
+def org_size(paths):
+    """(files, bytes) under the given repos, excluding .git."""
+    files = size = 0
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if d != ".git"]
+            for fname in filenames:
+                files += 1
+                size += os.path.getsize(os.path.join(dirpath, fname))
+    return files, size
+
+
+def time_scan(scan_fn, repos, jobs, repeat):
+    """Best wall time of repeat full scans, with progress output swallowed."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scan_repos(scan_fn, repos, jobs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scanners on synthetic orgs.")
+    parser.add_argument("--sizes", default="10,100,1000",
+                        help="Comma-separated org sizes in repos (default: 10,100,1000)")
+    add_jobs_argument(parser)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Scan each size this many times and keep the best (default: 1)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Files-per-repo multiplier passed to the generator (default: 1.0)")
+    parser.add_argument("--seed", default="0", help="Generator seed (default: 0)")
+    parser.add_argument("--source", choices=("worktree", "git"), default="worktree",
+                        help="Scan checkouts or committed git objects (default: worktree)")
+    parser.add_argument("--scanners", default=",".join(SCANNERS),
+                        help=f"Comma-separated subset of {', '.join(SCANNERS)}")
+    parser.add_argument("--work-dir", type=Path, default=WORK_DIR,
+                        help=f"Where generated orgs are kept between runs (default: {WORK_DIR})")
+    parser.add_argument("--json", type=Path, help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    scanners = [s.strip() for s in args.scanners.split(",")]
+    git = args.source == "git"
+    org_dir = args.work_dir / f"org-{args.seed}-x{args.scale:g}{'-git' if git else ''}"
+
+    print(f"Generating {sizes[-1]} repos in {org_dir} (existing repos are reused)...")
+    start = time.perf_counter()
+    paths = generate_org(org_dir, sizes[-1], args.seed, args.scale, git)
+    print(f"   done in {time.perf_counter() - start:.1f}s")
+
+    ref = "HEAD" if git else None
+    results = []
+    print(f"\n{'repos':>6s}  {'scanner':12s} {'files':>9s} {'MB':>9s} {'seconds':>9s} "
+          f"{'files/s':>10s} {'MB/s':>8s}")
+    for size in sizes:
+        repos = [(p.name, p) for p in paths[:size]]
+        files, nbytes = org_size(paths[:size])
+        mb = nbytes / 1024 / 1024
+        for name in scanners:
+            seconds = time_scan(partial(SCANNERS[name], ref=ref), repos, args.jobs, args.repeat)
+            row = {"repos": size, "scanner": name, "files": files, "bytes": nbytes,
+                   "seconds": round(seconds, 4), "files_per_sec": round(files / seconds, 1),
+                   "mb_per_sec": round(mb / seconds, 2)}
+            results.append(row)
+            print(f"{size:6d}  {name:12s} {files:9d} {mb:9.1f} {seconds:9.2f} "
+                  f"{row['files_per_sec']:10.0f} {row['mb_per_sec']:8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"jobs": args.jobs, "source": args.source, "scale": args.scale,
+                       "seed": args.seed, "results": results}, f, indent=2)
+        print(f"\nWritten to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
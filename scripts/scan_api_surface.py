@@ -9,23 +9,38 @@ Discovers from source code:
 
 Produces a service interaction graph and per-service API surface map.
 
-Run: python3 aidev/scripts/scan_api_surface.py
+Run: python3 aidev/scripts/scan_api_surface.py [--jobs N] [--no-cache] [--stream [PATH]] [--resume]
+     [--source git [--ref REF]] [--since REF] [--profile] [--rule-budget SECONDS]
 From: project root (parent of aidev/)
 """
 
+import argparse
 import os
-import sys
+import posixpath
 import json
 import re
 import yaml
+from functools import partial
 from pathlib import Path
 from collections import defaultdict
 
+import scanlib
+from scanlib import (PROFILER, SCAN_STATS, TIMEOUT_KEY, WRANGLER_NAMES, FindingsCache, Rule,
+                     RuleSet, RuleTimeout, StreamMismatch, WranglerConfig, add_budget_argument,
+                     add_cache_arguments, add_jobs_argument, add_profile_argument,
+                     add_since_argument, add_source_arguments, add_stream_arguments,
+                     buffer_chunks, cached_scan, changed_paths, classify, decode_chunks,
+                     file_digest, load_per_repo, module_stem, open_tree, report_stats,
+                     rule_budget, scan_repos, set_rule_budget, skip_file, source_ref,
+                     stream_mode, stream_path, subpath_exports, timeout_record, walk_order,
+                     write_profile)
+
 # aidev/scripts/ -> aidev/ -> project root
 AIDEV_DIR = Path(__file__).resolve().parent.parent
 PROJECT_ROOT = AIDEV_DIR.parent
 REPOS_DIR = PROJECT_ROOT  # repos are siblings of aidev/
 OUTPUT_DIR = AIDEV_DIR / "data"
+CACHE_DIR = AIDEV_DIR / ".scan-cache"
 
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -39,655 +54,548 @@ SKIP_FILE_PATTERNS = {"test.", ".test.", ".spec.", "__test__", "__mock__"}
 DROP_REPOS = {"resteep", "stubble", "dashboard-demo-clone"}
 
 
-def read_file_safe(path, max_bytes=200000):
-    try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read(max_bytes)
-    except:
-        return ""
+# Files up to this many bytes are scanned whole; larger ones are streamed
+# through the rules in windows of this many characters.
+READ_LIMIT = 200000
 
 
-def should_skip(fpath):
-    return any(s in fpath.parts for s in SKIP_DIRS)
+def read_bytes_safe(tree, rel, max_bytes=READ_LIMIT + 1):
+    return tree.read_bytes(rel, max_bytes)
 
 
-def is_test_file(fpath):
-    name = fpath.name.lower()
+def is_test_file(fname):
+    name = fname.lower()
     return any(p in name for p in SKIP_FILE_PATTERNS)
 
 
 # ═══════════════════════════════════════════════════════════════
-#  SECTION 1: HTTP ROUTE SCANNERS
+#  SECTION 1: HTTP ROUTE RULES
 # ═══════════════════════════════════════════════════════════════
 
-def scan_js_routes(repo_path):
-    """Extract HTTP routes from JS/TS files: itty-router, Express, CF Workers, Lambda."""
-    routes = []
-    entry_points = []
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs", ".mts"):
-            continue
-
-        content = read_file_safe(str(fpath))
-        if not content:
-            continue
-        rel = str(fpath.relative_to(repo_path))
-
-        # ── itty-router / Express routes ──
-        for m in re.finditer(
-            r'(?:router|app)\s*\.\s*(get|post|put|delete|patch|all|options)\s*\(\s*[\'"]([^\'"]+)[\'"]',
-            content, re.IGNORECASE
-        ):
-            method = m.group(1).upper()
-            path = m.group(2)
-            routes.append({
-                "method": method,
-                "path": path,
-                "framework": "router",
-                "file": rel,
-            })
-
-        # ── CF Worker export default { fetch } ──
-        if re.search(r'export\s+default\s*\{', content):
-            if re.search(r'async\s+fetch\s*\(', content):
-                entry_points.append({
-                    "type": "cloudflare_worker",
-                    "file": rel,
-                })
-                # Extract inline method/path routing
-                for m in re.finditer(
-                    r"(?:request\.method|method)\s*===?\s*['\"](\w+)['\"]",
-                    content
-                ):
-                    method = m.group(1).upper()
-                    # Try to find associated path
-                    routes.append({
-                        "method": method,
-                        "path": "/",
-                        "framework": "cf_worker_inline",
-                        "file": rel,
-                        "note": "inline method check",
-                    })
-
-            # CF Queue consumer
-            if re.search(r'async\s+queue\s*\(', content):
-                entry_points.append({
-                    "type": "cloudflare_queue_consumer",
-                    "file": rel,
-                })
-
-        # ── SST Api routes ──
-        for m in re.finditer(
-            r"['\"](\w+)\s+(/[^'\"]*)['\"]",
-            content
-        ):
-            candidate_method = m.group(1).upper()
-            candidate_path = m.group(2)
-            if candidate_method in ("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"):
-                # Verify it's in a routes block
-                start = max(0, m.start() - 200)
-                context_before = content[start:m.start()]
-                if "routes" in context_before or "Api(" in context_before:
-                    routes.append({
-                        "method": candidate_method,
-                        "path": candidate_path,
-                        "framework": "sst_api",
-                        "file": rel,
-                    })
-
-        # ── Lambda handler ──
-        if re.search(r'export\s+(?:const|function)\s+(?:_?handler|main)\s*=?\s*', content):
-            if re.search(r'event\s*(?:\.\s*requestContext|\.rawPath|\.\s*httpMethod)', content):
-                entry_points.append({
-                    "type": "lambda_handler",
-                    "file": rel,
-                })
-                # Extract path-based routing
-                for m in re.finditer(
-                    r"(?:rawPath|pathname)\s*(?:===?\s*|\.startsWith\s*\(\s*)['\"]([^'\"]+)['\"]",
-                    content
-                ):
-                    routes.append({
-                        "method": "ANY",
-                        "path": m.group(1),
-                        "framework": "lambda",
-                        "file": rel,
-                    })
-
-        # ── Middleware composition (Freeway-style) ──
-        if re.search(r'composeMiddleware\s*\(', content):
-            middlewares = re.findall(r'with(\w+)', content)
-            entry_points.append({
-                "type": "middleware_composition",
-                "file": rel,
-                "middlewares": middlewares[:20],
-            })
-
-        # ── UCANTO server as HTTP endpoint ──
-        if re.search(r'Server\.create\s*\(', content):
-            entry_points.append({
-                "type": "ucanto_server",
-                "file": rel,
-            })
-
-    return routes, entry_points
-
-
-def scan_go_routes(repo_path):
-    """Extract HTTP routes from Go files."""
-    routes = []
-    entry_points = []
-
-    for fpath in Path(repo_path).rglob("*.go"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-
-        content = read_file_safe(str(fpath))
-        if not content:
-            continue
-        rel = str(fpath.relative_to(repo_path))
-
-        # ── http.NewServeMux + mux.HandleFunc ──
-        if "http.NewServeMux" in content or "http.ServeMux" in content:
-            entry_points.append({
-                "type": "go_http_server",
-                "file": rel,
-            })
-
-        # Pattern: mux.HandleFunc("METHOD /path", handler)
-        # Or: maybeInstrumentAndAdd(mux, "METHOD /path", handler, ...)
-        for m in re.finditer(
-            r'(?:mux\.HandleFunc|mux\.Handle|HandleFunc|maybeInstrumentAndAdd)\s*\(\s*(?:\w+\s*,\s*)?["\'](\w+)\s+(/[^"\']*)["\']',
-            content
-        ):
-            routes.append({
-                "method": m.group(1).upper(),
-                "path": m.group(2),
-                "framework": "go_http",
-                "file": rel,
-            })
-
-        # Pattern: "GET /path" as first arg (Go 1.22+ style)
-        for m in re.finditer(
-            r'["\'](\w+)\s+(/[^"\']+)["\']',
-            content
-        ):
-            candidate = m.group(1).upper()
-            if candidate in ("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"):
-                context_start = max(0, m.start() - 100)
-                if "mux" in content[context_start:m.start()] or "Handle" in content[context_start:m.start()]:
-                    routes.append({
-                        "method": candidate,
-                        "path": m.group(2),
-                        "framework": "go_http",
-                        "file": rel,
-                    })
-
-        # http.ListenAndServe
-        if re.search(r'http\.ListenAndServe|srv\.ListenAndServe|ListenAndServe\(', content):
-            entry_points.append({
-                "type": "go_http_listener",
-                "file": rel,
-            })
-
-    return routes, entry_points
-
-
-def scan_wrangler_routes(repo_path):
-    """Extract route info from wrangler.toml (custom domains, route patterns)."""
-    routes_info = []
-
-    for wf in Path(repo_path).rglob("wrangler.toml"):
-        if should_skip(wf):
-            continue
-        content = read_file_safe(str(wf))
-        rel = str(wf.relative_to(repo_path))
-
-        # Worker name
-        name_match = re.search(r'^name\s*=\s*"([^"]+)"', content, re.MULTILINE)
-        worker_name = name_match.group(1) if name_match else None
-
-        # Custom domains
-        for m in re.finditer(r'hostname\s*=\s*"([^"]+)"', content):
-            routes_info.append({
-                "type": "custom_domain",
-                "hostname": m.group(1),
-                "worker": worker_name,
-                "file": rel,
-            })
-
-        # Route patterns
-        for m in re.finditer(r'pattern\s*=\s*"([^"]+)"', content):
-            routes_info.append({
-                "type": "route_pattern",
-                "pattern": m.group(1),
-                "worker": worker_name,
-                "file": rel,
-            })
-
-        # Main entrypoint
-        main_match = re.search(r'^main\s*=\s*"([^"]+)"', content, re.MULTILINE)
-        if main_match:
-            routes_info.append({
-                "type": "worker_entrypoint",
-                "main": main_match.group(1),
-                "worker": worker_name,
-                "file": rel,
-            })
-
-    return routes_info
-
+HTTP_METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS")
+
+CF_EXPORT_DEFAULT = re.compile(r'export\s+default\s*\{')
+CF_ASYNC_FETCH = re.compile(r'async\s+fetch\s*\(')
+LAMBDA_EXPORT = re.compile(r'export\s+(?:const|function)\s+(?:_?handler|main)\s*=?\s*')
+LAMBDA_HTTP_EVENT = re.compile(r'event\s*(?:\.\s*requestContext|\.rawPath|\.\s*httpMethod)')
+MIDDLEWARE_NAME = re.compile(r'with(\w+)')
+
+
+def _route(method, path, framework, ctx, **extra):
+    return {"method": method, "path": path, "framework": framework, "file": ctx.rel, **extra}
+
+
+def _entry(type_, ctx, **extra):
+    return {"type": type_, "file": ctx.rel, **extra}
+
+
+def _sst_api_route(m, ctx):
+    method = m.group(1).upper()
+    if method not in HTTP_METHODS:
+        return None
+    # Verify it's in a routes block
+    context_before = ctx.content[max(0, m.start() - 200):m.start()]
+    if "routes" in context_before or "Api(" in context_before:
+        return _route(method, m.group(2), "sst_api", ctx)
+    return None
+
+
+def _go_mux_route(m, ctx):
+    method = m.group(1).upper()
+    if method not in HTTP_METHODS:
+        return None
+    context_before = ctx.content[max(0, m.start() - 100):m.start()]
+    if "mux" in context_before or "Handle" in context_before:
+        return _route(method, m.group(2), "go_http", ctx)
+    return None
+
+
+# Spans that may run across lines between a call and the key a rule wants
+# ([^}], [^)], . repeats) are capped at 2000 characters, so a minified or
+# generated file full of unclosed brackets costs linear time rather than
+# quadratic. bench_backtracking.py checks every rule against such input.
+
+JS_ROUTE_RULES = [
+    # itty-router / Express routes
+    Rule("router_route", "routes", ("router", "app"),
+         r'(?:router|app)\s*\.\s*(get|post|put|delete|patch|all|options)\s*\(\s*[\'"]([^\'"]+)[\'"]',
+         lambda m, ctx: _route(m.group(1).upper(), m.group(2), "router", ctx),
+         re.IGNORECASE, supersedes=("sst_api_route",)),
+    # CF Worker export default { fetch }
+    Rule("cf_worker", "entry_points", ("fetch",), CF_ASYNC_FETCH.pattern,
+         lambda m, ctx: _entry("cloudflare_worker", ctx) if ctx.search(CF_EXPORT_DEFAULT) else None,
+         once=True),
+    # Inline method checks inside a CF Worker fetch handler
+    Rule("cf_worker_inline", "routes", ("method",),
+         r"(?:request\.method|method)\s*===?\s*['\"](\w+)['\"]",
+         lambda m, ctx: (_route(m.group(1).upper(), "/", "cf_worker_inline", ctx,
+                                note="inline method check")
+                         if ctx.search(CF_EXPORT_DEFAULT) and ctx.search(CF_ASYNC_FETCH) else None)),
+    # CF Queue consumer
+    Rule("cf_queue_consumer", "entry_points", ("queue",), r'async\s+queue\s*\(',
+         lambda m, ctx: _entry("cloudflare_queue_consumer", ctx) if ctx.search(CF_EXPORT_DEFAULT) else None,
+         once=True),
+    # SST Api routes: "GET /path" inside a routes block
+    Rule("sst_api_route", "routes", ("routes", "Api("),
+         r"['\"](\w+)\s+(/[^'\"]*)['\"]", _sst_api_route),
+    # Lambda handler fronting API Gateway
+    Rule("lambda_handler", "entry_points", ("requestContext", "rawPath", "httpMethod"),
+         LAMBDA_EXPORT.pattern,
+         lambda m, ctx: _entry("lambda_handler", ctx) if ctx.search(LAMBDA_HTTP_EVENT) else None,
+         once=True),
+    # Lambda path-based routing
+    Rule("lambda_route", "routes", ("rawPath", "pathname"),
+         r"(?:rawPath|pathname)\s*(?:===?\s*|\.startsWith\s*\(\s*)['\"]([^'\"]+)['\"]",
+         lambda m, ctx: (_route("ANY", m.group(1), "lambda", ctx)
+                         if ctx.search(LAMBDA_EXPORT) and ctx.search(LAMBDA_HTTP_EVENT) else None)),
+    # Middleware composition (Freeway-style)
+    Rule("middleware_composition", "entry_points", ("composeMiddleware",), r'composeMiddleware\s*\(',
+         lambda m, ctx: _entry("middleware_composition", ctx,
+                               middlewares=MIDDLEWARE_NAME.findall(ctx.content)[:20]),
+         once=True),
+    # UCANTO server as HTTP endpoint
+    Rule("ucanto_server", "entry_points", ("Server.create",), r'Server\.create\s*\(',
+         lambda m, ctx: _entry("ucanto_server", ctx), once=True),
+]
+
+GO_ROUTE_RULES = [
+    # http.NewServeMux / http.ServeMux
+    Rule("go_http_server", "entry_points", ("ServeMux",), r'http\.(?:New)?ServeMux',
+         lambda m, ctx: _entry("go_http_server", ctx), once=True),
+    # mux.HandleFunc("METHOD /path", handler)
+    # or maybeInstrumentAndAdd(mux, "METHOD /path", handler, ...)
+    Rule("go_mux_handle", "routes", ("Handle", "maybeInstrumentAndAdd"),
+         r'(?:mux\.HandleFunc|mux\.Handle|HandleFunc|maybeInstrumentAndAdd)\s*\(\s*(?:\w+\s*,\s*)?["\'](\w+)\s+(/[^"\']*)["\']',
+         lambda m, ctx: _route(m.group(1).upper(), m.group(2), "go_http", ctx),
+         supersedes=("go_method_pattern",)),
+    # "GET /path" as first arg (Go 1.22+ style)
+    Rule("go_method_pattern", "routes", ("mux", "Handle"),
+         r'["\'](\w+)\s+(/[^"\']+)["\']', _go_mux_route),
+    # http.ListenAndServe
+    Rule("go_http_listener", "entry_points", ("ListenAndServe",),
+         r'http\.ListenAndServe|srv\.ListenAndServe|ListenAndServe\(',
+         lambda m, ctx: _entry("go_http_listener", ctx), once=True),
+]
 
 # ═══════════════════════════════════════════════════════════════
-#  SECTION 2: UCAN CAPABILITY SCANNERS
+#  SECTION 2: UCAN CAPABILITY RULES
 # ═══════════════════════════════════════════════════════════════
 
-def scan_capability_definitions(repo_path):
-    """Find UCAN capability definitions (capability({ can: '...' }))."""
-    capabilities = []
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs"):
-            continue
-
-        content = read_file_safe(str(fpath))
-        if "capability(" not in content:
-            continue
-        rel = str(fpath.relative_to(repo_path))
-
-        # Pattern: export const name = capability({ can: 'namespace/action', ... })
-        for m in re.finditer(
-            r"(?:export\s+(?:const|let)\s+)?(\w+)\s*=\s*capability\s*\(\s*\{[^}]*?can\s*:\s*['\"]([^'\"]+)['\"]",
-            content, re.DOTALL
-        ):
-            var_name = m.group(1)
-            can = m.group(2)
-
-            # Try to extract `with` schema
-            block_start = m.start()
-            # Find the matching closing of capability({...})
-            block_end = content.find("})", block_start)
-            if block_end == -1:
-                block_end = min(block_start + 500, len(content))
-            block = content[block_start:block_end]
-
-            with_match = re.search(r'with\s*:\s*(\S+)', block)
-            with_schema = with_match.group(1).rstrip(",") if with_match else None
-
-            # Extract nb fields
-            nb_match = re.search(r'nb\s*:\s*Schema\.struct\s*\(\s*\{([^}]+)\}', block, re.DOTALL)
-            nb_fields = []
-            if nb_match:
-                nb_block = nb_match.group(1)
-                for field_m in re.finditer(r'(\w+)\s*:', nb_block):
-                    nb_fields.append(field_m.group(1))
-
-            capabilities.append({
-                "can": can,
-                "export_name": var_name,
-                "with": with_schema,
-                "nb_fields": nb_fields if nb_fields else None,
-                "file": rel,
-            })
-
-    return capabilities
-
-
-def scan_capability_handlers(repo_path):
-    """Find service handlers that implement capabilities."""
-    handlers = []
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs"):
-            continue
-
-        content = read_file_safe(str(fpath))
-        if "Server." not in content and "provide" not in content.lower():
-            continue
-        rel = str(fpath.relative_to(repo_path))
-
-        # Pattern: Server.provide(Capability.name, handler)
-        for m in re.finditer(
-            r'Server\.provide\s*\(\s*(\w+)\.(\w+)\s*,',
-            content
-        ):
-            namespace = m.group(1)
-            action = m.group(2)
-            handlers.append({
-                "pattern": "Server.provide",
-                "capability_ref": f"{namespace}.{action}",
-                "file": rel,
-            })
-
-        # Pattern: Server.provideAdvanced({ capability: Cap.name, handler: ... })
-        for m in re.finditer(
-            r'Server\.provideAdvanced\s*\(\s*\{\s*capability\s*:\s*(\w+)\.(\w+)',
-            content
-        ):
-            namespace = m.group(1)
-            action = m.group(2)
-            handlers.append({
-                "pattern": "Server.provideAdvanced",
-                "capability_ref": f"{namespace}.{action}",
-                "file": rel,
-            })
-
-        # Pattern: createService / createXxxService factory
-        for m in re.finditer(
-            r'(?:export\s+)?(?:const|function)\s+(create\w*Service)\s*(?:=\s*)?(?:\([^)]*\)\s*(?:=>)?\s*(?:\(\s*)?\{|(?:\([^)]*\)\s*\{))',
-            content
-        ):
-            fn_name = m.group(1)
-            # Extract the service object keys
-            block_start = m.end()
-            # Try to find the service object
-            brace_count = 1
-            i = block_start
-            while i < len(content) and brace_count > 0:
-                if content[i] == '{':
-                    brace_count += 1
-                elif content[i] == '}':
-                    brace_count -= 1
-                i += 1
-            block = content[block_start:min(i, block_start + 2000)]
-
-            # Find keys in the returned object
-            service_keys = re.findall(r'^\s+(\w+)\s*:', block, re.MULTILINE)
-            # Filter to likely capability handler keys
-            service_keys = [k for k in service_keys if not k.startswith("_") and k not in
-                           ("id", "codec", "service", "catch", "validateAuthorization",
-                            "errorReporter", "context", "connection", "channel")]
-
-            handlers.append({
-                "pattern": "service_factory",
-                "factory_name": fn_name,
-                "capabilities_served": service_keys[:30],
-                "file": rel,
-            })
-
-    return handlers
-
-
-def scan_go_ucan_handlers(repo_path):
-    """Find Go UCAN/content-claims handlers."""
-    handlers = []
+CAP_KEYWORD = re.compile(r'capability\s*\(')
+CAP_WITH = re.compile(r'with\s*:\s*(\S+)')
+CAP_NB_STRUCT = re.compile(r'nb\s*:\s*Schema\.struct\s*\(\s*\{')
+CAP_NB_FIELD = re.compile(r'(\w+)\s*:')
+SERVICE_KEY = re.compile(r'^\s+(\w+)\s*:', re.MULTILINE)
+NON_HANDLER_KEYS = ("id", "codec", "service", "catch", "validateAuthorization",
+                    "errorReporter", "context", "connection", "channel")
+# Import bindings: import * as Blob from '…', import { add as BlobAdd } from '…',
+# const Blob = require('…') and const { add } = require('…')
+IMPORT_NAMESPACE = re.compile(r"""import\s+\*\s+as\s+(\w+)\s+from\s+['"]([^'"]+)['"]""")
+IMPORT_NAMED = re.compile(r"""import\s+(?:type\s+)?(?:\w+\s*,\s*)?\{([^}]*)\}\s*from\s+['"]([^'"]+)['"]""")
+REQUIRE_BINDING = re.compile(
+    r"""(?:const|let|var)\s+(?:(\w+)|\{([^}]*)\})\s*=\s*require\s*\(\s*['"]([^'"]+)['"]\s*\)""")
+IMPORT_SPECIFIER = re.compile(r'(\w+)(?:\s*(?:as|:)\s*(\w+))?')
+
+
+def _capability_definition(m, ctx):
+    """export const name = capability({ can: 'namespace/action', ... })"""
+    content = ctx.content
+    braces = ctx.braces
+    # The options object of capability({...}), read at top level only so
+    # nested schemas and derives() bodies don't leak into `with`/`nb`
+    paren = CAP_KEYWORD.search(content, m.end(1)).end() - 1
+    paren_end = braces.close_of(paren)
+    obj = braces.next_open(paren + 1, paren_end) if paren_end is not None else None
+    block = braces.shallow(content, obj) if obj is not None else content[m.start():m.end()]
+
+    # Try to extract `with` schema
+    with_match = CAP_WITH.search(block)
+    with_schema = with_match.group(1).rstrip(",") if with_match else None
+
+    # Extract nb fields: top-level keys of nb: Schema.struct({...})
+    nb_fields = []
+    if obj is not None:
+        nb_match = CAP_NB_STRUCT.search(content, obj, braces.close_of(obj))
+        if nb_match:
+            nb_fields = CAP_NB_FIELD.findall(braces.shallow(content, nb_match.end() - 1))
+
+    return {
+        "can": m.group(2),
+        "export_name": m.group(1),
+        "with": with_schema,
+        "nb_fields": nb_fields if nb_fields else None,
+        "file": ctx.rel,
+    }
 
-    for fpath in Path(repo_path).rglob("*.go"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
 
-        content = read_file_safe(str(fpath))
-        rel = str(fpath.relative_to(repo_path))
-
-        # Go handler functions for claims
-        for m in re.finditer(
-            r'func\s+((?:Get|Post|Put|Delete|Handle)\w+Handler)\s*\(',
-            content
-        ):
-            handlers.append({
-                "pattern": "go_handler_func",
-                "handler_name": m.group(1),
-                "file": rel,
-            })
+def _service_factory(m, ctx):
+    """createService / createXxxService factory: record the service object keys."""
+    content = ctx.content
+    # Only ucanto service modules: "Server." or any-case "provide" in the file
+    if "Server." not in content and "provide" not in ctx.found:
+        return None
+    # The regex ends on the opening brace of the factory body / service object
+    block_start = m.end()
+    block_end = ctx.braces.close_of(block_start - 1)
+    if block_end is None:
+        block_end = len(content)
+    block = content[block_start:min(block_end, block_start + 2000)]
+
+    # Find keys in the returned object, filtered to likely capability handler keys
+    service_keys = [k for k in SERVICE_KEY.findall(block)
+                    if not k.startswith("_") and k not in NON_HANDLER_KEYS]
+
+    return {
+        "pattern": "service_factory",
+        "factory_name": m.group(1),
+        "capabilities_served": service_keys[:30],
+        "file": ctx.rel,
+    }
 
-        # ucanto server setup
-        if re.search(r'server\.(?:New|Create|ListenAndServe)', content):
-            handlers.append({
-                "pattern": "go_ucanto_server",
-                "file": rel,
-            })
 
-    return handlers
+def _import_bindings(ctx):
+    """Local name -> (module specifier, imported name or "*") for the file's imports."""
+    bindings = {}
+    for m in IMPORT_NAMESPACE.finditer(ctx.content):
+        bindings[m.group(1)] = (m.group(2), "*")
+    for m in IMPORT_NAMED.finditer(ctx.content):
+        for name, local in IMPORT_SPECIFIER.findall(m.group(1)):
+            bindings[local or name] = (m.group(2), name)
+    for m in REQUIRE_BINDING.finditer(ctx.content):
+        if m.group(1):
+            bindings[m.group(1)] = (m.group(3), "*")
+        else:
+            for name, local in IMPORT_SPECIFIER.findall(m.group(2)):
+                bindings[local or name] = (m.group(3), name)
+    return bindings
+
+
+def _with_import(finding, ctx, ref):
+    """Record where ref's first name is imported from, for resolve_capability_refs()."""
+    binding = ctx.memo(_import_bindings).get(ref.split(".", 1)[0])
+    if binding is not None:
+        finding["import"] = {"from": binding[0], "name": binding[1]}
+    return finding
+
+
+def _provided(pattern):
+    return lambda m, ctx: _with_import({"pattern": pattern,
+                                        "capability_ref": f"{m.group(1)}.{m.group(2)}",
+                                        "file": ctx.rel}, ctx, m.group(1))
+
+
+JS_CAPABILITY_RULES = [
+    Rule("capability_definition", "capabilities", ("capability",),
+         r"(?:export\s+(?:const|let)\s+)?(\w+)\s*=\s*capability\s*\(\s*\{[^}]{0,2000}?can\s*:\s*['\"]([^'\"]+)['\"]",
+         _capability_definition, re.DOTALL),
+    # Server.provide(Capability.name, handler)
+    Rule("server_provide", "capability_handlers", ("Server.provide",),
+         r'Server\.provide\s*\(\s*(\w+)\.(\w+)\s*,', _provided("Server.provide")),
+    # Server.provideAdvanced({ capability: Cap.name, handler: ... })
+    Rule("server_provide_advanced", "capability_handlers", ("Server.provideAdvanced",),
+         r'Server\.provideAdvanced\s*\(\s*\{\s*capability\s*:\s*(\w+)\.(\w+)',
+         _provided("Server.provideAdvanced")),
+    Rule("service_factory", "capability_handlers", ("Server.", "provide"),
+         r'(?:export\s+)?(?:const|function)\s+(create\w*Service)\s*(?:=\s*)?(?:\([^)]{0,2000}\)\s*(?:=>)?\s*(?:\(\s*)?\{|(?:\([^)]{0,2000}\)\s*\{))',
+         _service_factory),
+]
+
+# Go UCAN/content-claims handlers
+GO_HANDLER_RULES = [
+    Rule("go_handler_func", "capability_handlers", ("Handler",),
+         r'func\s+((?:Get|Post|Put|Delete|Handle)\w+Handler)\s*\(',
+         lambda m, ctx: {"pattern": "go_handler_func", "handler_name": m.group(1), "file": ctx.rel}),
+    Rule("go_ucanto_server", "capability_handlers", ("server.",),
+         r'server\.(?:New|Create|ListenAndServe)',
+         lambda m, ctx: {"pattern": "go_ucanto_server", "file": ctx.rel}, once=True),
+]
 
 
 # ═══════════════════════════════════════════════════════════════
-#  SECTION 3: SERVICE-TO-SERVICE CALL SCANNERS
+#  SECTION 3: SERVICE-TO-SERVICE CALL RULES
 # ═══════════════════════════════════════════════════════════════
 
-def scan_ucanto_connections(repo_path):
-    """Find ucanto client connections to other services."""
-    connections = []
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs"):
-            continue
-
-        content = read_file_safe(str(fpath))
-        if "connect" not in content and "invoke" not in content:
-            continue
-        rel = str(fpath.relative_to(repo_path))
-
-        # Pattern: connect({ id: ..., codec: ..., channel: HTTP.open({ url: ... }) })
-        for m in re.finditer(
-            r'connect\s*\(\s*\{[^}]*channel\s*:\s*HTTP\.open\s*\(\s*\{[^}]*url\s*:\s*(?:new\s+URL\s*\(\s*)?([^)},]+)',
-            content, re.DOTALL
-        ):
-            url_expr = m.group(1).strip().strip("'\"")
-            connections.append({
-                "type": "ucanto_connection",
-                "target_url": url_expr,
-                "file": rel,
-            })
-
-        # Pattern: connect({ id, codec, channel }) — simpler form
-        for m in re.finditer(
-            r'(?:Client\.)?connect\s*\(\s*\{[^}]*id\s*:\s*(\w+)',
-            content, re.DOTALL
-        ):
-            target_id = m.group(1)
-            connections.append({
-                "type": "ucanto_connection",
-                "target_id": target_id,
-                "file": rel,
-            })
-
-        # Pattern: Capability.invoke({ issuer, audience, with, nb })
-        for m in re.finditer(
-            r'(\w+(?:\.\w+)*)\s*\.invoke\s*\(\s*\{[^}]*audience\s*:\s*(\w+)',
-            content, re.DOTALL
-        ):
-            capability = m.group(1)
-            audience = m.group(2)
-            connections.append({
-                "type": "ucanto_invocation",
-                "capability": capability,
-                "audience": audience,
-                "file": rel,
-            })
-
-        # Pattern: invocation.execute(connection)
-        for m in re.finditer(
-            r'\.execute\s*\(\s*(\w+)',
-            content
-        ):
-            connections.append({
-                "type": "ucanto_execute",
-                "connection_var": m.group(1),
-                "file": rel,
-            })
-
-    return connections
-
-
-def scan_http_service_calls(repo_path):
-    """Find HTTP fetch calls to other services."""
-    calls = []
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs"):
-            continue
-
-        content = read_file_safe(str(fpath))
-        if "fetch(" not in content:
-            continue
-        rel = str(fpath.relative_to(repo_path))
-
-        # fetch with env var URLs
-        for m in re.finditer(
-            r'fetch\s*\(\s*(?:`\$\{)?(?:env\.)?(\w+(?:_URL|_ENDPOINT|_API)[^`\'")\s,]*)',
-            content
-        ):
-            url_ref = m.group(1).strip("`${}'\"\n ")
-            calls.append({
-                "type": "fetch_env_url",
-                "url_ref": url_ref,
-                "file": rel,
-            })
-
-        # fetch with literal URLs
-        for m in re.finditer(
-            r'fetch\s*\(\s*[\'"](\w+://[^\'"]+)[\'"]',
-            content
-        ):
-            calls.append({
-                "type": "fetch_literal_url",
-                "url": m.group(1),
-                "file": rel,
-            })
-
-        # Service binding fetch: env.SERVICE.fetch(
-        for m in re.finditer(
-            r'env\.(\w+)\.fetch\s*\(',
-            content
-        ):
-            binding = m.group(1)
-            calls.append({
-                "type": "service_binding_call",
-                "binding": binding,
-                "file": rel,
-            })
-
-    return calls
-
-
-def scan_queue_sends(repo_path):
-    """Find queue send operations (async service communication)."""
-    sends = []
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs"):
-            continue
-
-        content = read_file_safe(str(fpath))
-        rel = str(fpath.relative_to(repo_path))
-
-        # env.QUEUE_NAME.send(
-        for m in re.finditer(r'env\.(\w+)\.send\s*\(', content):
-            sends.append({
-                "type": "queue_send",
-                "queue_binding": m.group(1),
-                "file": rel,
-            })
-
-        # SQS send
-        for m in re.finditer(r'(?:sqs|queue).*\.send(?:Message)?\s*\(', content, re.IGNORECASE):
-            sends.append({
-                "type": "sqs_send",
-                "file": rel,
-            })
-
-    return sends
-
-
-def scan_go_service_calls(repo_path):
-    """Find Go HTTP client calls to other services."""
-    calls = []
-
-    for fpath in Path(repo_path).rglob("*.go"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-
-        content = read_file_safe(str(fpath))
-        rel = str(fpath.relative_to(repo_path))
-
-        # http.NewRequest / http.Get / http.Post
-        for m in re.finditer(
-            r'http\.(?:NewRequest|Get|Post|PostForm)\s*\(\s*(?:ctx\s*,\s*)?(?:"(\w+)"\s*,\s*)?([^,)]+)',
-            content
-        ):
-            method = m.group(1) or "GET"
-            url_expr = m.group(2).strip().strip('"')
-            calls.append({
-                "type": "go_http_call",
-                "method": method.upper() if m.group(1) else "?",
-                "url_expr": url_expr[:100],
-                "file": rel,
-            })
-
-        # doRequest pattern (custom HTTP client)
-        for m in re.finditer(
-            r'doRequest\s*\([^,]*,\s*"(\w+)"\s*,\s*"([^"]+)"',
-            content
-        ):
-            calls.append({
-                "type": "go_http_call",
-                "method": m.group(1).upper(),
-                "path": m.group(2),
-                "file": rel,
-            })
-
-    return calls
-
-
-def scan_service_url_env_vars(repo_path):
-    """Extract environment variables that reference other service URLs."""
-    env_urls = []
+def _go_http_call(m, ctx):
+    url_expr = m.group(2).strip().strip('"')
+    return {
+        "type": "go_http_call",
+        "method": m.group(1).upper() if m.group(1) else "?",
+        "url_expr": url_expr[:100],
+        "file": ctx.rel,
+    }
 
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath):
-            continue
-        if fpath.name not in ("wrangler.toml", ".env", ".env.example", ".env.local",
-                              ".dev.vars", ".dev.vars.example"):
-            continue
 
-        content = read_file_safe(str(fpath))
-        rel = str(fpath.relative_to(repo_path))
-
-        # Pattern: VAR_NAME = "https://..."
-        for m in re.finditer(
-            r'^(\w+(?:_URL|_ENDPOINT|_DID|_SERVICE|_API)\w*)\s*=\s*["\']?([^\s"\'#]+)',
-            content, re.MULTILINE
-        ):
-            env_urls.append({
-                "var": m.group(1),
-                "value": m.group(2),
-                "file": rel,
-            })
+JS_SERVICE_CALL_RULES = [
+    # ucanto: connect({ id: ..., codec: ..., channel: HTTP.open({ url: ... }) })
+    Rule("ucanto_connection_url", "ucanto_connections", ("HTTP.open",),
+         r'connect\s*\(\s*\{[^}]{0,2000}channel\s*:\s*HTTP\.open\s*\(\s*\{[^}]{0,2000}url\s*:\s*(?:new\s+URL\s*\(\s*)?([^)},]+)',
+         lambda m, ctx: {"type": "ucanto_connection",
+                         "target_url": m.group(1).strip().strip("'\""), "file": ctx.rel},
+         re.DOTALL, supersedes=("ucanto_connection_id",)),
+    # ucanto: connect({ id, codec, channel }) — simpler form
+    Rule("ucanto_connection_id", "ucanto_connections", ("connect",),
+         r'(?:Client\.)?connect\s*\(\s*\{[^}]{0,2000}id\s*:\s*(\w+)',
+         lambda m, ctx: {"type": "ucanto_connection", "target_id": m.group(1), "file": ctx.rel},
+         re.DOTALL),
+    # ucanto: Capability.invoke({ issuer, audience, with, nb })
+    Rule("ucanto_invocation", "ucanto_connections", ("invoke",),
+         r'(\w+(?:\.\w+)*)\s*\.invoke\s*\(\s*\{[^}]{0,2000}audience\s*:\s*(\w+)',
+         lambda m, ctx: _with_import({"type": "ucanto_invocation", "capability": m.group(1),
+                                      "audience": m.group(2), "file": ctx.rel}, ctx, m.group(1)),
+         re.DOTALL),
+    # ucanto: invocation.execute(connection)
+    Rule("ucanto_execute", "ucanto_connections", ("connect", "invoke"),
+         r'\.execute\s*\(\s*(\w+)',
+         lambda m, ctx: {"type": "ucanto_execute", "connection_var": m.group(1), "file": ctx.rel}),
+    # fetch with env var URLs
+    Rule("fetch_env_url", "http_service_calls", ("fetch(",),
+         r'fetch\s*\(\s*(?:`\$\{)?(?:env\.)?(\w+(?:_URL|_ENDPOINT|_API)[^`\'")\s,]*)',
+         lambda m, ctx: {"type": "fetch_env_url", "url_ref": m.group(1).strip("`${}'\"\n "),
+                         "file": ctx.rel}),
+    # fetch with literal URLs
+    Rule("fetch_literal_url", "http_service_calls", ("fetch(",),
+         r'fetch\s*\(\s*[\'"](\w+://[^\'"]+)[\'"]',
+         lambda m, ctx: {"type": "fetch_literal_url", "url": m.group(1), "file": ctx.rel}),
+    # Service binding fetch: env.SERVICE.fetch(
+    Rule("service_binding_call", "http_service_calls", ("fetch(",),
+         r'env\.(\w+)\.fetch\s*\(',
+         lambda m, ctx: {"type": "service_binding_call", "binding": m.group(1), "file": ctx.rel}),
+    # env.QUEUE_NAME.send(
+    Rule("queue_send", "queue_sends", (".send",), r'env\.(\w+)\.send\s*\(',
+         lambda m, ctx: {"type": "queue_send", "queue_binding": m.group(1), "file": ctx.rel},
+         supersedes=("sqs_send",)),
+    # SQS send
+    Rule("sqs_send", "queue_sends", ("sqs", "queue"), r'(?:sqs|queue).{0,2000}\.send(?:Message)?\s*\(',
+         lambda m, ctx: {"type": "sqs_send", "file": ctx.rel}, re.IGNORECASE),
+]
+
+GO_SERVICE_CALL_RULES = [
+    # http.NewRequest / http.Get / http.Post
+    Rule("go_http_call", "go_service_calls", ("http.",),
+         r'http\.(?:NewRequest|Get|Post|PostForm)\s*\(\s*(?:ctx\s*,\s*)?(?:"(\w+)"\s*,\s*)?([^,)]+)',
+         _go_http_call),
+    # doRequest pattern (custom HTTP client)
+    Rule("go_do_request", "go_service_calls", ("doRequest",),
+         r'doRequest\s*\([^,]{0,2000},\s*"(\w+)"\s*,\s*"([^"]+)"',
+         lambda m, ctx: {"type": "go_http_call", "method": m.group(1).upper(),
+                         "path": m.group(2), "file": ctx.rel}),
+]
+
+# Environment variables that reference other service URLs
+SERVICE_VAR = re.compile(r'\w+(?:_URL|_ENDPOINT|_DID|_SERVICE|_API)\w*')
+
+ENV_CONFIG_RULES = [
+    # Pattern: VAR_NAME = "https://..."
+    Rule("env_service_url", "service_env_vars", ("_URL", "_ENDPOINT", "_DID", "_SERVICE", "_API"),
+         rf'^({SERVICE_VAR.pattern})\s*=\s*["\']?([^\s"\'#]+)',
+         lambda m, ctx: {"var": m.group(1), "value": m.group(2), "file": ctx.rel},
+         re.MULTILINE),
+]
+
+ENV_REF_RULES = [
+    Rule("env_service_ref", "service_env_vars", ("_URL", "_DID", "_ENDPOINT"),
+         r'(?:env|process\.env)\s*[\.\[]\s*[\'"]?(\w+(?:_URL|_DID|_ENDPOINT)\w*)',
+         lambda m, ctx: {"var": m.group(1), "file": ctx.rel, "context": "code_reference"}),
+]
 
-    # Also scan JS/TS for env var references
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath) or is_test_file(fpath):
-            continue
-        if fpath.suffix not in (".js", ".ts", ".mjs"):
-            continue
 
-        content = read_file_safe(str(fpath))
-        rel = str(fpath.relative_to(repo_path))
-
-        for m in re.finditer(
-            r'(?:env|process\.env)\s*[\.\[]\s*[\'"]?(\w+(?:_URL|_DID|_ENDPOINT)\w*)',
-            content
-        ):
-            env_urls.append({
-                "var": m.group(1),
-                "file": rel,
-                "context": "code_reference",
-            })
+# ═══════════════════════════════════════════════════════════════
+#  SINGLE-PASS REPO WALK
+# ═══════════════════════════════════════════════════════════════
 
-    return env_urls
+JS_SUFFIXES = (".js", ".ts", ".mjs")
+JS_ROUTE_SUFFIXES = (".js", ".ts", ".mjs", ".mts")
+ENV_FILE_NAMES = (".env", ".env.example", ".env.local", ".dev.vars", ".dev.vars.example")
+
+# Rule groups by file kind: (suffixes, file names, include test files, rules).
+# Every group that accepts a file is merged into one RuleSet, so each file is
+# read once and prefiltered once.
+DETECTORS = [
+    (JS_ROUTE_SUFFIXES, (), False, JS_ROUTE_RULES),
+    ((".go",), (), False, GO_ROUTE_RULES),
+    (JS_SUFFIXES, (), False, JS_CAPABILITY_RULES),
+    ((".go",), (), False, GO_HANDLER_RULES),
+    (JS_SUFFIXES, (), False, JS_SERVICE_CALL_RULES),
+    ((".go",), (), False, GO_SERVICE_CALL_RULES),
+    ((), ENV_FILE_NAMES, True, ENV_CONFIG_RULES),
+    (JS_SUFFIXES, (), False, ENV_REF_RULES),
+]
+
+RESULT_KEYS = ("routes", "entry_points", "wrangler_routes", "capabilities",
+               "capability_handlers", "ucanto_connections", "http_service_calls",
+               "queue_sends", "go_service_calls", "service_env_vars", TIMEOUT_KEY)
+
+_rule_sets = {}
+
+
+def detectors_for(fname):
+    """Return the RuleSet for this kind of file, or None if nothing wants it."""
+    suffix = os.path.splitext(fname)[1]
+    test_file = is_test_file(fname)
+    groups = tuple(i for i, (suffixes, names, tests_ok, _) in enumerate(DETECTORS)
+                   if (suffix in suffixes or fname in names) and (tests_ok or not test_file))
+    if not groups:
+        return None
+    if groups not in _rule_sets:
+        _rule_sets[groups] = RuleSet(rule for i in groups for rule in DETECTORS[i][3])
+    return _rule_sets[groups]
+
+
+def scan_file(content, rel, rules, literals=None):
+    """Run a RuleSet over one file; returns only the non-empty result keys."""
+    found = defaultdict(list)
+    rules.run(content, rel, found, found=literals)
+    return {k: v for k, v in found.items() if v}
+
+
+def scan_path(tree, rel, rules, data=None):
+    """Findings for one file; data is its first READ_LIMIT + 1 bytes, if already read.
+
+    Files classify() rejects (minified, generated, binary) are skipped and
+    counted. The literal prefilter runs on the raw bytes, so files it rejects are
+    never decoded. Files past READ_LIMIT, which used to be cut off there, are
+    counted and checked in place (memory-mapped from a checkout, streamed
+    from git); only if a literal turns up are they decoded and scanned in
+    overlapping windows, so nothing past the cutoff is missed.
+    """
+    if data is None:
+        # A generated file name settles it without a read
+        data = b"" if classify(rel) else read_bytes_safe(tree, rel)
+    if skip_file(tree, rel, data):
+        return {}
+    if len(data) <= READ_LIMIT:
+        literals = rules.literals_in_bytes(data)
+        if not literals:
+            return {}
+        return scan_file(data.decode("utf-8", errors="ignore"), rel, rules, literals)
+    SCAN_STATS["over_read_limit"] += 1
+    with tree.mapped(rel) as buf:
+        def chunks():
+            if buf is None:
+                return tree.iter_bytes(rel, READ_LIMIT)
+            return buffer_chunks(buf, READ_LIMIT)
+
+        if not rules.literals_in_bytes(chunks()):
+            SCAN_STATS["large_never_decoded"] += 1
+            return {}
+        found = defaultdict(list)
+        rules.run_windows(decode_chunks(chunks()), rel, found, READ_LIMIT)
+    return {k: v for k, v in found.items() if v}
+
+
+def scan_wrangler_config(tree, rel, data=None):
+    """Worker routes and service URL vars of one wrangler.toml/.json/.jsonc.
+
+    Each environment's custom domains, route patterns and entry point are
+    listed with the worker name wrangler deploys it as, in file order.
+    """
+    if data is None:
+        data = read_bytes_safe(tree, rel)
+    if skip_file(tree, rel, data):
+        return {}
+    if len(data) > READ_LIMIT:
+        # Parsed as a unit, so never cut off
+        data = tree.read_bytes(rel)
+    config = WranglerConfig(rel, data.decode("utf-8", errors="ignore"))
+    staged = []
+    try:
+        with rule_budget():
+            for env in config.envs():
+                where = {"worker": config.worker(env), "file": rel}
+                if env is not None:
+                    where["env"] = env
+                for pattern, custom, pos in config.routes(env):
+                    route = ({"type": "custom_domain", "hostname": pattern} if custom
+                             else {"type": "route_pattern", "pattern": pattern})
+                    staged.append((pos, "wrangler_routes", {**route, **where}))
+                main = config.main(env)
+                if main:
+                    pos = config.locate(env, (), None, "main", main)
+                    staged.append((pos, "wrangler_routes",
+                                   {"type": "worker_entrypoint", "main": main, **where}))
+            for name, value, env, pos in config.vars():
+                if SERVICE_VAR.fullmatch(name) and isinstance(value, str) and value:
+                    var = {"var": name, "value": value, "file": rel}
+                    if env is not None:
+                        var["env"] = env
+                    staged.append((pos, "service_env_vars", var))
+    except RuleTimeout:
+        return {TIMEOUT_KEY: [timeout_record("wrangler_config", rel)]}
+    found = defaultdict(list)
+    for pos, key, finding in sorted(staged, key=lambda s: (s[0] is None, s[0] or 0)):
+        found[key].append({**finding, **config.at(pos)})
+    return dict(found)
+
+
+def scan_repo(repo_path, cache=None, ref=None, only=None):
+    """Walk a repo once, pruning SKIP_DIRS, and run every detector on each file.
+
+    With a FindingsCache, files whose content (or size and mtime) is unchanged
+    since a previous run reuse their stored findings instead of being re-scanned.
+    With a ref, the repo's files are read from git at that commit instead of
+    from the working tree. With only, just those repo-relative paths are scanned.
+    Files where a rule hit the time budget are never cached, so they are
+    retried on the next run.
+    """
+    result = {k: [] for k in RESULT_KEYS}
+
+    with PROFILER.scope("scan_repo") as profile, open_tree(repo_path, ref, only) as tree:
+        for rel, fname in tree.files(SKIP_DIRS):
+            if fname in WRANGLER_NAMES:
+                scan = partial(scan_wrangler_config, tree, rel)
+            else:
+                rules = detectors_for(fname)
+                if rules is None:
+                    continue
+                scan = partial(scan_path, tree, rel, rules)
+
+            if cache is None:
+                found = scan()
+            else:
+                found = cached_scan(cache, tree, repo_path, rel, scan, READ_LIMIT)
+                if found is None:
+                    continue
+
+            for k, items in found.items():
+                result[k].extend(items)
+                profile["matches"] += len(items)
+
+    if cache is not None:
+        cache.flush()
+    return result
+
+
+def scan_changes(repo_path, since, cache=None, ref=None):
+    """Findings for just the files changed since a ref, to patch into a previous map."""
+    changed = changed_paths(repo_path, since, ref)
+    return {"changed": sorted(changed),
+            "found": scan_repo(repo_path, cache, ref, only=changed)}
+
+
+def patch_result(previous, delta):
+    """Apply a scan_changes() delta to a repo's result from a previous map.
+
+    Findings in changed files (including deleted ones) are replaced by the
+    fresh ones, and each list is put back in walk order, so the patched
+    result is what a full rescan would have produced.
+    """
+    result = {k: list((previous or {}).get(k, [])) for k in RESULT_KEYS}
+    if delta is None:
+        return result
+    changed = set(delta["changed"])
+    for k in RESULT_KEYS:
+        kept = [f for f in result[k] if f["file"] not in changed]
+        result[k] = sorted(kept + delta["found"][k], key=lambda f: walk_order(f["file"]))
+    return result
+
+
+def open_cache(args):
+    """Build the findings cache from CLI args (None when disabled)."""
+    if args.no_cache:
+        return None
+    version = file_digest(__file__) + file_digest(scanlib.__file__)
+    return FindingsCache(args.cache_dir / "api-surface.sqlite", version,
+                         args.cache_size_mb * 1024 * 1024)
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -707,6 +615,7 @@ def build_service_graph(all_results):
                     "to": conn.get("audience", "?"),
                     "via": "ucanto",
                     "capability": conn.get("capability", "?"),
+                    **({"can": conn["can"]} if "can" in conn else {}),
                 })
             elif conn["type"] == "ucanto_connection":
                 target = conn.get("target_url", conn.get("target_id", "?"))
@@ -750,10 +659,168 @@ def build_service_graph(all_results):
     return edges
 
 
+# ═══════════════════════════════════════════════════════════════
+#  CAPABILITY REF RESOLUTION
+# ═══════════════════════════════════════════════════════════════
+
+NAMESPACE_REEXPORT = re.compile(r"""export\s+\*\s+as\s+(\w+)\s+from\s+['"]([^'"]+)['"]""")
+
+
+class CapabilityIndex:
+    """Which capability each importable module exports, across every repo.
+
+    Modules are (repo, extensionless path). A package.json above a capability
+    definition maps its name, exports subpaths (wildcards included) or, with
+    no exports map, name/path and name/path-without-src/ onto those files.
+    The package entry point is read for export * as Blob from './blob.js', so
+    import { Blob } from the package root resolves too.
+    """
+
+    def __init__(self):
+        self.modules = defaultdict(dict)      # module -> {export_name: can}
+        self.namespaces = defaultdict(dict)   # module -> {name: module}
+        self.specifiers = defaultdict(list)   # package specifier -> [module]
+
+    def add_repo(self, repo, tree, capabilities):
+        packages = {}
+        for cap in capabilities:
+            stem = module_stem(cap["file"])
+            self.modules[(repo, stem)][cap["export_name"]] = cap["can"]
+            package = self._package_of(tree, cap["file"], packages)
+            if package is not None:
+                self._add_specifiers(repo, stem, *package)
+        for pkg_dir, pkg in packages.values():
+            if pkg is not None:
+                self._add_entry(repo, tree, pkg_dir, pkg)
+
+    def _package_of(self, tree, rel, packages):
+        """(dir, parsed package.json) of the nearest package with a name, or None."""
+        d = posixpath.dirname(rel)
+        while True:
+            if d not in packages:
+                packages[d] = (d, None)
+                path = posixpath.join(d, "package.json")
+                if tree.exists(path):
+                    try:
+                        pkg = json.loads(tree.read_text(path))
+                    except ValueError:
+                        pkg = None
+                    if isinstance(pkg, dict) and isinstance(pkg.get("name"), str):
+                        packages[d] = (d, pkg)
+            if packages[d][1] is not None:
+                return packages[d]
+            if not d:
+                return None
+            d = posixpath.dirname(d)
+
+    def _add_specifiers(self, repo, stem, pkg_dir, pkg):
+        name = pkg["name"]
+        sub = posixpath.relpath(stem, pkg_dir or ".")
+        exports = subpath_exports(pkg)
+        if exports is not None:
+            for key, target in exports.items():
+                if target is None:
+                    continue
+                target = module_stem(posixpath.normpath(target))
+                if "*" in key and "*" in target:
+                    head, _, tail = target.partition("*")
+                    if sub.startswith(head) and sub.endswith(tail) and len(sub) >= len(head + tail):
+                        part = sub[len(head):len(sub) - len(tail)]
+                        self.specifiers[name + key[1:].replace("*", part)].append((repo, stem))
+                elif target == sub:
+                    self.specifiers[name + key[1:]].append((repo, stem))
+            return
+        self.specifiers[f"{name}/{sub}"].append((repo, stem))
+        if sub.startswith("src/"):
+            self.specifiers[f"{name}/{sub[4:]}"].append((repo, stem))
+
+    def _add_entry(self, repo, tree, pkg_dir, pkg):
+        """Register the package root and the namespaces its entry point re-exports."""
+        entry = ((subpath_exports(pkg) or {}).get(".") or pkg.get("module") or pkg.get("main")
+                 or "src/index.js")
+        if not isinstance(entry, str):
+            return
+        entry = posixpath.normpath(posixpath.join(pkg_dir, entry))
+        if entry.startswith("../"):
+            return
+        module = (repo, module_stem(entry))
+        self.specifiers[pkg["name"]].append(module)
+        content = tree.read_text(entry) if tree.exists(entry) else ""
+        for m in NAMESPACE_REEXPORT.finditer(content):
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(entry), m.group(2)))
+            self.namespaces[module][m.group(1)] = (repo, module_stem(target))
+
+    def _targets(self, repo, rel, spec):
+        if spec.startswith("."):
+            stem = module_stem(posixpath.normpath(posixpath.join(posixpath.dirname(rel), spec)))
+            return [(repo, stem), (repo, f"{stem}/index")]
+        targets = self.specifiers.get(spec, [])
+        # A workspace package in the importing repo wins over copies elsewhere
+        return [t for t in targets if t[0] == repo] or targets
+
+    def resolve(self, repo, finding, ref):
+        """The can a ref like Blob.add names, or None unless exactly one is possible."""
+        binding = finding.get("import")
+        if binding is None:
+            return None
+        path = ref.split(".")[1:]
+        if binding["name"] != "*":
+            path.insert(0, binding["name"])
+        if not path:
+            return None
+        found = set()
+        for module in self._targets(repo, finding["file"], binding["from"]):
+            for name in path[:-1]:
+                module = self.namespaces.get(module, {}).get(name)
+                if module is None:
+                    break
+            else:
+                can = self.modules.get(module, {}).get(path[-1])
+                if can is not None:
+                    found.add(can)
+        return found.pop() if len(found) == 1 else None
+
+
+def resolve_capability_refs(all_results, repo_paths, ref=None):
+    """Write the resolved can onto every capability handler and ucanto invocation.
+
+    Handler refs (Server.provide(Blob.add, ...)) and invocations (Blob.add.invoke)
+    are followed through the file's import bindings to a capability definition
+    in any repo. Findings whose ref can't be pinned to a single can (unknown
+    package, dynamic import, ambiguous copies) are left without one.
+    """
+    index = CapabilityIndex()
+    for repo, data in all_results.items():
+        if data.get("capabilities"):
+            with open_tree(repo_paths[repo], ref) as tree:
+                index.add_repo(repo, tree, data["capabilities"])
+
+    resolved = 0
+    for repo, data in all_results.items():
+        refs = [(h, h.get("capability_ref")) for h in data.get("capability_handlers", [])]
+        refs += [(c, c.get("capability")) for c in data.get("ucanto_connections", [])
+                 if c["type"] == "ucanto_invocation"]
+        for finding, cap_ref in refs:
+            # Findings patched in by --since may carry a can from the previous map
+            finding.pop("can", None)
+            can = index.resolve(repo, finding, cap_ref) if cap_ref else None
+            if can is not None:
+                finding["can"] = can
+                resolved += 1
+    return resolved
+
+
 # ═══════════════════════════════════════════════════════════════
 #  REPORT GENERATOR
 # ═══════════════════════════════════════════════════════════════
 
+def where(finding):
+    """file:line for a finding (just the file if it has no location)."""
+    if "line" in finding:
+        return f"{finding['file']}:{finding['line']}"
+    return finding["file"]
+
+
 def generate_report(all_results, service_graph, all_capabilities):
     report = []
     report.append("=" * 72)
@@ -835,7 +902,7 @@ def generate_report(all_results, service_graph, all_capabilities):
             report.append(f"  Entry Points:")
             for ep in data["entry_points"]:
                 mw = f"  middlewares: {', '.join(ep['middlewares'][:10])}" if ep.get("middlewares") else ""
-                report.append(f"    [{ep['type']}] {ep['file']}{mw}")
+                report.append(f"    [{ep['type']}] {where(ep)}{mw}")
 
         # Wrangler info
         if data.get("wrangler_routes"):
@@ -856,7 +923,7 @@ def generate_report(all_results, service_graph, all_capabilities):
                 key = f"{r['method']} {r['path']}"
                 if key not in seen:
                     seen.add(key)
-                    report.append(f"    {r['method']:8s} {r['path']:35s} ({r['framework']}) {r['file']}")
+                    report.append(f"    {r['method']:8s} {r['path']:35s} ({r['framework']}) {where(r)}")
 
         # UCAN capabilities defined
         if data.get("capabilities"):
@@ -872,13 +939,13 @@ def generate_report(all_results, service_graph, all_capabilities):
                 if h["pattern"] == "service_factory":
                     caps = ", ".join(h.get("capabilities_served", [])[:15])
                     report.append(f"    {h['factory_name']}(): {caps}")
-                    report.append(f"      file: {h['file']}")
+                    report.append(f"      file: {where(h)}")
                 elif h.get("capability_ref"):
-                    report.append(f"    {h['pattern']:30s} → {h['capability_ref']:30s} {h['file']}")
+                    report.append(f"    {h['pattern']:30s} → {h.get('can', h['capability_ref']):30s} {where(h)}")
                 elif h.get("handler_name"):
-                    report.append(f"    {h['pattern']:30s} → {h['handler_name']:30s} {h['file']}")
+                    report.append(f"    {h['pattern']:30s} → {h['handler_name']:30s} {where(h)}")
                 else:
-                    report.append(f"    {h['pattern']:30s}   {h['file']}")
+                    report.append(f"    {h['pattern']:30s}   {where(h)}")
 
         # Outbound connections
         outbound = []
@@ -925,7 +992,7 @@ def generate_report(all_results, service_graph, all_capabilities):
                     if val:
                         report.append(f"    {ev['var']:40s} = {val}")
                     else:
-                        report.append(f"    {ev['var']:40s}   (referenced in {ev['file']})")
+                        report.append(f"    {ev['var']:40s}   (referenced in {where(ev)})")
 
     return "\n".join(report)
 
@@ -935,6 +1002,21 @@ def generate_report(all_results, service_graph, all_capabilities):
 # ═══════════════════════════════════════════════════════════════
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Scan repos for HTTP routes, UCAN capabilities and service calls."
+    )
+    add_jobs_argument(parser)
+    add_stream_arguments(parser, OUTPUT_DIR / "api-surface-map.ndjson")
+    add_cache_arguments(parser, CACHE_DIR)
+    add_source_arguments(parser)
+    add_since_argument(parser)
+    add_profile_argument(parser)
+    add_budget_argument(parser)
+    args = parser.parse_args()
+    set_rule_budget(args.rule_budget)
+    stream = stream_path(args, OUTPUT_DIR / "api-surface-map.ndjson")
+    cache = open_cache(args)
+
     print("=" * 72)
     print("  API SURFACE & DATA FLOW SCANNER")
     print("  HTTP routes, UCAN capabilities, service-to-service calls")
@@ -946,45 +1028,41 @@ def main():
         if d.is_dir() and d.name not in DROP_REPOS and not d.name.startswith("."):
             analyze_list.append({"name": d.name})
 
-    all_results = {}
-
-    for i, ri in enumerate(analyze_list):
-        name = ri["name"]
-        rp = REPOS_DIR / name
-        if not rp.exists():
-            continue
-
-        sys.stdout.write(f"\r   [{i+1}/{len(analyze_list)}] {name:40s}")
-        sys.stdout.flush()
-
-        result = {}
-
-        # HTTP routes
-        js_routes, js_entries = scan_js_routes(rp)
-        go_routes, go_entries = scan_go_routes(rp)
-        wrangler_routes = scan_wrangler_routes(rp)
-
-        result["routes"] = js_routes + go_routes
-        result["entry_points"] = js_entries + go_entries
-        result["wrangler_routes"] = wrangler_routes
-
-        # UCAN capabilities
-        result["capabilities"] = scan_capability_definitions(rp)
-        result["capability_handlers"] = scan_capability_handlers(rp) + scan_go_ucan_handlers(rp)
-
-        # Service-to-service
-        result["ucanto_connections"] = scan_ucanto_connections(rp)
-        result["http_service_calls"] = scan_http_service_calls(rp)
-        result["queue_sends"] = scan_queue_sends(rp)
-        result["go_service_calls"] = scan_go_service_calls(rp)
-        result["service_env_vars"] = scan_service_url_env_vars(rp)
+    repos = [(ri["name"], REPOS_DIR / ri["name"]) for ri in analyze_list]
+    repos = [(name, rp) for name, rp in repos if rp.exists()]
+
+    if args.since:
+        previous = load_per_repo(OUTPUT_DIR / "api-surface-map.json")
+        if previous is None:
+            parser.error("--since patches an existing api-surface-map.json; run a full scan first")
+        scan = partial(scan_changes, since=args.since, cache=cache, ref=source_ref(args))
+    else:
+        scan = partial(scan_repo, cache=cache, ref=source_ref(args))
+    profile = {} if args.profile else None
+    stats = {}
+    try:
+        results = scan_repos(scan, repos, args.jobs, stream=stream, resume=args.resume,
+                             profile=profile, stats=stats, mode=stream_mode(args))
+    except StreamMismatch as exc:
+        parser.error(str(exc))
+    if args.since:
+        # Repos whose diff failed keep their previous findings
+        results = {name: patch_result(previous.get(name), results.get(name))
+                   for name, _ in repos}
 
+    all_results = {}
+    for name, result in results.items():
         # Only keep if there's something interesting
-        has_content = any(result[k] for k in result)
-        if has_content:
+        if any(result[k] for k in result):
             all_results[name] = result
 
+    if cache is not None:
+        cache.evict()
+
     print(f"\n\n   Scanned {len(analyze_list)} repos, found API surface in {len(all_results)}")
+    scan_stats = report_stats(stats)
+
+    resolved = resolve_capability_refs(all_results, dict(repos), source_ref(args))
 
     # Build service graph
     service_graph = build_service_graph(all_results)
@@ -1008,6 +1086,7 @@ def main():
         "capability_catalog": all_caps,
         "service_graph": service_graph,
         "per_repo": {},
+        "scan_stats": scan_stats,
     }
 
     for name, data in all_results.items():
@@ -1021,6 +1100,7 @@ def main():
     total_caps = len(all_caps)
     total_handlers = sum(len(d.get("capability_handlers", [])) for d in all_results.values())
     total_edges = len(service_graph)
+    total_timeouts = sum(len(d.get(TIMEOUT_KEY, [])) for d in all_results.values())
 
     print(f"\n\n{'=' * 72}")
     print(f"  DONE")
@@ -1029,12 +1109,18 @@ def main():
     print(f"  HTTP routes found:           {total_routes}")
     print(f"  UCAN capabilities defined:   {total_caps}")
     print(f"  Capability handlers:         {total_handlers}")
+    print(f"  Capability refs resolved:    {resolved}")
     print(f"  Service graph edges:         {total_edges}")
+    if total_timeouts:
+        print(f"  Rule timeouts (skipped):     {total_timeouts}")
     print(f"")
     print(f"  {OUTPUT_DIR}/")
     print(f"     api-surface-map.txt     <- human-readable")
     print(f"     api-surface-map.json    <- machine-readable")
 
+    if profile is not None:
+        write_profile("api_surface", profile, OUTPUT_DIR / "scan-profile.json")
+
 
 if __name__ == "__main__":
     main()
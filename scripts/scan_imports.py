@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Import Graph Scanner
+
+Records which source files import which, per repo:
+- JS/TS: import ... from, export ... from, import('x'), require('x')
+- Go: import "x" and import ( ... ) blocks
+- The npm packages and Go modules each repo holds (name -> directory)
+
+Relative specifiers resolve to files in the repo (extension optional, or a
+directory's index), workspace package names to the file their package.json
+exports (or main/module) points at, and Go import paths under a go.mod
+module to that package's files. Anything else is kept as an external package
+name. Each file's raw specifiers are cached by content, so only changed
+files are re-parsed; resolution is redone every run, since it depends on
+which files and packages exist.
+
+Run: python3 aidev/scripts/scan_imports.py [--jobs N] [--no-cache] [--source git [--ref REF]]
+From: project root (parent of aidev/)
+"""
+
+import argparse
+import json
+import os
+import posixpath
+import re
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+
+import scanlib
+from scanlib import (JS_MODULE_SUFFIXES, FindingsCache, add_cache_arguments, add_jobs_argument,
+                     add_source_arguments, cached_scan, file_digest, module_stem, open_tree,
+                     report_stats, scan_repos, skip_file, source_ref, subpath_exports)
+
+# aidev/scripts/ -> aidev/ -> project root
+AIDEV_DIR = Path(__file__).resolve().parent.parent
+PROJECT_ROOT = AIDEV_DIR.parent
+REPOS_DIR = PROJECT_ROOT  # repos are siblings of aidev/
+OUTPUT_DIR = AIDEV_DIR / "data"
+CACHE_DIR = AIDEV_DIR / ".scan-cache"
+
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+SKIP_DIRS = {"node_modules", ".git", "dist", "build", "vendor", ".next",
+             "coverage", "__pycache__", ".turbo", "target", ".pnpm",
+             "test", "tests", "__tests__", "fixtures", "mocks"}
+
+SKIP_FILE_PATTERNS = {"test.", ".test.", ".spec.", "__test__", "__mock__"}
+
+DROP_REPOS = {"resteep", "stubble", "dashboard-demo-clone"}
+
+# Imports sit at the top of a file; only this many bytes are parsed
+READ_LIMIT = 200000
+
+JS_IMPORT = re.compile(r"""\b(?:(?:import|export)\b[^'";]{0,2000}?\bfrom|import\s*\(?|require\s*\()"""
+                       r"""\s*['"]([^'"\n]+)['"]""")
+GO_IMPORT_LINE = re.compile(r'^import\s+(?:[\w.]+\s+)?"([^"]+)"', re.MULTILINE)
+GO_IMPORT_BLOCK = re.compile(r'^import\s*\(([^)]*)\)', re.MULTILINE)
+GO_IMPORT_SPEC = re.compile(r'"([^"]+)"')
+GO_MODULE = re.compile(r'^module\s+(\S+)', re.MULTILINE)
+
+
+def is_test_file(fname):
+    name = fname.lower()
+    return any(p in name for p in SKIP_FILE_PATTERNS)
+
+
+def is_source(fname):
+    return (fname.endswith(".go") or os.path.splitext(fname)[1] in JS_MODULE_SUFFIXES) \
+        and not is_test_file(fname)
+
+
+# ═══════════════════════════════════════════════════════════════
+#  PARSING (cached per file)
+# ═══════════════════════════════════════════════════════════════
+
+def parse_imports(tree, rel, data=None):
+    """The raw import specifiers of one source file, in order, without repeats."""
+    if data is None:
+        data = tree.read_bytes(rel, READ_LIMIT + 1)
+    if skip_file(tree, rel, data):
+        return []
+    text = data[:READ_LIMIT].decode("utf-8", errors="ignore")
+    if rel.endswith(".go"):
+        specs = GO_IMPORT_LINE.findall(text)
+        for block in GO_IMPORT_BLOCK.findall(text):
+            specs.extend(GO_IMPORT_SPEC.findall(block))
+    else:
+        specs = JS_IMPORT.findall(text)
+    return list(dict.fromkeys(specs))
+
+
+# ═══════════════════════════════════════════════════════════════
+#  RESOLUTION (per repo, every run)
+# ═══════════════════════════════════════════════════════════════
+
+def package_name(spec):
+    """The npm package a bare specifier imports from: @scope/name or name."""
+    parts = spec.split("/")
+    return "/".join(parts[:2]) if spec.startswith("@") else parts[0]
+
+
+class Resolver:
+    """Maps one repo's import specifiers onto its own files.
+
+    Built from the scanned source files plus the repo's package.json and
+    go.mod files, which name its workspace packages and Go modules.
+    """
+
+    def __init__(self, tree, files, manifests):
+        self.files = set(files)
+        self.stems = defaultdict(list)
+        self.go_packages = defaultdict(list)
+        for rel in files:
+            if rel.endswith(".go"):
+                self.go_packages[posixpath.dirname(rel)].append(rel)
+            else:
+                self.stems[module_stem(rel)].append(rel)
+        self.packages = {}      # npm name -> (dir, package.json)
+        self.modules = []       # (go module path, dir), longest path first
+        for rel in manifests:
+            d = posixpath.dirname(rel)
+            if rel.endswith("go.mod"):
+                m = GO_MODULE.search(tree.read_text(rel))
+                if m:
+                    self.modules.append((m.group(1), d))
+                continue
+            try:
+                pkg = json.loads(tree.read_text(rel))
+            except ValueError:
+                continue
+            if isinstance(pkg, dict) and isinstance(pkg.get("name"), str):
+                self.packages.setdefault(pkg["name"], (d, pkg))
+        self.modules.sort(key=lambda m: -len(m[0]))
+
+    def file(self, path):
+        """The scanned file a module path names: exact, any JS extension, or dir/index."""
+        path = posixpath.normpath(path)
+        if path in self.files:
+            return path
+        for stem in (module_stem(path), posixpath.join(path, "index")):
+            if self.stems.get(stem):
+                return self.stems[stem][0]
+        return None
+
+    def _package_file(self, pkg_dir, pkg, sub):
+        exports = subpath_exports(pkg)
+        if exports is not None:
+            key = "." + sub
+            target = exports.get(key)
+            if target is None:
+                for pattern, t in exports.items():
+                    head, star, tail = pattern.partition("*")
+                    if star and t and key.startswith(head) and key.endswith(tail) \
+                            and len(key) >= len(head) + len(tail):
+                        target = t.replace("*", key[len(head):len(key) - len(tail)])
+                        break
+            return self.file(posixpath.join(pkg_dir, target)) if target else None
+        if not sub:
+            entry = pkg.get("module") or pkg.get("main") or "index.js"
+            if not isinstance(entry, str):
+                entry = "index.js"
+            return (self.file(posixpath.join(pkg_dir, entry))
+                    or self.file(posixpath.join(pkg_dir, "src/index")))
+        return (self.file(posixpath.join(pkg_dir, sub[1:]))
+                or self.file(posixpath.join(pkg_dir, "src", sub[1:])))
+
+    def resolve(self, rel, spec):
+        """([files in this repo], external package or None) for one specifier."""
+        if rel.endswith(".go"):
+            for module, d in self.modules:
+                if spec == module or spec.startswith(module + "/"):
+                    pkg_dir = posixpath.normpath(posixpath.join(d, spec[len(module) + 1:]))
+                    return self.go_packages.get("" if pkg_dir == "." else pkg_dir, []), None
+            # The standard library has no dot in its first path element
+            return [], spec if "." in spec.split("/", 1)[0] else None
+        if spec.startswith("."):
+            target = self.file(posixpath.join(posixpath.dirname(rel), spec))
+            return [target] if target else [], None
+        if spec.startswith("node:") or spec.startswith("/"):
+            return [], None
+        name = package_name(spec)
+        if name in self.packages:
+            pkg_dir, pkg = self.packages[name]
+            target = self._package_file(pkg_dir, pkg, spec[len(name):])
+            return [target] if target else [], None
+        return [], name
+
+
+def scan_repo(repo_path, cache=None, ref=None):
+    """Import edges of every JS/TS and Go source file in a repo.
+
+    Returns {"imports": {file: [files]}, "external": {file: [packages]},
+    "packages": {name: dir}}, the last being the npm packages and Go modules
+    the repo holds. Files with no imports are left out, and targets never
+    include the file itself.
+    With a FindingsCache, files whose content is unchanged reuse their parsed
+    specifiers.
+    """
+    specs = {}
+    manifests = []
+    with open_tree(repo_path, ref) as tree:
+        for rel, fname in tree.files(SKIP_DIRS):
+            if fname in ("package.json", "go.mod"):
+                manifests.append(rel)
+            if not is_source(fname):
+                continue
+            if cache is None:
+                found = parse_imports(tree, rel)
+            else:
+                found = cached_scan(cache, tree, repo_path, rel,
+                                    partial(parse_imports, tree, rel), READ_LIMIT)
+                if found is None:
+                    continue
+            specs[rel] = found
+        resolver = Resolver(tree, specs, manifests)
+
+    if cache is not None:
+        cache.flush()
+
+    imports, external = {}, {}
+    for rel, found in specs.items():
+        targets, packages = [], []
+        for spec in found:
+            files, package = resolver.resolve(rel, spec)
+            targets.extend(f for f in files if f != rel)
+            if package:
+                packages.append(package)
+        if targets:
+            imports[rel] = list(dict.fromkeys(targets))
+        if packages:
+            external[rel] = list(dict.fromkeys(packages))
+    return {"imports": imports, "external": external,
+            "packages": {**{name: d for name, (d, _) in resolver.packages.items()},
+                         **dict(resolver.modules)}}
+
+
+def open_cache(args):
+    """Build the parsed-imports cache from CLI args (None when disabled)."""
+    if args.no_cache:
+        return None
+    version = file_digest(__file__) + file_digest(scanlib.__file__)
+    return FindingsCache(args.cache_dir / "imports.sqlite", version,
+                         args.cache_size_mb * 1024 * 1024)
+
+
+# ═══════════════════════════════════════════════════════════════
+#  MAIN
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record the JS/TS and Go import graph of every repo."
+    )
+    add_jobs_argument(parser)
+    add_cache_arguments(parser, CACHE_DIR)
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    cache = open_cache(args)
+
+    print("=" * 72)
+    print("  IMPORT GRAPH SCANNER")
+    print("  JS/TS and Go file-to-file imports")
+    print("=" * 72)
+
+    repos = [(d.name, d) for d in sorted(REPOS_DIR.iterdir())
+             if d.is_dir() and d.name not in DROP_REPOS and not d.name.startswith(".")]
+    stats = {}
+    results = scan_repos(partial(scan_repo, cache=cache, ref=source_ref(args)),
+                         repos, args.jobs, stats=stats)
+    if cache is not None:
+        cache.evict()
+
+    per_repo = {name: graph for name, graph in results.items()
+                if graph["imports"] or graph["external"] or graph["packages"]}
+    print(f"\n\n   Scanned {len(repos)} repos, found imports in {len(per_repo)}")
+    scan_stats = report_stats(stats)
+
+    with open(OUTPUT_DIR / "import-graph.json", "w") as f:
+        json.dump({"per_repo": per_repo, "scan_stats": scan_stats}, f, indent=1)
+
+    total_files = sum(len(g["imports"].keys() | g["external"].keys()) for g in per_repo.values())
+    total_edges = sum(len(t) for g in per_repo.values() for t in g["imports"].values())
+    total_external = len({p for g in per_repo.values() for ps in g["external"].values() for p in ps})
+
+    print(f"\n\n{'=' * 72}")
+    print(f"  DONE")
+    print(f"{'=' * 72}")
+    print(f"  Files with imports:          {total_files}")
+    print(f"  In-repo import edges:        {total_edges}")
+    print(f"  External packages:           {total_external}")
+    print(f"")
+    print(f"  {OUTPUT_DIR}/")
+    print(f"     import-graph.json       <- machine-readable")
+
+
+if __name__ == "__main__":
+    main()
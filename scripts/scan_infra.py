@@ -12,17 +12,35 @@ Discovers from source code:
 - Terraform resources
 - Wrangler bindings
 
-Run: python3 aidev/scripts/scan_infra.py
+Each repo is listed once and every file handed to the scanners that want
+it. Per-file findings are cached by content, so a re-run only re-scans the
+files that changed. SQL files are tokenized as a stream and each repo's
+migrations replayed in filename order, so sql_schemas holds the tables as
+the last migration leaves them.
+
+Run: python3 aidev/scripts/scan_infra.py [--jobs N] [--no-cache] [--stream [PATH]] [--resume]
+     [--source git [--ref REF]] [--since REF] [--profile] [--rule-budget SECONDS]
 From: project root (parent of aidev/)
 """
 
-import os
-import sys
+import argparse
+import posixpath
 import json
 import re
 import yaml
 from pathlib import Path
 from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+
+import scanlib
+from scanlib import (PROFILER, SCAN_STATS, TIMEOUT_KEY, WRANGLER_NAMES, FindingsCache, LineIndex,
+                     PathSpec, RuleTimeout, StreamMismatch, WranglerConfig, add_budget_argument,
+                     add_cache_arguments, add_jobs_argument, add_profile_argument,
+                     add_since_argument, add_source_arguments, add_stream_arguments, cached_scan,
+                     changed_paths, file_digest, load_per_repo, open_tree, report_stats,
+                     rule_budget, scan_repos, set_rule_budget, skip_file, source_ref,
+                     stream_mode, stream_path, timeout_record, windows, write_profile)
 
 # aidev/scripts/ -> aidev/ -> project root
 AIDEV_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +48,7 @@ PROJECT_ROOT = AIDEV_DIR.parent
 REPOS_DIR = PROJECT_ROOT  # repos are siblings of aidev/
 OUTPUT_DIR = AIDEV_DIR / "data"
 CONFIG_PATH = OUTPUT_DIR / "repos-config.yaml"
+CACHE_DIR = AIDEV_DIR / ".scan-cache"
 
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -39,408 +58,1296 @@ SKIP_DIRS = {"node_modules", ".git", "dist", "build", "vendor", ".next",
 DROP_REPOS = {"resteep", "stubble", "dashboard-demo-clone"}
 
 
-def read_file_safe(path, max_bytes=100000):
-    try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read(max_bytes)
-    except:
-        return ""
+# Files used to be cut off at READ_LIMIT characters. Config files are now
+# read whole, since they are parsed or scanned as a unit; Terraform, which
+# can be huge, is streamed through read_windows() and SQL through
+# SqlTokenizer.
+READ_LIMIT = 100000
 
+# Longest resource header that must be seen whole in one window
+MAX_SPAN = 16384
 
-def should_skip(fpath):
-    return any(s in fpath.parts for s in SKIP_DIRS)
 
+def read_file_safe(tree, rel, content=None):
+    """Whole decoded file, or "" if classify() rejects it; content if already read."""
+    if content is not None:
+        return content
+    if skip_file(tree, rel):
+        return ""
+    content = tree.read_text(rel)
+    if len(content) > READ_LIMIT:
+        SCAN_STATS["over_read_limit"] += 1
+    return content
+
+
+def read_windows(tree, rel, content=None):
+    """Yield (content, lines, stop) for a file, in overlapping windows.
+
+    A file of up to READ_LIMIT characters is one window holding all of it
+    (content, if the caller already read it). Larger ones are streamed in
+    windows of READ_LIMIT characters that overlap by MAX_SPAN; a window owns
+    the matches starting before stop and the next window starts at stop, so
+    none is reported twice. Files classify() rejects yield nothing.
+    """
+    if content is not None:
+        yield content, LineIndex(content), len(content)
+        return
+    if skip_file(tree, rel):
+        return
+    content = tree.read_text(rel, READ_LIMIT + 1)
+    if len(content) <= READ_LIMIT:
+        yield content, LineIndex(content), len(content)
+        return
+    SCAN_STATS["over_read_limit"] += 1
+    for w in windows(tree.iter_text(rel, READ_LIMIT), READ_LIMIT, MAX_SPAN):
+        yield w.text, LineIndex(w.text, w.line0, w.col0), len(w.text) - (0 if w.last else MAX_SPAN)
+
+
+def locate(content, lines, needle):
+    """Line/col of the first occurrence of needle, or {} if it isn't there."""
+    pos = content.find(needle)
+    return lines.at(pos) if pos != -1 else {}
+
+
+@contextmanager
+def budgeted(findings, scanner, rel):
+    """Run one scanner's regexes over one file under the rule time budget.
+
+    If the budget runs out, whatever the scanner found in the file is dropped
+    and a rule_timeout finding is recorded in its place.
+    """
+    before = len(findings)
+    try:
+        with rule_budget():
+            yield
+    except RuleTimeout:
+        del findings[before:]
+        findings.append({"type": "rule_timeout", **timeout_record(scanner, rel)})
+
+
+# ── SQL DDL ─────────────────────────────────────────────────
+#
+# SQL files are read as a token stream, a chunk at a time, so a multi-MB
+# dump is never held whole. Comments, string literals, $tag$-quoted
+# bodies and COPY ... FROM stdin data are skipped as they stream past.
+# Only the statements that shape a schema are kept until their ";":
+# CREATE/ALTER/DROP TABLE and CREATE/DROP INDEX. replay_schema() then
+# applies them in migration order to get each table as it ends up.
+
+SQL_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<skip>--|/\*|[eE]?'|\$(?:[^\W\d]\w*)?\$)
+  | (?P<word>[^\W\d][\w$]*)
+  | (?P<number>\d[\w.]*)
+  | "(?P<quoted>(?:[^"]|"")*)"(?!")
+  | `(?P<backquoted>[^`]*)`
+  | (?P<punct>.)
+''', re.VERBOSE | re.DOTALL)
+
+# What can be passed over in one go once a statement is known not to be
+# DDL: anything but ";" and the openers of comments and quoted text, and
+# whole string literals (a '' escape reads as two strings, which is the same
+# for skimming). Indexed by whether backslash escapes apply; E'...' strings
+# always go through the tokenizer.
+SQL_SKIM = {
+    False: re.compile(r"(?:[^;'\"`$/\-eE]+|[eE](?!')|'[^']*')+"),
+    True: re.compile(r"(?:[^;'\"`$/\-eE]+|[eE](?!')|'(?:[^'\\]|\\.)*')+", re.DOTALL),
+}
+
+# What to look for inside a string, by whether backslash escapes apply
+SQL_STRING_SPECIAL = {False: re.compile("'"), True: re.compile(r"['\\]")}
+
+# Where each skipped construct ends; a string's end is found by _string_end().
+# "\\'" stands for the end of a string with backslash escapes.
+SQL_SKIP_END = {"--": "\n", "/*": "*/", "E'": "\\'", "e'": "\\'"}
+
+# Longest token (a quoted identifier, say) worth waiting for more input to finish
+SQL_MAX_TOKEN = 4096
+
+# Tokens kept per statement; a CREATE TABLE never comes near this
+SQL_MAX_STATEMENT = 50000
+
+SQL_DDL_START = {"CREATE", "ALTER", "DROP", "COPY"}
+
+
+class SqlTokenizer:
+    """(kind, value, line, col) tokens from SQL text arriving in chunks.
+
+    kind is word, ident (a "quoted" or `quoted` identifier, unquoted),
+    number, string (value dropped) or punct. At most one chunk plus
+    SQL_MAX_TOKEN characters are buffered at a time.
+
+    Strings are standard SQL: '' is the only escape, so Postgres' 'C:\\'
+    ends at its second quote. Backslash escapes apply in E'...' strings,
+    and in every string once a `backquoted` identifier shows the file is
+    MySQL, whose dumps rely on them.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.base = 0           # offset of buf[0] in the file
+        self.line = 1
+        self.line_start = 0     # offset where the current line starts
+        self.skip = None        # what ends the construct being skipped
+        self.skim = False       # pass over plain text in runs, not as tokens
+        self.backslash = False  # MySQL: backslash escapes in every string
+        self.final = False
+
+    def _fill(self):
+        """Append the next chunk, dropping what was consumed; False at the end."""
+        if self.final:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.final = True
+            return False
+        self.base += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _advance(self, to):
+        nl = self.buf.count("\n", self.pos, to)
+        if nl:
+            self.line += nl
+            self.line_start = self.base + self.buf.rfind("\n", self.pos, to) + 1
+        self.pos = to
+
+    def _string_end(self, escapes):
+        """(end, None) past a string's closing quote, or (None, resume) if input ran out."""
+        buf, i = self.buf, self.pos
+        special = SQL_STRING_SPECIAL[escapes]
+        while True:
+            m = special.search(buf, i)
+            if m is None:
+                return None, len(buf)
+            j = m.start()
+            if j + 1 == len(buf) and not self.final:
+                return None, j
+            if buf[j] == "\\" or buf[j + 1:j + 2] == "'":
+                i = j + 2
+            else:
+                return j + 1, None
+
+    def _skip_some(self):
+        """Skip as much of the current construct as the buffer holds."""
+        if self.skip in ("'", "\\'"):
+            end, resume = self._string_end(self.skip == "\\'")
+        else:
+            i = self.buf.find(self.skip, self.pos)
+            end = i + len(self.skip) if i != -1 else None
+            resume = max(self.pos, len(self.buf) - len(self.skip) + 1)
+        if end is not None:
+            self._advance(end)
+            self.skip = None
+            return
+        self._advance(resume)
+        if not self._fill():
+            # Unterminated at the end of the file
+            self._advance(len(self.buf))
+            self.skip = None
+
+    def skip_past(self, terminator):
+        """Skip raw text up to and including terminator (e.g. COPY data)."""
+        self.skip = terminator
+
+    def __iter__(self):
+        while True:
+            if self.skip is not None:
+                self._skip_some()
+                continue
+            if self.pos >= len(self.buf) and not self._fill():
+                return
+            if self.skim:
+                m = SQL_SKIM[self.backslash].match(self.buf, self.pos)
+                # A trailing E may open an E'...' string in the next chunk
+                if m and m.end() == len(self.buf) and self.buf[-1] in "eE" and self._fill():
+                    continue
+                if m:
+                    self._advance(m.end())
+                    continue
+            m = SQL_TOKEN.match(self.buf, self.pos)
+            kind = m.lastgroup
+            # A token ending at (or, for a "" escape, one short of) the end
+            # of the buffer, or a quote or $tag$ that didn't close, may just
+            # be cut off by the chunk boundary
+            unclosed = kind == "punct" and m.group() in "\"`$"
+            if not self.final and (m.end() + 1 >= len(self.buf) or unclosed) \
+                    and len(self.buf) - self.pos < SQL_MAX_TOKEN:
+                if self._fill():
+                    continue
+            line, col = self.line, self.base + self.pos - self.line_start + 1
+            if kind == "skip":
+                opener = m.group()
+                if opener == "'" and self.backslash:
+                    opener = "E'"
+                self.skip = SQL_SKIP_END.get(opener, opener)
+                self._advance(m.end())
+                if opener.endswith("'"):
+                    yield "string", "", line, col
+                continue
+            self._advance(m.end())
+            if kind == "space":
+                continue
+            if kind == "quoted":
+                yield "ident", m.group("quoted").replace('""', '"'), line, col
+            elif kind == "backquoted":
+                self.backslash = True
+                yield "ident", m.group("backquoted"), line, col
+            else:
+                yield kind, m.group(), line, col
+
+
+def sql_statements(tokenizer):
+    """Yield (tokens, line, col) for each DDL statement, tokens as (kind, value).
+
+    Other statements (INSERTs, function calls, ...) are skimmed up to their
+    ";" without being tokenized; the data of COPY ... FROM stdin is skipped
+    up to its \\. line.
+    """
+    stmt = None
+    started = False
+    for kind, value, line, col in tokenizer:
+        if kind == "punct" and value == ";":
+            tokenizer.skim = False
+            if stmt is not None:
+                tokens = stmt[0]
+                if tokens[0][1].upper() == "COPY":
+                    if any(k == "word" and v.upper() == "STDIN" for k, v in tokens):
+                        tokenizer.skip_past("\n\\.")
+                else:
+                    yield stmt
+            stmt = None
+            started = False
+            continue
+        if not started:
+            started = True
+            if kind == "word" and value.upper() in SQL_DDL_START:
+                stmt = ([], line, col)
+            else:
+                tokenizer.skim = True
+        if stmt is not None and len(stmt[0]) < SQL_MAX_STATEMENT:
+            stmt[0].append((kind, value))
+    if stmt is not None and stmt[0][0][1].upper() != "COPY":
+        yield stmt
+
+
+class _Ddl:
+    """A cursor over one statement's (kind, value) tokens."""
+
+    __slots__ = ("tokens", "i")
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self, ahead=0):
+        """The bare word ahead, upper-cased, or None for any other token."""
+        j = self.i + ahead
+        if j < len(self.tokens) and self.tokens[j][0] == "word":
+            return self.tokens[j][1].upper()
+        return None
+
+    def accept(self, *words):
+        """Consume words if they come next, in order."""
+        if all(self.peek(n) == w for n, w in enumerate(words)):
+            self.i += len(words)
+            return True
+        return False
+
+    def punct(self, char):
+        if self.i < len(self.tokens) and self.tokens[self.i] == ("punct", char):
+            self.i += 1
+            return True
+        return False
+
+    def name(self):
+        """An identifier, possibly schema-qualified: its last part, or None."""
+        name = None
+        while self.i < len(self.tokens) and self.tokens[self.i][0] in ("word", "ident"):
+            name = self.tokens[self.i][1]
+            self.i += 1
+            if not self.punct("."):
+                break
+        return name
+
+    def group(self):
+        """The items of a parenthesized list, or None if no "(" comes next."""
+        if not self.punct("("):
+            return None
+        start, depth = self.i, 0
+        while self.i < len(self.tokens):
+            kind, value = self.tokens[self.i]
+            self.i += 1
+            if kind == "punct" and value in "()":
+                if value == ")" and depth == 0:
+                    return _split(self.tokens[start:self.i - 1])
+                depth += 1 if value == "(" else -1
+        return _split(self.tokens[start:])
+
+    def rest(self):
+        return self.tokens[self.i:]
+
+
+def _split(tokens):
+    """Token lists split at top-level commas, empty ones dropped."""
+    items, item, depth = [], [], 0
+    for tok in tokens:
+        if tok[0] == "punct":
+            if tok[1] == "(":
+                depth += 1
+            elif tok[1] == ")":
+                depth -= 1
+            elif tok[1] == "," and depth == 0:
+                items.append(item)
+                item = []
+                continue
+        item.append(tok)
+    items.append(item)
+    return [item for item in items if item]
+
+
+def _render(tokens):
+    """Tokens back to SQL text, e.g. numeric(10, 2)."""
+    out = ""
+    for kind, value in tokens:
+        text = "''" if kind == "string" else value
+        if out and text not in ("(", ")", "[", "]", ",", ".") and out[-1] not in "([.":
+            out += " "
+        out += text
+    return out
+
+
+def _column_names(items):
+    """Index or key columns: a name (ordering and opclass dropped) or an expression."""
+    names = []
+    for item in items:
+        if item[0][0] in ("word", "ident") and item[1:2] != [("punct", "(")]:
+            names.append(item[0][1])
+        else:
+            names.append(_render(item))
+    return names
+
+
+# Words that end a column's type and start its constraints
+COLUMN_CONSTRAINTS = {"NOT", "NULL", "DEFAULT", "PRIMARY", "REFERENCES", "UNIQUE", "CHECK",
+                      "CONSTRAINT", "GENERATED", "COLLATE", "AUTO_INCREMENT", "AUTOINCREMENT",
+                      "COMMENT", "ON", "AS", "IDENTITY"}
+
+
+def _starts_list(c, ahead):
+    """Whether a "(" opening a list of names (not a type's length or precision) is ahead."""
+    j = c.i + ahead
+    return c.tokens[j:j + 1] == [("punct", "(")] and \
+        j + 1 < len(c.tokens) and c.tokens[j + 1][0] in ("word", "ident")
+
+
+def _table_constraint(c):
+    """Whether the item at the cursor is a table constraint rather than a column.
+
+    KEY, INDEX, CHECK, LIKE and the rest are also common column names, so a
+    word only starts a constraint when what follows it fits, e.g. KEY (a) or
+    KEY name (a) but not key TEXT or key varchar(10).
+    """
+    word = c.peek()
+    if word == "CONSTRAINT":
+        return c.peek(2) in ("PRIMARY", "UNIQUE", "CHECK", "FOREIGN", "EXCLUDE")
+    if word in ("PRIMARY", "FOREIGN"):
+        return c.peek(1) == "KEY"
+    if word == "CHECK":
+        return c.tokens[c.i + 1:c.i + 2] == [("punct", "(")]
+    if word == "EXCLUDE":
+        return c.peek(1) == "USING" or c.tokens[c.i + 1:c.i + 2] == [("punct", "(")]
+    if word == "LIKE":
+        probe = _Ddl(c.tokens)
+        probe.i = c.i + 1
+        return probe.name() is not None and \
+            (probe.i == len(probe.tokens) or probe.peek() in ("INCLUDING", "EXCLUDING"))
+    if word not in ("UNIQUE", "KEY", "INDEX", "FULLTEXT", "SPATIAL"):
+        return False
+    ahead = 2 if word in ("UNIQUE", "FULLTEXT", "SPATIAL") and c.peek(1) in ("KEY", "INDEX") else 1
+    if _starts_list(c, ahead):
+        return True
+    if c.i + ahead >= len(c.tokens) or c.tokens[c.i + ahead][0] not in ("word", "ident"):
+        return False
+    return _starts_list(c, ahead + 1) or c.peek(ahead + 1) == "USING" and _starts_list(c, ahead + 3)
+
+
+def _definition(tokens, column=False):
+    """What one item of a CREATE TABLE list (or ALTER TABLE ADD) defines.
+
+    ("column", {"name", "type"}, inline primary key, inline unique),
+    ("primary_key", columns, constraint name), ("index", index) or None.
+    With column set the item is always read as a column definition.
+    """
+    c = _Ddl(tokens)
+    if column or not _table_constraint(c):
+        name = c.name()
+        if name is None:
+            return None
+        start = c.i
+        while c.i < len(tokens) and c.peek() not in COLUMN_CONSTRAINTS:
+            c.i += 1
+        words = [v.upper() for k, v in c.rest() if k == "word"]
+        primary = any(a == "PRIMARY" and b == "KEY" for a, b in zip(words, words[1:]))
+        return "column", {"name": name, "type": _render(tokens[start:c.i])}, primary, "UNIQUE" in words
+    constraint = c.name() if c.accept("CONSTRAINT") else None
+    if c.accept("PRIMARY", "KEY"):
+        return "primary_key", _column_names(c.group() or []), constraint
+    unique = c.accept("UNIQUE")
+    if unique or c.peek() in ("KEY", "INDEX", "FULLTEXT", "SPATIAL"):
+        c.accept("FULLTEXT") or c.accept("SPATIAL")
+        c.accept("KEY") or c.accept("INDEX")
+        name = constraint or (c.name() if c.tokens[c.i:c.i + 1] != [("punct", "(")] else None)
+        if c.accept("USING"):
+            c.name()
+        return "index", {"name": name, "columns": _column_names(c.group() or []), "unique": unique}
+    return None
+
+
+def _create_table(c):
+    if_not_exists = c.accept("IF", "NOT", "EXISTS")
+    name = c.name()
+    items = c.group()
+    if name is None or items is None:
+        return None
+    table = {"type": "sql_table", "table_name": name, "columns": []}
+    if if_not_exists:
+        table["if_not_exists"] = True
+    for item in items:
+        what = _definition(item)
+        if what is None:
+            continue
+        if what[0] == "column":
+            _, column, primary, unique = what
+            table["columns"].append(column)
+            if primary:
+                table["primary_key"] = [column["name"]]
+            if unique:
+                table.setdefault("indexes", []).append(
+                    {"name": None, "columns": [column["name"]], "unique": True})
+        elif what[0] == "primary_key":
+            table["primary_key"] = what[1]
+            if what[2]:
+                table["primary_key_name"] = what[2]
+        else:
+            table.setdefault("indexes", []).append(what[1])
+    return table
+
+
+def _create_index(c, unique):
+    c.accept("FULLTEXT") or c.accept("SPATIAL")
+    if not c.accept("INDEX"):
+        return None
+    c.accept("CONCURRENTLY")
+    c.accept("IF", "NOT", "EXISTS")
+    name = None if c.peek() == "ON" else c.name()
+    if not c.accept("ON"):
+        return None
+    c.accept("ONLY")
+    table = c.name()
+    if c.accept("USING"):
+        c.name()
+    columns = c.group()
+    if table is None or columns is None:
+        return None
+    return {"type": "sql_index", "index_name": name, "table_name": table,
+            "columns": _column_names(columns), "unique": unique}
+
+
+def _alter_action(tokens):
+    """One ALTER TABLE action as {"op": ...}, or None for ones that don't change the schema."""
+    c = _Ddl(tokens)
+    if c.accept("ADD"):
+        column = c.accept("COLUMN")
+        if column or not _table_constraint(c):
+            c.accept("IF", "NOT", "EXISTS")
+        what = _definition(c.rest(), column)
+        if what is None:
+            return None
+        if what[0] == "column":
+            return {"op": "add_column", "column": what[1], "primary_key": what[2], "unique": what[3]}
+        if what[0] == "primary_key":
+            return {"op": "add_primary_key", "columns": what[1], "name": what[2]}
+        return {"op": "add_index", "index": what[1]}
+    if c.accept("DROP"):
+        if c.accept("PRIMARY", "KEY"):
+            return {"op": "drop_primary_key"}
+        if c.accept("CONSTRAINT"):
+            c.accept("IF", "EXISTS")
+            return {"op": "drop_constraint", "name": c.name()}
+        if c.accept("INDEX") or c.accept("KEY"):
+            return {"op": "drop_index", "name": c.name()}
+        c.accept("COLUMN")
+        c.accept("IF", "EXISTS")
+        return {"op": "drop_column", "name": c.name()}
+    if c.accept("RENAME"):
+        if c.accept("TO") or c.accept("AS"):
+            return {"op": "rename_table", "to": c.name()}
+        if c.peek() in ("INDEX", "KEY", "CONSTRAINT"):
+            return None
+        c.accept("COLUMN")
+        old = c.name()
+        return {"op": "rename_column", "from": old, "to": c.name()} if c.accept("TO") else None
+    if c.accept("ALTER"):
+        c.accept("COLUMN")
+        name = c.name()
+        if c.accept("TYPE") or c.accept("SET", "DATA", "TYPE"):
+            rest = c.rest()
+            end = next((i for i, (k, v) in enumerate(rest)
+                        if k == "word" and v.upper() in ("USING", "COLLATE")), len(rest))
+            return {"op": "set_type", "name": name, "type": _render(rest[:end])}
+        return None
+    if c.accept("MODIFY") or c.peek() == "CHANGE":
+        old = None
+        if c.accept("CHANGE"):
+            c.accept("COLUMN")
+            old = c.name()
+        else:
+            c.accept("COLUMN")
+        what = _definition(c.rest())
+        if what is None or what[0] != "column":
+            return None
+        return {"op": "change_column", "from": old or what[1]["name"], "column": what[1]}
+    return None
+
+
+def parse_ddl(tokens):
+    """The findings (minus file and position) one DDL statement makes."""
+    c = _Ddl(tokens)
+    if c.accept("CREATE"):
+        c.accept("OR", "REPLACE")
+        unique = c.accept("UNIQUE")
+        if c.peek() in ("INDEX", "FULLTEXT", "SPATIAL"):
+            index = _create_index(c, unique)
+            return [index] if index else []
+        while c.peek() in ("TEMP", "TEMPORARY", "UNLOGGED", "GLOBAL", "LOCAL"):
+            c.i += 1
+        table = _create_table(c) if c.accept("TABLE") else None
+        return [table] if table else []
+    if c.accept("ALTER", "TABLE"):
+        c.accept("IF", "EXISTS")
+        c.accept("ONLY")
+        name = c.name()
+        actions = [a for a in map(_alter_action, _split(c.rest())) if a is not None]
+        if name is None or not actions:
+            return []
+        return [{"type": "sql_alter_table", "table_name": name, "actions": actions}]
+    if c.accept("DROP", "TABLE"):
+        c.accept("IF", "EXISTS")
+        return [{"type": "sql_drop_table", "table_name": name} for name in _names(c.rest())]
+    if c.accept("DROP", "INDEX"):
+        c.accept("CONCURRENTLY")
+        c.accept("IF", "EXISTS")
+        return [{"type": "sql_drop_index", "index_name": name} for name in _names(c.rest())]
+    return []
+
+
+def _names(tokens):
+    """The names in a DROP statement's comma-separated list (CASCADE and the like ignored)."""
+    names = (_Ddl(item).name() for item in _split(tokens))
+    return [name for name in names if name is not None]
+
+
+def _migration_order(rel):
+    """Sort key putting migration files in filename order, numbers compared as numbers."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", rel)]
+
+
+SQL_DDL_TYPES = {"sql_table", "sql_alter_table", "sql_drop_table", "sql_index", "sql_drop_index"}
+
+
+def replay_schema(findings):
+    """The tables a repo's SQL ends up with, replaying its DDL findings in migration order.
+
+    Files are applied in filename order and statements in file order.
+    Returns [{"table_name", "columns", "primary_key", "indexes", "file",
+    "files"}], where file is the one whose CREATE TABLE last defined the
+    table and files all those that shaped it.
+    """
+    tables = {}
+
+    def table(name):
+        return tables.get(name.lower()) if name else None
+
+    for f in sorted((f for f in findings if f["type"] in SQL_DDL_TYPES),
+                    key=lambda f: _migration_order(f["file"])):
+        ftype = f["type"]
+        t = table(f.get("table_name"))
+        if ftype == "sql_table":
+            if t is not None and f.get("if_not_exists"):
+                continue
+            tables[f["table_name"].lower()] = {
+                "table_name": f["table_name"],
+                "columns": [dict(col) for col in f["columns"]],
+                "primary_key": list(f.get("primary_key", [])),
+                "primary_key_name": f.get("primary_key_name") or f"{f['table_name']}_pkey",
+                "indexes": [dict(ix) for ix in f.get("indexes", [])],
+                "file": f["file"],
+                "files": [f["file"]],
+            }
+            continue
+        if ftype == "sql_drop_index":
+            for t in tables.values():
+                if _drop_index(t, f["index_name"]):
+                    _touch(t, f["file"])
+                    break
+            continue
+        if t is None:
+            continue
+        _touch(t, f["file"])
+        if ftype == "sql_drop_table":
+            del tables[f["table_name"].lower()]
+        elif ftype == "sql_index":
+            if f["index_name"] is not None:
+                _drop_index(t, f["index_name"])
+            t["indexes"].append({"name": f["index_name"], "columns": f["columns"],
+                                 "unique": f["unique"]})
+        else:
+            for action in f["actions"]:
+                t = _apply_action(tables, t, action)
+
+    return [{k: v for k, v in t.items() if k != "primary_key_name"} for t in tables.values()]
+
+
+def _touch(t, rel):
+    if t["files"][-1] != rel:
+        t["files"].append(rel)
+
+
+def _drop_index(t, name):
+    kept = [ix for ix in t["indexes"] if ix["name"] is None or ix["name"].lower() != name.lower()]
+    dropped = len(kept) != len(t["indexes"])
+    t["indexes"] = kept
+    return dropped
+
+
+def _apply_action(tables, t, action):
+    """Apply one ALTER TABLE action to table t; returns the table, renamed or not."""
+    op = action["op"]
+    if op == "add_column":
+        column = action["column"]
+        if not any(c["name"].lower() == column["name"].lower() for c in t["columns"]):
+            t["columns"].append(dict(column))
+        if action["primary_key"]:
+            t["primary_key"] = [column["name"]]
+        if action["unique"]:
+            t["indexes"].append({"name": None, "columns": [column["name"]], "unique": True})
+    elif op == "drop_column":
+        name = (action["name"] or "").lower()
+        t["columns"] = [c for c in t["columns"] if c["name"].lower() != name]
+        t["primary_key"] = [c for c in t["primary_key"] if c.lower() != name]
+        # Indexes on a dropped column go with it
+        t["indexes"] = [ix for ix in t["indexes"]
+                        if name not in (c.lower() for c in ix["columns"])]
+    elif op in ("rename_column", "change_column"):
+        old = (action["from"] or "").lower()
+        new = action["to"] if op == "rename_column" else action["column"]["name"]
+        for c in t["columns"]:
+            if c["name"].lower() == old:
+                c["name"] = new
+                if op == "change_column":
+                    c["type"] = action["column"]["type"]
+        t["primary_key"] = [new if c.lower() == old else c for c in t["primary_key"]]
+        for ix in t["indexes"]:
+            ix["columns"] = [new if c.lower() == old else c for c in ix["columns"]]
+    elif op == "set_type":
+        for c in t["columns"]:
+            if c["name"].lower() == (action["name"] or "").lower():
+                c["type"] = action["type"]
+    elif op == "add_primary_key":
+        t["primary_key"] = list(action["columns"])
+        if action["name"]:
+            t["primary_key_name"] = action["name"]
+    elif op == "drop_primary_key":
+        t["primary_key"] = []
+    elif op == "add_index":
+        t["indexes"].append(dict(action["index"]))
+    elif op in ("drop_constraint", "drop_index") and action["name"]:
+        if op == "drop_constraint" and action["name"].lower() == t["primary_key_name"].lower():
+            t["primary_key"] = []
+        else:
+            _drop_index(t, action["name"])
+    elif op == "rename_table" and action["to"]:
+        del tables[t["table_name"].lower()]
+        t["table_name"] = action["to"]
+        tables[action["to"].lower()] = t
+    return t
 
-# ── Scanners ────────────────────────────────────────────────
 
-def scan_wrangler_toml(repo_path):
-    """Extract all Cloudflare bindings from wrangler.toml files."""
+# ── Scanners ────────────────────────────────────────────────
+#
+# Each scanner takes one file: (tree, rel, content), where content is the
+# decoded file if it fits in READ_LIMIT and None otherwise, in which case
+# the scanner reads or streams it itself. SCANNERS says which files each
+# one wants, so a repo is listed once for all of them.
+
+# Output fields of each wrangler binding type, "?" when the config lacks one
+WRANGLER_FIELDS = {
+    "r2_bucket": ("binding", "bucket_name"),
+    "kv_namespace": ("binding", "id"),
+    "d1_database": ("binding", "database_name"),
+    "durable_object": ("name", "class_name"),
+    "queue_producer": ("binding", "queue"),
+    "queue_consumer": ("queue",),
+    "hyperdrive": ("binding",),
+    "analytics_engine": ("binding",),
+    "service_binding": ("binding", "service"),
+}
+
+WRANGLER_NOTES = {
+    "hyperdrive": "Cloudflare Hyperdrive = Postgres connection pooler",
+}
+
+
+def scan_wrangler_config(tree, rel, content=None):
+    """Extract all Cloudflare bindings from a wrangler config.
+
+    Bindings declared under [env.*] carry that environment's name.
+    """
     findings = []
-    for wf in Path(repo_path).rglob("wrangler.toml"):
-        if should_skip(wf):
-            continue
-        content = read_file_safe(str(wf))
-        rel = str(wf.relative_to(repo_path))
-
-        # R2 buckets
-        for m in re.finditer(r'\[\[r2_buckets\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            bucket = re.search(r'bucket_name\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "r2_bucket",
-                "binding": binding.group(1) if binding else "?",
-                "bucket_name": bucket.group(1) if bucket else "?",
-                "file": rel,
-            })
+    config = tree.parsed(rel, WranglerConfig.read, content)
+    with budgeted(findings, "scan_wrangler_config", rel):
+        for b in config.bindings():
+            finding = {"type": b.type}
+            for field in WRANGLER_FIELDS[b.type]:
+                value = b.fields.get(field)
+                finding[field] = value if isinstance(value, str) else "?"
+            if b.env is not None:
+                finding["env"] = b.env
+            finding.update(file=rel, **config.at(b.pos))
+            if b.type in WRANGLER_NOTES:
+                finding["note"] = WRANGLER_NOTES[b.type]
+            findings.append(finding)
 
-        # KV namespaces
-        for m in re.finditer(r'\[\[kv_namespaces\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            ns_id = re.search(r'id\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "kv_namespace",
-                "binding": binding.group(1) if binding else "?",
-                "id": ns_id.group(1) if ns_id else "?",
-                "file": rel,
-            })
+    return findings
 
-        # D1 databases
-        for m in re.finditer(r'\[\[d1_databases\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            db_name = re.search(r'database_name\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "d1_database",
-                "binding": binding.group(1) if binding else "?",
-                "database_name": db_name.group(1) if db_name else "?",
-                "file": rel,
-            })
 
-        # Durable objects
-        for m in re.finditer(r'\[durable_objects\](.*?)(?=\n\[(?!\[)|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            for dm in re.finditer(r'name\s*=\s*"([^"]+)"', block):
+# SST config files and stack files
+SST_PATHS = PathSpec(["sst.config.*", "stacks/**/*.ts", "stacks/**/*.js",
+                      "infra/**/*.ts", "infra/**/*.js"])
+
+
+def scan_sst_config(tree, rel, content=None):
+    """Scan SST/CDK stack definitions for DynamoDB tables, S3 buckets, SQS queues."""
+    findings = []
+    content = read_file_safe(tree, rel, content)
+    lines = LineIndex(content)
+    with budgeted(findings, "scan_sst_config", rel):
+        # DynamoDB tables
+        for m in re.finditer(r'(?:new\s+)?(?:sst\.)?Table\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
+            findings.append({"type": "dynamodb_table", "name": m.group(1), "file": rel,
+                             **lines.at(m.start())})
+
+        # Also look for Table with fields
+        for m in re.finditer(r'Table\s*\([^)]{0,2000}\)\s*\{[^}]{0,2000}fields\s*:\s*\{([^}]{1,2000})\}', content, re.DOTALL):
+            fields_block = m.group(1)
+            fields = re.findall(r'(\w+)\s*:\s*["\'](\w+)["\']', fields_block)
+            if fields:
                 findings.append({
-                    "type": "durable_object",
-                    "name": dm.group(1),
+                    "type": "dynamodb_schema",
+                    "fields": {f: t for f, t in fields},
                     "file": rel,
+                    **lines.at(m.start()),
                 })
 
-        # Queues (producers + consumers)
-        for m in re.finditer(r'\[\[queues\.producers\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            queue = re.search(r'queue\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "queue_producer",
-                "binding": binding.group(1) if binding else "?",
-                "queue": queue.group(1) if queue else "?",
-                "file": rel,
-            })
+        # S3 Buckets
+        for m in re.finditer(r'(?:new\s+)?(?:sst\.)?Bucket\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
+            findings.append({"type": "s3_bucket", "name": m.group(1), "file": rel,
+                             **lines.at(m.start())})
 
-        for m in re.finditer(r'\[\[queues\.consumers\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            queue = re.search(r'queue\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "queue_consumer",
-                "queue": queue.group(1) if queue else "?",
-                "file": rel,
-            })
+        # SQS Queues
+        for m in re.finditer(r'(?:new\s+)?(?:sst\.)?Queue\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
+            findings.append({"type": "sqs_queue", "name": m.group(1), "file": rel,
+                             **lines.at(m.start())})
 
-        # Hyperdrive (Postgres proxy)
-        for m in re.finditer(r'\[\[hyperdrive\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "hyperdrive",
-                "binding": binding.group(1) if binding else "?",
-                "file": rel,
-                "note": "Cloudflare Hyperdrive = Postgres connection pooler",
-            })
+        # RDS / Aurora
+        for m in re.finditer(r'(?:new\s+)?(?:sst\.)?RDS\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
+            findings.append({"type": "rds_database", "name": m.group(1), "file": rel,
+                             **lines.at(m.start())})
 
-        # Analytics engine
-        for m in re.finditer(r'\[\[analytics_engine_datasets\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "analytics_engine",
-                "binding": binding.group(1) if binding else "?",
-                "file": rel,
-            })
-
-        # Services (worker-to-worker bindings)
-        for m in re.finditer(r'\[\[services\]\]\s*\n(.*?)(?=\n\[|\n\[\[|\Z)', content, re.DOTALL):
-            block = m.group(1)
-            binding = re.search(r'binding\s*=\s*"([^"]+)"', block)
-            service = re.search(r'service\s*=\s*"([^"]+)"', block)
-            findings.append({
-                "type": "service_binding",
-                "binding": binding.group(1) if binding else "?",
-                "service": service.group(1) if service else "?",
-                "file": rel,
-            })
+        # EventBus
+        for m in re.finditer(r'(?:new\s+)?(?:sst\.)?EventBus\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
+            findings.append({"type": "event_bus", "name": m.group(1), "file": rel,
+                             **lines.at(m.start())})
 
     return findings
 
 
-def scan_sst_config(repo_path):
-    """Scan SST/CDK stack definitions for DynamoDB tables, S3 buckets, SQS queues."""
+# (resource type substrings, category), first match wins; anything else is "other"
+TERRAFORM_CATEGORIES = (
+    (("dynamodb",), "dynamodb"),
+    (("s3",), "s3"),
+    (("sqs",), "sqs"),
+    (("rds", "aurora"), "rds"),
+    (("elasticache", "redis"), "redis"),
+    (("ecs",), "ecs"),
+    (("lambda",), "lambda"),
+    (("cloudfront",), "cloudfront"),
+    (("route53",), "dns"),
+    (("iam",), "iam"),
+    (("vpc", "subnet"), "networking"),
+)
+
+
+def scan_terraform(tree, rel, content=None):
+    """Extract resources from a Terraform file."""
     findings = []
+    with budgeted(findings, "scan_terraform", rel):
+        for content, lines, stop in read_windows(tree, rel, content):
+            for m in re.finditer(r'resource\s+"([^"]+)"\s+"([^"]+)"', content):
+                if m.start() >= stop:
+                    break
+                res_type = m.group(1)
+                res_name = m.group(2)
 
-    # SST config files and stack files
-    patterns = ["sst.config.*", "stacks/**/*.ts", "stacks/**/*.js",
-                "infra/**/*.ts", "infra/**/*.js"]
+                category = next((cat for words, cat in TERRAFORM_CATEGORIES
+                                 if any(w in res_type for w in words)), "other")
 
-    for pattern in patterns:
-        for fpath in Path(repo_path).rglob(pattern.replace("**/*", "*")):
-            if should_skip(fpath) or fpath.suffix not in (".ts", ".js", ".mjs"):
-                continue
-            content = read_file_safe(str(fpath))
-            rel = str(fpath.relative_to(repo_path))
-
-            # DynamoDB tables
-            for m in re.finditer(r'(?:new\s+)?(?:sst\.)?Table\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
-                findings.append({"type": "dynamodb_table", "name": m.group(1), "file": rel})
-
-            # Also look for Table with fields
-            for m in re.finditer(r'Table\s*\([^)]*\)\s*\{[^}]*fields\s*:\s*\{([^}]+)\}', content, re.DOTALL):
-                fields_block = m.group(1)
-                fields = re.findall(r'(\w+)\s*:\s*["\'](\w+)["\']', fields_block)
-                if fields:
-                    findings.append({
-                        "type": "dynamodb_schema",
-                        "fields": {f: t for f, t in fields},
-                        "file": rel,
-                    })
+                findings.append({
+                    "type": f"terraform_{category}",
+                    "resource_type": res_type,
+                    "name": res_name,
+                    "file": rel,
+                    **lines.at(m.start()),
+                })
 
-            # S3 Buckets
-            for m in re.finditer(r'(?:new\s+)?(?:sst\.)?Bucket\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
-                findings.append({"type": "s3_bucket", "name": m.group(1), "file": rel})
+    return findings
 
-            # SQS Queues
-            for m in re.finditer(r'(?:new\s+)?(?:sst\.)?Queue\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
-                findings.append({"type": "sqs_queue", "name": m.group(1), "file": rel})
 
-            # RDS / Aurora
-            for m in re.finditer(r'(?:new\s+)?(?:sst\.)?RDS\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
-                findings.append({"type": "rds_database", "name": m.group(1), "file": rel})
+def scan_sql_migrations(tree, rel, content=None):
+    """The DDL statements of one SQL file, in order, for replay_schema().
 
-            # EventBus
-            for m in re.finditer(r'(?:new\s+)?(?:sst\.)?EventBus\s*\(\s*(?:stack\s*,\s*)?["\']([^"\']+)["\']', content):
-                findings.append({"type": "event_bus", "name": m.group(1), "file": rel})
+    Large files are tokenized as they stream in, so no size limit applies.
+    """
+    findings = []
+    if content is not None:
+        chunks = [content]
+    elif skip_file(tree, rel):
+        return findings
+    else:
+        SCAN_STATS["over_read_limit"] += 1
+        chunks = tree.iter_text(rel)
+    with budgeted(findings, "scan_sql_migrations", rel):
+        for tokens, line, col in sql_statements(SqlTokenizer(chunks)):
+            for finding in parse_ddl(tokens):
+                findings.append({**finding, "file": rel, "line": line, "col": col})
 
     return findings
 
 
-def scan_terraform(repo_path):
-    """Extract resources from Terraform files."""
+GO_DB_DRIVERS = {
+    "github.com/lib/pq": "postgres",
+    "github.com/jackc/pgx": "postgres",
+    "gorm.io/gorm": "orm (gorm)",
+    "gorm.io/driver/postgres": "postgres (gorm)",
+    "gorm.io/driver/sqlite": "sqlite (gorm)",
+    "github.com/mattn/go-sqlite3": "sqlite",
+    "go.mongodb.org/mongo-driver": "mongodb",
+    "github.com/go-redis/redis": "redis",
+    "github.com/redis/go-redis": "redis",
+    "github.com/aws/aws-sdk-go": "aws_sdk",
+    "github.com/aws/aws-sdk-go-v2": "aws_sdk_v2",
+    "github.com/ipfs/go-datastore": "ipfs_datastore",
+    "github.com/dgraph-io/badger": "badger",
+    "go.etcd.io/bbolt": "bbolt",
+    "github.com/cockroachdb/pebble": "pebble",
+}
+
+
+def scan_go_database_usage(tree, rel, content=None):
+    """Find database drivers in the repo's go.mod."""
     findings = []
-    for tf in Path(repo_path).rglob("*.tf"):
-        if should_skip(tf):
-            continue
-        content = read_file_safe(str(tf))
-        rel = str(tf.relative_to(repo_path))
-
-        for m in re.finditer(r'resource\s+"([^"]+)"\s+"([^"]+)"', content):
-            res_type = m.group(1)
-            res_name = m.group(2)
-
-            # Classify
-            category = "other"
-            if "dynamodb" in res_type: category = "dynamodb"
-            elif "s3" in res_type: category = "s3"
-            elif "sqs" in res_type: category = "sqs"
-            elif "rds" in res_type or "aurora" in res_type: category = "rds"
-            elif "elasticache" in res_type or "redis" in res_type: category = "redis"
-            elif "ecs" in res_type: category = "ecs"
-            elif "lambda" in res_type: category = "lambda"
-            elif "cloudfront" in res_type: category = "cloudfront"
-            elif "route53" in res_type: category = "dns"
-            elif "iam" in res_type: category = "iam"
-            elif "vpc" in res_type or "subnet" in res_type: category = "networking"
+    content = read_file_safe(tree, rel, content)
+    lines = LineIndex(content)
 
+    for driver, db_type in GO_DB_DRIVERS.items():
+        if driver in content:
             findings.append({
-                "type": f"terraform_{category}",
-                "resource_type": res_type,
-                "name": res_name,
+                "type": f"go_driver_{db_type}",
+                "driver": driver,
                 "file": rel,
+                **locate(content, lines, driver),
             })
 
     return findings
 
 
-def scan_sql_migrations(repo_path):
-    """Find SQL migration files and extract table definitions."""
+JS_DB_PACKAGES = {
+    "@aws-sdk/client-dynamodb": "dynamodb",
+    "@aws-sdk/lib-dynamodb": "dynamodb",
+    "@aws-sdk/client-s3": "s3",
+    "@aws-sdk/client-sqs": "sqs",
+    "pg": "postgres",
+    "postgres": "postgres",
+    "@neondatabase/serverless": "postgres_neon",
+    "drizzle-orm": "orm (drizzle)",
+    "kysely": "orm (kysely)",
+    "prisma": "orm (prisma)",
+    "@prisma/client": "orm (prisma)",
+    "better-sqlite3": "sqlite",
+    "sql.js": "sqlite",
+    "ioredis": "redis",
+    "redis": "redis",
+    "@upstash/redis": "redis_upstash",
+    "mongodb": "mongodb",
+    "mongoose": "mongodb",
+}
+
+
+def scan_js_database_usage(tree, rel, content=None):
+    """Find database packages in a package.json."""
     findings = []
+    try:
+        text = read_file_safe(tree, rel, content)
+        pkg = json.loads(text)
+    except:
+        return findings
+    lines = LineIndex(text)
 
-    for sql in Path(repo_path).rglob("*.sql"):
-        if should_skip(sql):
-            continue
-        content = read_file_safe(str(sql))
-        rel = str(sql.relative_to(repo_path))
-
-        for m in re.finditer(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"\']?(\w+)[`"\']?\s*\(([^;]+)\)', content, re.IGNORECASE | re.DOTALL):
-            table_name = m.group(1)
-            columns_block = m.group(2)
-            columns = []
-            for col in re.finditer(r'^\s*[`"\']?(\w+)[`"\']?\s+(\w+(?:\([^)]*\))?)', columns_block, re.MULTILINE):
-                col_name = col.group(1)
-                col_type = col.group(2)
-                if col_name.upper() not in ("PRIMARY", "UNIQUE", "INDEX", "CONSTRAINT", "FOREIGN", "CHECK"):
-                    columns.append({"name": col_name, "type": col_type})
+    all_deps = {}
+    for key in ["dependencies", "devDependencies", "peerDependencies"]:
+        all_deps.update(pkg.get(key, {}))
 
+    for dep_name, db_type in JS_DB_PACKAGES.items():
+        if dep_name in all_deps:
             findings.append({
-                "type": "sql_table",
-                "table_name": table_name,
-                "columns": columns,
+                "type": f"js_dep_{db_type}",
+                "package": dep_name,
+                "version": all_deps[dep_name],
                 "file": rel,
+                **locate(text, lines, f'"{dep_name}"'),
             })
 
     return findings
 
 
-def scan_go_database_usage(repo_path):
-    """Find database drivers and connection patterns in Go code."""
-    findings = []
+ENV_FILE_NAMES = (".env", ".env.example", ".env.local", ".env.template",
+                  ".dev.vars", ".dev.vars.example")
 
-    gomod = Path(repo_path) / "go.mod"
-    if gomod.exists():
-        content = read_file_safe(str(gomod))
-
-        db_drivers = {
-            "github.com/lib/pq": "postgres",
-            "github.com/jackc/pgx": "postgres",
-            "gorm.io/gorm": "orm (gorm)",
-            "gorm.io/driver/postgres": "postgres (gorm)",
-            "gorm.io/driver/sqlite": "sqlite (gorm)",
-            "github.com/mattn/go-sqlite3": "sqlite",
-            "go.mongodb.org/mongo-driver": "mongodb",
-            "github.com/go-redis/redis": "redis",
-            "github.com/redis/go-redis": "redis",
-            "github.com/aws/aws-sdk-go": "aws_sdk",
-            "github.com/aws/aws-sdk-go-v2": "aws_sdk_v2",
-            "github.com/ipfs/go-datastore": "ipfs_datastore",
-            "github.com/dgraph-io/badger": "badger",
-            "go.etcd.io/bbolt": "bbolt",
-            "github.com/cockroachdb/pebble": "pebble",
-        }
-
-        for driver, db_type in db_drivers.items():
-            if driver in content:
-                findings.append({
-                    "type": f"go_driver_{db_type}",
-                    "driver": driver,
-                    "file": "go.mod",
-                })
+INFRA_ENV_PATTERNS = [
+    (re.compile(r'(DATABASE_URL|DB_URL|POSTGRES_URL|PG_URL)'), "database_url"),
+    (re.compile(r'(REDIS_URL|REDIS_HOST|CACHE_URL)'), "redis"),
+    (re.compile(r'(S3_BUCKET|AWS_BUCKET|BUCKET_NAME|R2_BUCKET)'), "bucket"),
+    (re.compile(r'(SQS_QUEUE|QUEUE_URL)'), "queue"),
+    (re.compile(r'(DYNAMO(?:DB)?_TABLE|TABLE_NAME)'), "dynamodb"),
+    (re.compile(r'(MONGODB_URI|MONGO_URL)'), "mongodb"),
+    (re.compile(r'(RPC_URL|ETH_RPC|WEB3_PROVIDER)'), "blockchain_rpc"),
+]
 
-    return findings
 
-
-def scan_js_database_usage(repo_path):
-    """Find database packages in package.json files."""
+def scan_env_vars(tree, rel, content=None):
+    """Find env vars that reference infrastructure, in .env files and wrangler [vars]."""
     findings = []
 
-    for pjson in Path(repo_path).rglob("package.json"):
-        if should_skip(pjson) or "node_modules" in str(pjson):
-            continue
-        try:
-            with open(pjson) as f:
-                pkg = json.load(f)
-        except:
-            continue
-
-        rel = str(pjson.relative_to(repo_path))
-        all_deps = {}
-        for key in ["dependencies", "devDependencies", "peerDependencies"]:
-            all_deps.update(pkg.get(key, {}))
-
-        db_packages = {
-            "@aws-sdk/client-dynamodb": "dynamodb",
-            "@aws-sdk/lib-dynamodb": "dynamodb",
-            "@aws-sdk/client-s3": "s3",
-            "@aws-sdk/client-sqs": "sqs",
-            "pg": "postgres",
-            "postgres": "postgres",
-            "@neondatabase/serverless": "postgres_neon",
-            "drizzle-orm": "orm (drizzle)",
-            "kysely": "orm (kysely)",
-            "prisma": "orm (prisma)",
-            "@prisma/client": "orm (prisma)",
-            "better-sqlite3": "sqlite",
-            "sql.js": "sqlite",
-            "ioredis": "redis",
-            "redis": "redis",
-            "@upstash/redis": "redis_upstash",
-            "mongodb": "mongodb",
-            "mongoose": "mongodb",
-        }
-
-        for dep_name, db_type in db_packages.items():
-            if dep_name in all_deps:
-                findings.append({
-                    "type": f"js_dep_{db_type}",
-                    "package": dep_name,
-                    "version": all_deps[dep_name],
-                    "file": rel,
-                })
-
-    return findings
-
-
-def scan_env_vars(repo_path):
-    """Find env vars that reference infrastructure."""
-    findings = []
-    infra_patterns = [
-        (r'(DATABASE_URL|DB_URL|POSTGRES_URL|PG_URL)', "database_url"),
-        (r'(REDIS_URL|REDIS_HOST|CACHE_URL)', "redis"),
-        (r'(S3_BUCKET|AWS_BUCKET|BUCKET_NAME|R2_BUCKET)', "bucket"),
-        (r'(SQS_QUEUE|QUEUE_URL)', "queue"),
-        (r'(DYNAMO(?:DB)?_TABLE|TABLE_NAME)', "dynamodb"),
-        (r'(MONGODB_URI|MONGO_URL)', "mongodb"),
-        (r'(RPC_URL|ETH_RPC|WEB3_PROVIDER)', "blockchain_rpc"),
-    ]
-
-    for fpath in Path(repo_path).rglob("*"):
-        if should_skip(fpath):
-            continue
-        if fpath.name in (".env", ".env.example", ".env.local", ".env.template",
-                          ".dev.vars", ".dev.vars.example"):
-            content = read_file_safe(str(fpath))
-            rel = str(fpath.relative_to(repo_path))
-            for pattern, category in infra_patterns:
-                for m in re.finditer(pattern, content):
+    if posixpath.basename(rel) in WRANGLER_NAMES:
+        config = tree.parsed(rel, WranglerConfig.read, content)
+        for name, value, env, pos in config.vars():
+            for pattern, category in INFRA_ENV_PATTERNS:
+                m = pattern.search(name)
+                if m:
                     findings.append({
                         "type": f"env_{category}",
                         "var": m.group(1),
                         "file": rel,
+                        **config.at(pos),
                     })
+        return findings
 
-    # Also scan wrangler.toml [vars]
-    for wf in Path(repo_path).rglob("wrangler.toml"):
-        if should_skip(wf):
-            continue
-        content = read_file_safe(str(wf))
-        rel = str(wf.relative_to(repo_path))
-        for pattern, category in infra_patterns:
-            for m in re.finditer(pattern, content):
-                findings.append({
-                    "type": f"env_{category}",
-                    "var": m.group(1),
-                    "file": rel,
-                })
+    content = read_file_safe(tree, rel, content)
+    lines = LineIndex(content)
+    for pattern, category in INFRA_ENV_PATTERNS:
+        for m in pattern.finditer(content):
+            findings.append({
+                "type": f"env_{category}",
+                "var": m.group(1),
+                "file": rel,
+                **lines.at(m.start()),
+            })
 
     return findings
 
 
-def scan_docker_compose(repo_path):
-    """Extract services from docker-compose files."""
+def scan_docker_compose(tree, rel, content=None):
+    """Extract services from a docker-compose file."""
     findings = []
-    for dc in Path(repo_path).rglob("docker-compose*"):
-        if should_skip(dc):
-            continue
-        try:
-            content = yaml.safe_load(read_file_safe(str(dc)))
-            rel = str(dc.relative_to(repo_path))
-            if content and "services" in content:
-                for svc_name, svc_config in content["services"].items():
-                    image = svc_config.get("image", "")
-                    findings.append({
-                        "type": "docker_service",
-                        "name": svc_name,
-                        "image": image,
-                        "file": rel,
-                    })
-        except:
-            continue
+    try:
+        text = read_file_safe(tree, rel, content)
+        lines = LineIndex(text)
+        content = yaml.safe_load(text)
+        if content and "services" in content:
+            for svc_name, svc_config in content["services"].items():
+                image = svc_config.get("image", "")
+                findings.append({
+                    "type": "docker_service",
+                    "name": svc_name,
+                    "image": image,
+                    "file": rel,
+                    **locate(text, lines, f"{svc_name}:"),
+                })
+    except:
+        pass
 
     return findings
 
 
+def _suffix(*suffixes):
+    return lambda rel, fname: fname.endswith(suffixes)
+
+
+# (scanner, wants(rel, file name)), in the order findings are reported
+SCANNERS = (
+    (scan_wrangler_config, lambda rel, fname: fname in WRANGLER_NAMES),
+    (scan_sst_config, lambda rel, fname: fname.endswith((".ts", ".js", ".mjs"))
+                                         and SST_PATHS.match(rel)),
+    (scan_terraform, _suffix(".tf")),
+    (scan_sql_migrations, _suffix(".sql")),
+    (scan_go_database_usage, lambda rel, fname: rel == "go.mod"),
+    (scan_js_database_usage, lambda rel, fname: fname == "package.json"),
+    (scan_env_vars, lambda rel, fname: fname in ENV_FILE_NAMES or fname in WRANGLER_NAMES),
+    (scan_docker_compose, lambda rel, fname: fname.startswith("docker-compose")),
+)
+
+
+def scanners_for(rel, fname):
+    """The scanners that want a file, in SCANNERS order."""
+    return tuple(scanner for scanner, wants in SCANNERS if wants(rel, fname))
+
+
+def scan_file(tree, rel, scanners, data=None):
+    """{scanner name: findings} for one file; data is its first READ_LIMIT + 1 bytes, if read.
+
+    The file is read and classified once for all the scanners that want it;
+    with --profile, each of them is charged for that read.
+    Files where a scanner ran out of time budget also get a TIMEOUT_KEY
+    entry, so a FindingsCache leaves them to be retried.
+    """
+    if data is None:
+        data = tree.read_bytes(rel, READ_LIMIT + 1)
+    if skip_file(tree, rel, data):
+        return {}
+    content = data.decode("utf-8", errors="ignore") if len(data) <= READ_LIMIT else None
+    found = {}
+    for scanner in scanners:
+        with PROFILER.scope(scanner.__name__) as profile:
+            # Handed the shared read, or charged by the tree for reading itself
+            if content is not None:
+                PROFILER.share(len(data))
+            findings = scanner(tree, rel, content)
+            profile["matches"] += len(findings)
+        if findings:
+            found[scanner.__name__] = findings
+    timeouts = [f for fs in found.values() for f in fs if f["type"] == "rule_timeout"]
+    if timeouts:
+        found[TIMEOUT_KEY] = timeouts
+    return found
+
+
+def scan_repo(repo_path, cache=None, ref=None, only=None):
+    """Run every infrastructure scanner over one repo (at ref, if given).
+
+    The repo is listed once and each file handed to the scanners that want
+    it. With a FindingsCache, files whose content is unchanged since a
+    previous run reuse their stored findings. With only, the scanners see
+    just those repo-relative paths.
+    """
+    by_scanner = {scanner.__name__: [] for scanner, _ in SCANNERS}
+    with open_tree(repo_path, ref, only) as tree:
+        for rel, fname in tree.files(SKIP_DIRS):
+            scanners = scanners_for(rel, fname)
+            if not scanners:
+                continue
+            scan = partial(scan_file, tree, rel, scanners)
+            if cache is None:
+                found = scan()
+            else:
+                found = cached_scan(cache, tree, repo_path, rel, scan, READ_LIMIT)
+                if found is None:
+                    continue
+            for name, findings in found.items():
+                if name != TIMEOUT_KEY:
+                    by_scanner[name].extend(findings)
+
+    if cache is not None:
+        cache.flush()
+    return [f for findings in by_scanner.values() for f in findings]
+
+
+def open_cache(args):
+    """Build the findings cache from CLI args (None when disabled)."""
+    if args.no_cache:
+        return None
+    version = file_digest(__file__) + file_digest(scanlib.__file__)
+    return FindingsCache(args.cache_dir / "infra.sqlite", version,
+                         args.cache_size_mb * 1024 * 1024)
+
+
+def scan_changes(repo_path, since, cache=None, ref=None):
+    """Findings for just the files changed since a ref, to patch into a previous map."""
+    changed = changed_paths(repo_path, since, ref)
+    return {"changed": sorted(changed), "found": scan_repo(repo_path, cache, ref, only=changed)}
+
+
+def patch_result(previous, delta):
+    """Apply a scan_changes() delta to a repo's findings from a previous map.
+
+    Findings in changed files (including deleted ones) are dropped and the
+    fresh ones appended.
+    """
+    findings = list(previous or [])
+    if delta is None:
+        return findings
+    changed = set(delta["changed"])
+    return [f for f in findings if f["file"] not in changed] + delta["found"]
+
+
+# ── Summary ─────────────────────────────────────────────────
+#
+# Every finding type the scanners emit, declared once with the summary
+# category it counts under and how its detail line is built. Types with no
+# category (schemas, timeouts) stay in the per-repo detail only.
+
+class FindingKind:
+    """A finding type's place in the summary.
+
+    detail is a format string over the finding's fields; missing fields
+    show as "?".
+    """
+
+    __slots__ = ("type", "category", "detail")
+
+    def __init__(self, type, category, detail):
+        self.type = type
+        self.category = category
+        self.detail = detail
+
+    def describe(self, finding):
+        return self.detail.format_map(_Fields(finding))
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return "?"
+
+
+# Summary category of each database kind the go.mod and package.json scanners report
+DB_CATEGORIES = {
+    "postgres": "PostgreSQL",
+    "postgres (gorm)": "PostgreSQL",
+    "postgres_neon": "PostgreSQL",
+    "sqlite": "SQLite",
+    "sqlite (gorm)": "SQLite",
+    "redis": "Redis",
+    "redis_upstash": "Redis",
+    "mongodb": "MongoDB",
+    "dynamodb": "DynamoDB",
+    "s3": "S3/R2 Buckets",
+    "sqs": "Queues",
+    "orm (gorm)": "ORMs",
+    "orm (drizzle)": "ORMs",
+    "orm (kysely)": "ORMs",
+    "orm (prisma)": "ORMs",
+    "aws_sdk": "AWS SDK",
+    "aws_sdk_v2": "AWS SDK",
+    "ipfs_datastore": "IPFS Datastore",
+    "badger": "Embedded KV Store",
+    "bbolt": "Embedded KV Store",
+    "pebble": "Embedded KV Store",
+}
+
+# Terraform resources of a kind the summary tracks count there; the rest
+# under "Terraform: <category>"
+TERRAFORM_SUMMARY = {
+    "dynamodb": "DynamoDB",
+    "s3": "S3/R2 Buckets",
+    "sqs": "Queues",
+    "rds": "RDS / Aurora",
+    "redis": "Redis",
+}
+
+# Env vars name infrastructure rather than declare it, so they are summarized
+# apart from the resources themselves
+ENV_SUMMARY = {
+    "blockchain_rpc": "Blockchain RPC",
+}
+
+FINDING_KINDS = {kind.type: kind for kind in [
+    FindingKind("r2_bucket", "S3/R2 Buckets", "{bucket_name}"),
+    FindingKind("kv_namespace", "KV Stores", "{binding}"),
+    FindingKind("d1_database", "D1 Databases", "{database_name}"),
+    FindingKind("durable_object", "Durable Objects", "{name}"),
+    FindingKind("queue_producer", "Queues", "{queue}"),
+    FindingKind("queue_consumer", "Queues", "{queue}"),
+    FindingKind("hyperdrive", "Hyperdrive (Postgres)", "{binding}"),
+    FindingKind("analytics_engine", "Analytics", "{binding}"),
+    FindingKind("service_binding", "Service Bindings", "{binding} → {service}"),
+    FindingKind("dynamodb_table", "DynamoDB", "{name}"),
+    FindingKind("dynamodb_schema", None, ""),
+    FindingKind("s3_bucket", "S3/R2 Buckets", "{name}"),
+    FindingKind("sqs_queue", "Queues", "{name}"),
+    FindingKind("rds_database", "RDS / Aurora", "{name}"),
+    FindingKind("event_bus", "Event Bus", "{name}"),
+    *(FindingKind(f"terraform_{cat}", TERRAFORM_SUMMARY[cat], "{name}") for cat in TERRAFORM_SUMMARY),
+    *(FindingKind(f"terraform_{cat}", f"Terraform: {cat}", "{resource_type}.{name}")
+      for cat in [cat for _, cat in TERRAFORM_CATEGORIES if cat not in TERRAFORM_SUMMARY] + ["other"]),
+    # SQL Tables are summarized from the replayed schemas, not per statement
+    *(FindingKind(ftype, None, "") for ftype in sorted(SQL_DDL_TYPES)),
+    *(FindingKind(f"go_driver_{db}", DB_CATEGORIES[db], "{driver}") for db in GO_DB_DRIVERS.values()),
+    *(FindingKind(f"js_dep_{db}", DB_CATEGORIES[db], "{package}") for db in JS_DB_PACKAGES.values()),
+    *(FindingKind(f"env_{cat}", ENV_SUMMARY.get(cat, "Infra Env Vars"), "{var}")
+      for _, cat in INFRA_ENV_PATTERNS),
+    FindingKind("docker_service", "Docker Services", "{name} ({image})"),
+    FindingKind("rule_timeout", None, ""),
+]}
+
+
+def summarize(results):
+    """{category: {detail: set of repos}} over every repo's findings."""
+    summary = defaultdict(lambda: defaultdict(set))
+    for name, findings in results.items():
+        for f in findings:
+            kind = FINDING_KINDS.get(f["type"])
+            if kind is not None and kind.category is not None:
+                summary[kind.category][kind.describe(f)].add(name)
+    return summary
+
+
 # ── Main ────────────────────────────────────────────────────
 
+def _brief(d):
+    """One dict from a finding's list field, in a few words."""
+    if "op" in d:
+        return d["op"] + "".join(f" {_brief(v) if isinstance(v, dict) else v}"
+                                 for k, v in d.items() if k != "op" and v not in (None, False))
+    if "columns" in d:
+        return _index_line(d)
+    return f"{d['name']}:{d['type']}"
+
+
+def _index_line(ix):
+    unique = "UNIQUE " if ix["unique"] else ""
+    name = f"{ix['name']} " if ix["name"] else ""
+    return f"{unique}INDEX {name}({', '.join(ix['columns'])})"
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Scan repos for databases, storage, queues and other infrastructure."
+    )
+    add_jobs_argument(parser)
+    add_stream_arguments(parser, OUTPUT_DIR / "infrastructure-map.ndjson")
+    add_cache_arguments(parser, CACHE_DIR)
+    add_source_arguments(parser)
+    add_since_argument(parser)
+    add_profile_argument(parser)
+    add_budget_argument(parser)
+    args = parser.parse_args()
+    set_rule_budget(args.rule_budget)
+    stream = stream_path(args, OUTPUT_DIR / "infrastructure-map.ndjson")
+    cache = open_cache(args)
+
     print("=" * 70)
     print("  INFRASTRUCTURE SCANNER")
     print("  Discovering databases, storage, queues from source code")
@@ -450,102 +1357,48 @@ def main():
         config = yaml.safe_load(f)
 
     analyze_list = [r for r in config.get("analyze", []) if r["name"] not in DROP_REPOS]
+    repos = [(ri["name"], REPOS_DIR / ri["name"]) for ri in analyze_list]
+    repos = [(name, rp) for name, rp in repos if rp.exists()]
 
     all_findings = defaultdict(list)  # repo_name → [findings]
-    infra_summary = defaultdict(lambda: defaultdict(set))  # category → {detail → set of repos}
-
-    for i, ri in enumerate(analyze_list):
-        name = ri["name"]
-        rp = REPOS_DIR / name
-        if not rp.exists():
-            continue
-
-        sys.stdout.write(f"\r   [{i+1}/{len(analyze_list)}] {name:40s}")
-        sys.stdout.flush()
-
-        repo_findings = []
-
-        # Run all scanners
-        repo_findings.extend(scan_wrangler_toml(rp))
-        repo_findings.extend(scan_sst_config(rp))
-        repo_findings.extend(scan_terraform(rp))
-        repo_findings.extend(scan_sql_migrations(rp))
-        repo_findings.extend(scan_go_database_usage(rp))
-        repo_findings.extend(scan_js_database_usage(rp))
-        repo_findings.extend(scan_env_vars(rp))
-        repo_findings.extend(scan_docker_compose(rp))
 
+    if args.since:
+        previous = load_per_repo(OUTPUT_DIR / "infrastructure-map.json")
+        if previous is None:
+            parser.error("--since patches an existing infrastructure-map.json; "
+                         "run a full scan first")
+        scan = partial(scan_changes, since=args.since, cache=cache, ref=source_ref(args))
+    else:
+        scan = partial(scan_repo, cache=cache, ref=source_ref(args))
+    profile = {} if args.profile else None
+    stats = {}
+    try:
+        results = scan_repos(scan, repos, args.jobs, stream=stream, resume=args.resume,
+                             profile=profile, stats=stats, mode=stream_mode(args))
+    except StreamMismatch as exc:
+        parser.error(str(exc))
+    if args.since:
+        # Repos whose diff failed keep their previous findings
+        results = {name: patch_result(previous.get(name), results.get(name))
+                   for name, _ in repos}
+    if cache is not None:
+        cache.evict()
+
+    for name, repo_findings in results.items():
         if repo_findings:
             all_findings[name] = repo_findings
 
-        # Build summary
-        for f in repo_findings:
-            ftype = f["type"]
-            if "dynamodb" in ftype:
-                detail = f.get("name", f.get("var", "?"))
-                infra_summary["DynamoDB"][detail].add(name)
-            elif "s3" in ftype or "bucket" in ftype:
-                detail = f.get("name", f.get("bucket_name", f.get("var", "?")))
-                infra_summary["S3/R2 Buckets"][detail].add(name)
-            elif "r2" in ftype:
-                detail = f.get("bucket_name", f.get("binding", "?"))
-                infra_summary["S3/R2 Buckets"][detail].add(name)
-            elif "kv" in ftype:
-                detail = f.get("binding", "?")
-                infra_summary["KV Stores"][detail].add(name)
-            elif "d1" in ftype:
-                detail = f.get("database_name", f.get("binding", "?"))
-                infra_summary["D1 Databases"][detail].add(name)
-            elif "postgres" in ftype:
-                detail = f.get("driver", f.get("package", f.get("var", "postgres")))
-                infra_summary["PostgreSQL"][detail].add(name)
-            elif "redis" in ftype:
-                detail = f.get("driver", f.get("package", f.get("var", "redis")))
-                infra_summary["Redis"][detail].add(name)
-            elif "sqlite" in ftype:
-                detail = f.get("driver", f.get("package", "sqlite"))
-                infra_summary["SQLite"][detail].add(name)
-            elif "sqs" in ftype or "queue" in ftype:
-                detail = f.get("name", f.get("queue", f.get("var", "?")))
-                infra_summary["Queues"][detail].add(name)
-            elif "event_bus" in ftype:
-                detail = f.get("name", "?")
-                infra_summary["Event Bus"][detail].add(name)
-            elif "durable_object" in ftype:
-                detail = f.get("name", "?")
-                infra_summary["Durable Objects"][detail].add(name)
-            elif "analytics_engine" in ftype:
-                detail = f.get("binding", "?")
-                infra_summary["Analytics"][detail].add(name)
-            elif "hyperdrive" in ftype:
-                detail = f.get("binding", "?")
-                infra_summary["Hyperdrive (Postgres)"][detail].add(name)
-            elif "service_binding" in ftype:
-                detail = f"{f.get('binding', '?')} → {f.get('service', '?')}"
-                infra_summary["Service Bindings"][detail].add(name)
-            elif "docker_service" in ftype:
-                detail = f"{f.get('name', '?')} ({f.get('image', '?')})"
-                infra_summary["Docker Services"][detail].add(name)
-            elif "sql_table" in ftype:
-                detail = f.get("table_name", "?")
-                infra_summary["SQL Tables"][detail].add(name)
-            elif "terraform" in ftype:
-                detail = f"{f.get('resource_type', '?')}.{f.get('name', '?')}"
-                cat = ftype.replace("terraform_", "Terraform: ")
-                infra_summary[cat][detail].add(name)
-            elif "ipfs_datastore" in ftype:
-                infra_summary["IPFS Datastore"][f.get("driver", "go-datastore")].add(name)
-            elif "badger" in ftype or "bbolt" in ftype or "pebble" in ftype:
-                detail = f.get("driver", "?")
-                infra_summary["Embedded KV Store"][detail].add(name)
-            elif "aws_sdk" in ftype:
-                infra_summary["AWS SDK"][f.get("driver", "?")].add(name)
-            elif "blockchain_rpc" in ftype:
-                infra_summary["Blockchain RPC"][f.get("var", "?")].add(name)
-            elif "mongodb" in ftype:
-                infra_summary["MongoDB"][f.get("driver", f.get("package", "?"))].add(name)
-
-    print(f"\n\n   Found infrastructure in {len(all_findings)} repos\n")
+    # Each repo's migrations replayed into the tables they leave behind
+    sql_schemas = {name: replay_schema(findings) for name, findings in all_findings.items()}
+    sql_tables = [(name, table) for name in sorted(sql_schemas) for table in sql_schemas[name]]
+
+    infra_summary = summarize(all_findings)
+    for name, table in sql_tables:
+        infra_summary["SQL Tables"][table["table_name"]].add(name)
+
+    print(f"\n\n   Found infrastructure in {len(all_findings)} repos")
+    scan_stats = report_stats(stats)
+    print()
 
     # ── Report ──────────────────────────────────────────────
     report = []
@@ -585,28 +1438,21 @@ def main():
             for item in items:
                 parts = []
                 for k, v in item.items():
-                    if k in ("type",):
+                    if k in ("type", "line", "col"):
                         continue
-                    if isinstance(v, list):
-                        if v and isinstance(v[0], dict):
-                            # columns
-                            cols_str = ", ".join(f"{c['name']}:{c['type']}" for c in v[:8])
-                            if len(v) > 8:
-                                cols_str += f"... (+{len(v)-8} more)"
-                            parts.append(f"{k}=[{cols_str}]")
-                        else:
-                            parts.append(f"{k}={v}")
+                    if k == "file" and "line" in item:
+                        v = f"{v}:{item['line']}"
+                    if isinstance(v, list) and v and isinstance(v[0], dict):
+                        # columns, indexes, ALTER TABLE actions
+                        items_str = ", ".join(_brief(d) for d in v[:8])
+                        if len(v) > 8:
+                            items_str += f"... (+{len(v)-8} more)"
+                        parts.append(f"{k}=[{items_str}]")
                     else:
                         parts.append(f"{k}={v}")
                 report.append(f"    {', '.join(parts)}")
 
     # SQL table schemas
-    sql_tables = []
-    for name, findings in all_findings.items():
-        for f in findings:
-            if f["type"] == "sql_table":
-                sql_tables.append((name, f))
-
     if sql_tables:
         report.append(f"\n\n{'=' * 70}")
         report.append("  SQL TABLE SCHEMAS")
@@ -614,8 +1460,14 @@ def main():
         for repo, table in sql_tables:
             report.append(f"\n  📦 {repo} / {table['file']}")
             report.append(f"  TABLE: {table['table_name']}")
-            for col in table.get("columns", []):
+            for col in table["columns"]:
                 report.append(f"    {col['name']:30s} {col['type']}")
+            if table["primary_key"]:
+                report.append(f"    PRIMARY KEY ({', '.join(table['primary_key'])})")
+            for ix in table["indexes"]:
+                report.append(f"    {_index_line(ix)}")
+            if len(table["files"]) > 1:
+                report.append(f"    altered in: {', '.join(table['files'][1:])}")
 
     print("\n".join(report))
 
@@ -636,6 +1488,7 @@ def main():
         "sql_schemas": [
             {"repo": repo, **table} for repo, table in sql_tables
         ],
+        "scan_stats": scan_stats,
     }
 
     with open(OUTPUT_DIR / "infrastructure-map.json", "w") as f:
@@ -652,6 +1505,9 @@ def main():
     print(f"     infrastructure-map.txt    ← human-readable")
     print(f"     infrastructure-map.json   ← machine-readable")
 
+    if profile is not None:
+        write_profile("infra", profile, OUTPUT_DIR / "scan-profile.json")
+
 
 if __name__ == "__main__":
     main()
@@ -12,16 +12,22 @@ Discovers from source code:
 
 Groups repos into products based on domain knowledge + dependency analysis.
 
-Run: python3 aidev/scripts/scan_products.py
+Run: python3 aidev/scripts/scan_products.py [--jobs N] [--stream [PATH]] [--resume]
+     [--source git [--ref REF]]
 From: project root (parent of aidev/)
 """
 
+import argparse
 import json
 import os
 import re
-import sys
 from pathlib import Path
 from collections import defaultdict
+from functools import partial
+
+from scanlib import (SCAN_STATS, WRANGLER_NAMES, StreamMismatch, add_jobs_argument,
+                     add_source_arguments, add_stream_arguments, open_tree, report_stats,
+                     scan_repos, skip_file, source_ref, stream_path)
 
 # aidev/scripts/ -> aidev/ -> project root
 AIDEV_DIR = Path(__file__).resolve().parent.parent
@@ -105,22 +111,28 @@ PRODUCT_GROUPS = {
 }
 
 
-def read_file_safe(path, max_bytes=100000):
-    try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read(max_bytes)
-    except Exception:
+# Manifests used to be cut off here, which broke JSON parsing of big ones
+READ_LIMIT = 100000
+
+
+def read_file_safe(tree, rel, max_bytes=None):
+    """Decoded file (up to max_bytes characters), or "" if classify() rejects it."""
+    if skip_file(tree, rel):
         return ""
+    content = tree.read_text(rel, max_bytes)
+    if max_bytes is None and len(content) > READ_LIMIT:
+        SCAN_STATS["over_read_limit"] += 1
+    return content
 
 
-def detect_language(repo_path):
+def detect_language(tree):
     """Detect primary language from repo files."""
-    has_go_mod = (repo_path / "go.mod").exists()
-    has_pkg_json = (repo_path / "package.json").exists()
+    has_go_mod = tree.exists("go.mod")
+    has_pkg_json = tree.exists("package.json")
 
-    go_files = list(repo_path.glob("**/*.go"))[:5]
-    js_files = list(repo_path.glob("**/*.js"))[:5]
-    ts_files = list(repo_path.glob("**/*.ts"))[:5]
+    go_files = list(tree.rglob("*.go"))[:5]
+    js_files = list(tree.rglob("*.js"))[:5]
+    ts_files = list(tree.rglob("*.ts"))[:5]
 
     if has_go_mod or len(go_files) > 0:
         if has_pkg_json or len(js_files) + len(ts_files) > 0:
@@ -131,47 +143,46 @@ def detect_language(repo_path):
     return "Other"
 
 
-def detect_deploy_target(repo_path):
+def detect_deploy_target(tree):
     """Detect deployment target."""
-    if (repo_path / "wrangler.toml").exists() or (repo_path / "wrangler.json").exists():
+    if any(tree.exists(name) for name in WRANGLER_NAMES):
         return "Cloudflare Worker"
-    if (repo_path / "sst.config.ts").exists() or (repo_path / "sst.config.js").exists():
+    if tree.exists("sst.config.ts") or tree.exists("sst.config.js"):
         return "SST (AWS)"
-    if (repo_path / "Dockerfile").exists():
+    if tree.exists("Dockerfile"):
         return "Docker"
-    if any(repo_path.glob("**/serverless.yml")):
+    if any(tree.rglob("serverless.yml")):
         return "Serverless"
-    if any(repo_path.glob("**/*.tf")):
+    if any(tree.rglob("*.tf")):
         return "Terraform"
     return None
 
 
-def detect_monorepo(repo_path):
+def detect_monorepo(tree):
     """Check if repo is a monorepo."""
-    pkg_json_path = repo_path / "package.json"
-    if pkg_json_path.exists():
+    if tree.exists("package.json"):
         try:
-            pkg = json.loads(read_file_safe(str(pkg_json_path)))
+            pkg = json.loads(read_file_safe(tree, "package.json"))
             if "workspaces" in pkg:
                 return True
         except Exception:
             pass
-    if (repo_path / "pnpm-workspace.yaml").exists():
+    if tree.exists("pnpm-workspace.yaml"):
         return True
-    if (repo_path / "lerna.json").exists():
+    if tree.exists("lerna.json"):
         return True
     return False
 
 
-def find_published_packages(repo_path):
+def find_published_packages(tree):
     """Find npm packages published from this repo."""
     packages = []
-    for pkg_json_path in repo_path.rglob("package.json"):
+    for pkg_json_path in tree.rglob("package.json"):
         # Skip node_modules
         if "node_modules" in str(pkg_json_path):
             continue
         try:
-            pkg = json.loads(read_file_safe(str(pkg_json_path)))
+            pkg = json.loads(read_file_safe(tree, pkg_json_path))
             name = pkg.get("name", "")
             private = pkg.get("private", False)
             if name and not private and name.startswith("@"):
@@ -180,9 +191,8 @@ def find_published_packages(repo_path):
             pass
 
     # Go modules
-    go_mod = repo_path / "go.mod"
-    if go_mod.exists():
-        content = read_file_safe(str(go_mod))
+    if tree.exists("go.mod"):
+        content = read_file_safe(tree, "go.mod")
         match = re.search(r'^module\s+(\S+)', content, re.MULTILINE)
         if match:
             packages.append(match.group(1))
@@ -190,16 +200,16 @@ def find_published_packages(repo_path):
     return sorted(set(packages))
 
 
-def find_dependencies(repo_path):
+def find_dependencies(tree):
     """Find all dependency package names."""
     deps = set()
 
     # JS dependencies
-    for pkg_json_path in repo_path.rglob("package.json"):
+    for pkg_json_path in tree.rglob("package.json"):
         if "node_modules" in str(pkg_json_path):
             continue
         try:
-            pkg = json.loads(read_file_safe(str(pkg_json_path)))
+            pkg = json.loads(read_file_safe(tree, pkg_json_path))
             for dep_type in ["dependencies", "devDependencies", "peerDependencies"]:
                 for dep_name in pkg.get(dep_type, {}):
                     if dep_name.startswith(("@storacha/", "@web3-storage/", "@ucanto/",
@@ -209,9 +219,8 @@ def find_dependencies(repo_path):
             pass
 
     # Go dependencies
-    go_mod = repo_path / "go.mod"
-    if go_mod.exists():
-        content = read_file_safe(str(go_mod))
+    if tree.exists("go.mod"):
+        content = read_file_safe(tree, "go.mod")
         for match in re.finditer(r'(github\.com/storacha/\S+)', content):
             mod = match.group(1).split('@')[0]
             deps.add(mod)
@@ -222,9 +231,9 @@ def find_dependencies(repo_path):
     return sorted(deps)
 
 
-def detect_role(name, repo_path, language, deploy_target, packages):
+def detect_role(name, tree, language, deploy_target, packages):
     """Classify repo role."""
-    if any(repo_path.glob("**/*.md")) and not any(repo_path.glob("**/*.js")) and not any(repo_path.glob("**/*.go")):
+    if any(tree.rglob("*.md")) and not any(tree.rglob("*.js")) and not any(tree.rglob("*.go")):
         return "documentation"
 
     if deploy_target == "Cloudflare Worker":
@@ -236,10 +245,10 @@ def detect_role(name, repo_path, language, deploy_target, packages):
 
     if packages and all(p.startswith("@") for p in packages):
         return "library"
-    if any(repo_path.glob("**/cli*")) or any(repo_path.glob("**/bin/*")):
+    if any(tree.rglob("cli*")) or any(tree.rglob("bin/*")):
         return "CLI tool"
 
-    if language == "Go" and (repo_path / "cmd").exists():
+    if language == "Go" and tree.exists("cmd"):
         return "service (Go)"
     if language == "Go":
         return "library (Go)"
@@ -258,21 +267,19 @@ def get_repo_size_mb(repo_path):
     return round(total / 1024 / 1024, 1)
 
 
-def get_description(repo_path):
+def get_description(tree):
     """Get repo description from package.json or README."""
-    pkg_json_path = repo_path / "package.json"
-    if pkg_json_path.exists():
+    if tree.exists("package.json"):
         try:
-            pkg = json.loads(read_file_safe(str(pkg_json_path)))
+            pkg = json.loads(read_file_safe(tree, "package.json"))
             desc = pkg.get("description", "")
             if desc:
                 return desc[:200]
         except Exception:
             pass
 
-    readme = repo_path / "README.md"
-    if readme.exists():
-        content = read_file_safe(str(readme), max_bytes=2000)
+    if tree.exists("README.md"):
+        content = read_file_safe(tree, "README.md", max_bytes=2000)
         lines = [l.strip() for l in content.split("\n") if l.strip() and not l.startswith("#")]
         if lines:
             return lines[0][:200]
@@ -280,7 +287,40 @@ def get_description(repo_path):
     return ""
 
 
+def scan_repo(rp, ref=None):
+    """Collect product-map metadata for one repo (at ref, if given)."""
+    name = rp.name
+    with open_tree(rp, ref) as tree:
+        language = detect_language(tree)
+        deploy_target = detect_deploy_target(tree)
+        is_monorepo = detect_monorepo(tree)
+        packages = find_published_packages(tree)
+        deps = find_dependencies(tree)
+        role = detect_role(name, tree, language, deploy_target, packages)
+        description = get_description(tree)
+
+    return {
+        "name": name,
+        "language": language,
+        "deploy_target": deploy_target,
+        "is_monorepo": is_monorepo,
+        "publishes": packages,
+        "all_deps": deps,
+        "role": role,
+        "description": description,
+    }
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Classify repos into products with language, deploy and dependency metadata."
+    )
+    add_jobs_argument(parser)
+    add_stream_arguments(parser, OUTPUT_DIR / "product-map.ndjson")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    stream = stream_path(args, OUTPUT_DIR / "product-map.ndjson")
+
     print("=" * 70)
     print("  PRODUCT MAP SCANNER")
     print("  Classifying repos into products with metadata")
@@ -293,34 +333,17 @@ def main():
             repo_to_product[rname] = product_name
 
     # Scan all repos
-    all_repos = {}
     repo_dirs = sorted([d for d in REPOS_DIR.iterdir() if d.is_dir() and d.name not in DROP_REPOS])
-
-    for i, rp in enumerate(repo_dirs):
-        name = rp.name
-        sys.stdout.write(f"\r   [{i+1}/{len(repo_dirs)}] {name:40s}")
-        sys.stdout.flush()
-
-        language = detect_language(rp)
-        deploy_target = detect_deploy_target(rp)
-        is_monorepo = detect_monorepo(rp)
-        packages = find_published_packages(rp)
-        deps = find_dependencies(rp)
-        role = detect_role(name, rp, language, deploy_target, packages)
-        description = get_description(rp)
-
-        all_repos[name] = {
-            "name": name,
-            "language": language,
-            "deploy_target": deploy_target,
-            "is_monorepo": is_monorepo,
-            "publishes": packages,
-            "all_deps": deps,
-            "role": role,
-            "description": description,
-        }
+    scan = partial(scan_repo, ref=source_ref(args))
+    stats = {}
+    try:
+        all_repos = scan_repos(scan, [(rp.name, rp) for rp in repo_dirs], args.jobs,
+                               stream=stream, resume=args.resume, stats=stats)
+    except StreamMismatch as exc:
+        parser.error(str(exc))
 
     print(f"\n\n   Scanned {len(all_repos)} repos")
+    scan_stats = report_stats(stats)
 
     # Build package -> publisher mapping
     pkg_publisher = {}
@@ -410,6 +433,7 @@ def main():
             "standalone": len(standalone),
             "downstream_consumers": len(downstream),
         },
+        "scan_stats": scan_stats,
     }
 
     with open(OUTPUT_DIR / "product-map.json", "w") as f:
@@ -0,0 +1,2026 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the scan_*.py scanners.
+
+Not a scanner itself — imported by scan_api_surface.py, scan_infra.py,
+scan_products.py and scan_imports.py (all of them live next to this file, so
+a plain import works when they are run as scripts).
+"""
+
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import tomllib
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from fnmatch import fnmatchcase, translate
+from functools import partial
+from itertools import accumulate
+from pathlib import Path, PurePosixPath
+
+# Sentinel for repos whose scan raised; they are dropped from the results.
+_FAILED = object()
+
+
+def walk_repo(repo_path, skip_dirs, ignore=None):
+    """Yield (abs_path, rel_path, file_name) for every file in a repo.
+
+    Directories named in skip_dirs, or ignored by the repo's .gitignore files
+    (see GitIgnore), are pruned during traversal, so huge trees like
+    node_modules are never descended into. Directory and file order is
+    sorted so scans are deterministic across filesystems.
+    """
+    root = str(repo_path)
+    if ignore is None:
+        ignore = GitIgnore(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        dirnames[:] = sorted(ignore.prune("" if rel_dir == "." else rel_dir.replace(os.sep, "/"),
+                                          [d for d in dirnames if d not in skip_dirs]))
+        for fname in sorted(filenames):
+            rel = fname if rel_dir == "." else os.path.join(rel_dir, fname)
+            yield os.path.join(dirpath, fname), rel, fname
+
+
+class GitIgnore:
+    """A repo's .gitignore files, compiled once per directory on first use.
+
+    ignored() follows git: a directory's .gitignore applies below it, with
+    paths taken relative to that directory; deeper files win over shallower
+    ones (and over .git/info/exclude); within a file the last matching
+    pattern wins, and ! re-includes. Each file compiles into one regex
+    alternation with its patterns in reverse, so the first alternative that
+    matches is the winning pattern and a check costs one match per
+    .gitignore above the path.
+
+    Walkers only ask about directories, so ignored files (.env and friends,
+    which the scanners want) are still read.
+    """
+
+    def __init__(self, repo_path):
+        self.root = str(repo_path)
+        self._chains = {}
+
+    def ignored(self, rel, is_dir=False):
+        """Whether a repo-relative, /-separated path is ignored."""
+        return self._match(self._chain(rel.rpartition("/")[0]), rel, is_dir)
+
+    def prune(self, rel_dir, names):
+        """The subdirectories of rel_dir ("" for the root) that aren't ignored."""
+        chain = self._chain(rel_dir)
+        if not chain:
+            return names
+        prefix = rel_dir + "/" if rel_dir else ""
+        return [d for d in names if not self._match(chain, prefix + d, True)]
+
+    @staticmethod
+    def _match(chain, rel, is_dir):
+        for offset, rules in chain:
+            regex = rules[is_dir]
+            m = regex.fullmatch(rel, offset) if regex is not None else None
+            if m:
+                return m.lastgroup.startswith("x")
+        return False
+
+    def _chain(self, rel_dir):
+        # [(offset of rel_dir's paths, rules)] for rel_dir and each ancestor
+        # with a .gitignore, deepest first; each file is read once
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            chain = self._chain(rel_dir.rpartition("/")[0]) if rel_dir else []
+            lines = []
+            names = (".gitignore",) if rel_dir else (".git/info/exclude", ".gitignore")
+            for name in names:
+                try:
+                    with open(os.path.join(self.root, rel_dir, name), encoding="utf-8",
+                              errors="ignore") as f:
+                        lines.extend(f.read().splitlines())
+                except OSError:
+                    pass
+            if lines:
+                chain = [(len(rel_dir) + 1 if rel_dir else 0, _compile_ignore(lines))] + chain
+            self._chains[rel_dir] = chain
+        return chain
+
+
+def _compile_ignore(lines):
+    """(regex for files, regex for directories) from .gitignore lines."""
+    alternatives = ([], [])
+    for n, line in enumerate(lines):
+        line = re.sub(r"(?<!\\) +$", "", line)
+        if not line or line.startswith("#"):
+            continue
+        kind = "x"
+        if line.startswith("!"):
+            kind, line = "i", line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        anchored = "/" in line
+        source = _ignore_pattern(line.lstrip("/") if anchored else line)
+        alt = f"(?P<{kind}{n}>{source if anchored else '(?:.*/)?' + source})"
+        alternatives[1].append(alt)
+        if not dir_only:
+            alternatives[0].append(alt)
+    return tuple(re.compile("|".join(reversed(alts)), re.DOTALL) if alts else None
+                 for alts in alternatives)
+
+
+class PathSpec:
+    """Glob patterns compiled into one regex over repo-relative paths.
+
+    Patterns use .gitignore syntax: one containing a "/" is anchored at the
+    repo root, so "stacks/**/*.ts" only takes files under a top-level
+    stacks/; a bare name like "sst.config.*" matches at any depth; "**"
+    spans directories. Scanners test paths from one tree.files() walk
+    instead of running an rglob per pattern.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self.regex = re.compile("|".join(
+            _ignore_pattern(p.lstrip("/")) if "/" in p else "(?:.*/)?" + _ignore_pattern(p)
+            for p in self.patterns), re.DOTALL)
+
+    def match(self, rel):
+        """Whether a /-separated repo-relative path matches any pattern."""
+        return self.regex.fullmatch(rel) is not None
+
+
+def _ignore_pattern(pattern):
+    """Regex source for one .gitignore glob, matched against a whole path."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            j = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            # "**" as a whole segment spans directories: "**/x", "a/**/x", "a/**"
+            if j - i >= 2 and (i == 0 or pattern[i - 1] == "/"):
+                if j == n:
+                    out.append(".*")
+                elif pattern[j] == "/":
+                    out.append("(?:.*/)?")
+                    j += 1
+                else:
+                    out.append("[^/]*")
+            else:
+                out.append("[^/]*")
+            i = j
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[" and (end := pattern.find("]", i + 2)) != -1:
+            body = pattern[i + 1:end]
+            if body[:1] in ("!", "^"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+# ── Profiling ───────────────────────────────────────────────
+
+def _counters():
+    return {"seconds": 0.0, "files": 0, "prefiltered": 0, "bytes": 0, "matches": 0}
+
+
+class Profiler:
+    """Counters behind --profile, kept in whichever process runs a scan.
+
+    Scanners wrap each scanner function in scope(); reads through a repo
+    tree are charged to the innermost open scope, and RuleSet records one
+    entry per rule. While disabled (the default) the only cost is an
+    attribute check per file.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.scanners = {}
+        self.rules = {}
+        self.files = 0
+        self.bytes = 0
+        self._scope = None
+
+    @contextmanager
+    def scope(self, name):
+        """Time a scanner function; yields its counters so the caller can add matches."""
+        if not self.enabled:
+            yield _counters()
+            return
+        entry = self.scanners.setdefault(name, _counters())
+        outer, self._scope = self._scope, entry
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            self._scope = outer
+
+    def rule(self, name):
+        return self.rules.setdefault(name, _counters())
+
+    def read(self, nbytes):
+        self.files += 1
+        self.bytes += nbytes
+        if self._scope is not None:
+            self._scope["files"] += 1
+            self._scope["bytes"] += nbytes
+
+    def share(self, nbytes):
+        """Charge the open scope for a file read once, and counted then, for several scanners."""
+        if self._scope is not None:
+            self._scope["files"] += 1
+            self._scope["bytes"] += nbytes
+
+    def snapshot(self, seconds):
+        """This repo's counters, plus its totals."""
+        return {
+            "seconds": seconds,
+            "files": self.files,
+            "bytes": self.bytes,
+            "matches": sum(e["matches"] for e in self.scanners.values()),
+            "scanners": self.scanners,
+            "rules": self.rules,
+        }
+
+
+PROFILER = Profiler()
+
+
+def _profiled(scan_fn, path):
+    # Runs in the worker: returns (result, that repo's profile)
+    PROFILER.enabled = True
+    PROFILER.reset()
+    start = time.perf_counter()
+    result = scan_fn(path)
+    return result, PROFILER.snapshot(time.perf_counter() - start)
+
+
+def add_profile_argument(parser):
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record time, files, bytes and matches per scanner function and rule "
+             "into data/scan-profile.json and print the slowest",
+    )
+
+
+def write_profile(scanner, profile, path, top=15):
+    """Merge per-repo profiles into path under scanner and print a top-N table.
+
+    Other scanners' sections already in the file are kept, so the API and
+    infra scans can each be profiled into the same file.
+    """
+    merged = {"scanners": {}, "rules": {}}
+    for stats in profile.values():
+        for table in ("scanners", "rules"):
+            for name, entry in stats[table].items():
+                total = merged[table].setdefault(name, _counters())
+                for k, v in entry.items():
+                    total[k] += v
+    for table in merged.values():
+        for entry in table.values():
+            entry["seconds"] = round(entry["seconds"], 6)
+    section = {
+        **{table: dict(sorted(entries.items(), key=lambda e: -e[1]["seconds"]))
+           for table, entries in merged.items()},
+        "repos": {
+            name: {"seconds": round(s["seconds"], 6), "files": s["files"],
+                   "bytes": s["bytes"], "matches": s["matches"]}
+            for name, s in sorted(profile.items(), key=lambda e: -e[1]["seconds"])
+        },
+    }
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data[scanner] = section
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+    rows = [(f"{table[:-1]} {name}", e) for table, entries in merged.items()
+            for name, e in entries.items()]
+    rows.sort(key=lambda r: -r[1]["seconds"])
+    print(f"\n   Profile ({scanner}), top {min(top, len(rows))} by time:")
+    print(f"   {'':40s} {'seconds':>9s} {'files':>7s} {'passed':>7s} {'bytes':>11s} {'matches':>8s}")
+    for name, e in rows[:top]:
+        print(f"   {name:40s} {e['seconds']:9.3f} {e['files']:7d} {e['prefiltered']:7d} "
+              f"{e['bytes']:11d} {e['matches']:8d}")
+    print(f"   Written to {path}")
+
+
+# ── Scan stats ──────────────────────────────────────────────
+
+# Always-on per-repo counters (files read in windows, files skipped and
+# why, ...), cheap enough to keep without --profile. Scanners bump them in
+# whichever process scans the repo and scan_repos(stats=...) collects them.
+SCAN_STATS = Counter()
+
+STAT_LABELS = {
+    "over_read_limit": "Files over the old read limit, now read in full",
+    "large_never_decoded": "Files over the read limit with no rule literal, never decoded",
+    "superseded": "Findings dropped as overlapping a more specific rule's",
+}
+
+
+def _counted(scan_fn, path):
+    # Runs in the worker: returns (result, that repo's scan stats)
+    SCAN_STATS.clear()
+    result = scan_fn(path)
+    return result, dict(SCAN_STATS)
+
+
+def report_stats(stats):
+    """Print the non-zero totals of per-repo scan stats; returns the totals."""
+    totals = Counter()
+    for counts in stats.values():
+        totals.update(counts)
+    for name, n in sorted(totals.items()):
+        if n:
+            print(f"   {STAT_LABELS.get(name, name)}: {n}")
+    return dict(sorted(totals.items()))
+
+
+# ── Repo sources ────────────────────────────────────────────
+#
+# Scanners read a repo through a tree object rather than the filesystem
+# directly, so the same detectors run over a checkout (WorkTree) or over the
+# objects committed at some ref (GitTree). Paths are repo-relative; rglob()
+# follows Path.rglob semantics.
+
+READ_CHUNK = 1 << 20
+
+
+class _Tree:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def blob_id(self, rel):
+        """Content id of a file if the source knows it without reading, else None."""
+        return None
+
+    def parsed(self, rel, parse, *args):
+        """parse(self, rel, *args), worked out once per tree, file and parse.
+
+        args only feed the first call, e.g. contents the caller already read.
+        """
+        memo = self.__dict__.setdefault("_parsed", {})
+        if (rel, parse) not in memo:
+            memo[rel, parse] = parse(self, rel, *args)
+        return memo[rel, parse]
+
+    @contextmanager
+    def mapped(self, rel):
+        """The file's bytes memory-mapped, or None if the source can't map them.
+
+        Callers fall back to iter_bytes() on None.
+        """
+        yield None
+
+    def iter_text(self, rel, size=READ_CHUNK):
+        """Decoded contents in chunks of at most size characters.
+
+        Unlike read_text() the whole file is never held at once, and no
+        newline translation is done.
+        """
+        return decode_chunks(self.iter_bytes(rel, size))
+
+
+def decode_chunks(chunks):
+    """UTF-8 byte chunks decoded one at a time, never splitting a character."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def buffer_chunks(buf, size=READ_CHUNK):
+    """A bytes-like buffer (e.g. an mmap) as slices of at most size bytes."""
+    for start in range(0, len(buf), size):
+        yield buf[start:start + size]
+
+
+class WorkTree(_Tree):
+    """A repo's files as currently checked out on disk."""
+
+    def __init__(self, repo_path):
+        self.root = Path(repo_path)
+        self.ignore = GitIgnore(repo_path)
+
+    def files(self, skip_dirs):
+        """Yield (rel_path, file_name) in walk_repo order."""
+        for _, rel, fname in walk_repo(self.root, skip_dirs, self.ignore):
+            yield rel, fname
+
+    def rglob(self, pattern):
+        """Like Path.rglob, in walk_repo order, skipping .git and ignored directories."""
+        pats = [re.compile(translate(p)).match for p in pattern.split("/")]
+        *parents, match = pats
+        root = str(self.root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = dirpath[len(root) + 1:].replace(os.sep, "/")
+            dirnames[:] = sorted(self.ignore.prune(rel_dir, [d for d in dirnames if d != ".git"]))
+            parts = rel_dir.split("/") if rel_dir else []
+            if len(parts) < len(parents) or not all(
+                    m(p) for m, p in zip(parents, parts[len(parts) - len(parents):])):
+                continue
+            for name in sorted(filenames + dirnames):
+                if match(name):
+                    yield Path(rel_dir, name)
+
+    def exists(self, rel):
+        return (self.root / rel).exists()
+
+    def read_bytes(self, rel, limit=None):
+        try:
+            with open(self.root / rel, "rb") as f:
+                data = f.read(limit)
+        except OSError:
+            return b""
+        if PROFILER.enabled:
+            PROFILER.read(len(data))
+        return data
+
+    def iter_bytes(self, rel, size=READ_CHUNK):
+        """Contents in chunks of at most size bytes."""
+        total = 0
+        try:
+            with open(self.root / rel, "rb") as f:
+                while chunk := f.read(size):
+                    total += len(chunk)
+                    yield chunk
+        except OSError:
+            return
+        if PROFILER.enabled:
+            PROFILER.read(total)
+
+    @contextmanager
+    def mapped(self, rel):
+        """The file mapped read-only; b"" if it is empty or can't be opened.
+
+        The mapping is only valid inside the with block.
+        """
+        try:
+            with open(self.root / rel, "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # ValueError: mapping an empty file
+            yield b""
+            return
+        if PROFILER.enabled:
+            PROFILER.read(len(buf))
+        with buf:
+            yield buf
+
+    def read_text(self, rel, limit=None):
+        """Decoded contents; like file.read(), limit counts characters."""
+        try:
+            with open(self.root / rel, "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read(limit)
+        except OSError:
+            return ""
+        if PROFILER.enabled:
+            PROFILER.read(len(text.encode("utf-8")))
+        return text
+
+
+def walk_order(rel):
+    """Sort key reproducing walk_repo's order for a repo-relative path.
+
+    A directory's files (sorted) come before its subdirectories (sorted,
+    each visited depth-first).
+    """
+    *dirs, name = rel.split("/")
+    return tuple((1, d) for d in dirs) + ((0, name),)
+
+
+class _ListedTree(_Tree):
+    """files()/rglob()/exists() over a fixed set of repo-relative file paths."""
+
+    def _index(self, files):
+        self._files = set(files)
+        dirs = set()
+        for rel in self._files:
+            parent = rel.rpartition("/")[0]
+            while parent and parent not in dirs:
+                dirs.add(parent)
+                parent = parent.rpartition("/")[0]
+        self._dirs = dirs
+        self._paths = [(rel, rel.split("/"))
+                       for rel in sorted(self._files | dirs, key=walk_order)]
+
+    def files(self, skip_dirs):
+        """Yield (rel_path, file_name) in walk_repo order, pruning skip_dirs."""
+        for rel, parts in self._paths:
+            if rel in self._files and not any(p in skip_dirs for p in parts[:-1]):
+                yield rel, parts[-1]
+
+    def rglob(self, pattern):
+        pats = pattern.split("/")
+        n = len(pats)
+        for rel, parts in self._paths:
+            if len(parts) >= n and all(map(fnmatchcase, parts[-n:], pats)):
+                yield PurePosixPath(rel)
+
+    def exists(self, rel):
+        rel = str(rel)
+        return rel in self._files or rel in self._dirs
+
+
+class GitTree(_ListedTree):
+    """A repo's files as committed at ref, read from the git object store.
+
+    The tree is listed once with `git ls-tree` and blob contents are streamed
+    through one long-lived `git cat-file --batch` process, so nothing in the
+    working tree is opened: untracked and ignored files never show up, the
+    scan is reproducible at a commit, and any branch can be scanned without
+    checking it out. Symlinks and submodules are not followed. Given paths,
+    only those are listed.
+    """
+
+    def __init__(self, repo_path, ref="HEAD", paths=None):
+        self.root = Path(repo_path)
+        self.ref = ref
+        self.blobs = {}
+        if paths is None:
+            self._list([])
+        else:
+            paths = sorted(paths)
+            # Chunked to stay well under the command-line length limit
+            for i in range(0, len(paths), 500):
+                self._list(["--", *paths[i:i + 500]])
+        self._index(self.blobs)
+        self._batch = None
+
+    def _list(self, pathspec):
+        listing = subprocess.run(
+            ["git", "--literal-pathspecs", "-C", str(self.root),
+             "ls-tree", "-r", "-z", "--full-tree", self.ref, *pathspec],
+            capture_output=True,
+        )
+        if listing.returncode != 0:
+            raise RuntimeError(f"git ls-tree {self.ref}: "
+                               + listing.stderr.decode(errors="replace").strip())
+        for entry in listing.stdout.split(b"\0"):
+            if not entry:
+                continue
+            meta, _, name = entry.partition(b"\t")
+            mode, kind, oid = meta.split()
+            if kind != b"blob" or mode == b"120000":
+                continue
+            self.blobs[os.fsdecode(name)] = oid.decode()
+
+    def close(self):
+        if self._batch is not None:
+            self._batch.stdin.close()
+            self._batch.wait()
+            self._batch = None
+
+    def blob_id(self, rel):
+        return self.blobs.get(str(rel))
+
+    def _request(self, rel):
+        """Ask cat-file for a blob; returns its size, or None if there is none."""
+        oid = self.blobs.get(str(rel))
+        if oid is None:
+            return None
+        if self._batch is None:
+            self._batch = subprocess.Popen(
+                ["git", "-C", str(self.root), "cat-file", "--batch"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            )
+        self._batch.stdin.write(oid.encode() + b"\n")
+        self._batch.stdin.flush()
+        header = self._batch.stdout.readline().split()
+        if len(header) != 3:
+            return None
+        return int(header[2])
+
+    def _drain(self, rest):
+        # Skip the rest of the object and its trailing newline so the next
+        # request starts on a header.
+        rest += 1
+        while rest:
+            chunk = self._batch.stdout.read(min(rest, READ_CHUNK))
+            if not chunk:
+                break
+            rest -= len(chunk)
+
+    def read_bytes(self, rel, limit=None):
+        size = self._request(rel)
+        if size is None:
+            return b""
+        keep = size if limit is None else min(size, limit)
+        data = self._batch.stdout.read(keep)
+        self._drain(size - keep)
+        if PROFILER.enabled:
+            PROFILER.read(len(data))
+        return data
+
+    def iter_bytes(self, rel, size=READ_CHUNK):
+        """Contents in chunks of at most size bytes, streamed from cat-file."""
+        rest = self._request(rel)
+        if rest is None:
+            return
+        total = 0
+        try:
+            while rest:
+                chunk = self._batch.stdout.read(min(rest, size))
+                if not chunk:
+                    break
+                rest -= len(chunk)
+                total += len(chunk)
+                yield chunk
+        finally:
+            # Also reached if the caller stops early
+            self._drain(rest)
+            if PROFILER.enabled:
+                PROFILER.read(total)
+
+    def read_text(self, rel, limit=None):
+        """Decoded contents; like file.read(), limit counts characters."""
+        if limit is None:
+            return self.read_bytes(rel).decode("utf-8", errors="ignore")
+        # A character is at most four UTF-8 bytes
+        return self.read_bytes(rel, limit * 4).decode("utf-8", errors="ignore")[:limit]
+
+
+class TreeSubset(_ListedTree):
+    """View of a tree restricted to some paths, e.g. the files a diff touched.
+
+    Paths that don't exist in the tree (deleted files) are left out; reads go
+    to the underlying tree, which the view closes with itself.
+    """
+
+    def __init__(self, tree, paths):
+        self.tree = tree
+        self.root = tree.root
+        self._index(p for p in paths if tree.exists(p))
+
+    def close(self):
+        self.tree.close()
+
+    def blob_id(self, rel):
+        return self.tree.blob_id(rel)
+
+    def read_bytes(self, rel, limit=None):
+        return self.tree.read_bytes(rel, limit)
+
+    def read_text(self, rel, limit=None):
+        return self.tree.read_text(rel, limit)
+
+    def iter_bytes(self, rel, size=READ_CHUNK):
+        return self.tree.iter_bytes(rel, size)
+
+    def iter_text(self, rel, size=READ_CHUNK):
+        return self.tree.iter_text(rel, size)
+
+    def mapped(self, rel):
+        return self.tree.mapped(rel)
+
+
+def open_tree(repo_path, ref=None, only=None):
+    """WorkTree for a checkout, or GitTree for the commit at ref.
+
+    With only, the tree is restricted to those repo-relative paths and
+    nothing else is listed or walked.
+    """
+    if ref is None:
+        tree = WorkTree(repo_path)
+    else:
+        tree = GitTree(repo_path, ref, only)
+    return tree if only is None else TreeSubset(tree, only)
+
+
+def _git_paths(repo_path, *args):
+    out = subprocess.run(["git", "-C", str(repo_path), *args], capture_output=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"git {args[0]}: " + out.stderr.decode(errors="replace").strip())
+    return {os.fsdecode(p) for p in out.stdout.split(b"\0") if p}
+
+
+def changed_paths(repo_path, since, ref=None):
+    """Repo-relative paths that differ between since and ref.
+
+    Without a ref the comparison is against the working tree, and untracked
+    (non-ignored) files count as changed. Renames are reported as a delete
+    plus an add, so findings under the old name get dropped.
+    """
+    if ref is not None:
+        return _git_paths(repo_path, "diff", "--name-only", "--no-renames", "-z", since, ref)
+    paths = _git_paths(repo_path, "diff", "--name-only", "--no-renames", "-z", since)
+    paths |= _git_paths(repo_path, "ls-files", "-z", "--others", "--exclude-standard")
+    return paths
+
+
+def add_source_arguments(parser):
+    parser.add_argument(
+        "--source",
+        choices=("worktree", "git"),
+        default="worktree",
+        help="Read files from the checkout, or from git objects at --ref "
+             "(tracked files only, nothing in the working tree is opened)",
+    )
+    parser.add_argument(
+        "--ref",
+        default="HEAD",
+        help="Commit, branch or tag to scan with --source git (default: HEAD)",
+    )
+
+
+def source_ref(args):
+    """The git ref to scan, or None to scan working trees."""
+    return args.ref if args.source == "git" else None
+
+
+def add_since_argument(parser):
+    parser.add_argument(
+        "--since",
+        metavar="REF",
+        help="Only rescan files changed since REF in each repo and patch their "
+             "findings into the existing map",
+    )
+
+
+def load_per_repo(path):
+    """The per_repo section of a map written by an earlier run, or None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("per_repo", {})
+    except (OSError, ValueError):
+        return None
+
+
+# ── File classifier ────────────────────────────────────────
+#
+# Build output, vendored minified libraries and generated code pass the
+# suffix filters but are never worth a scan, and they are the biggest files
+# in most repos. classify() judges a file from its name and first
+# SNIFF_BYTES (plus its last SNIFF_BYTES, when the caller holds the whole
+# file, for source-map comments); every scanner skips what it rejects and
+# counts the reason in SCAN_STATS.
+
+SNIFF_BYTES = 4096
+
+# Average line length (over a full sniff) past which a file is minified
+MINIFIED_LINE_LENGTH = 300
+
+GENERATED_SUFFIXES = (".d.ts", ".d.mts", ".d.cts", ".min.js", ".min.mjs", ".min.cjs")
+GENERATED_MARKER = re.compile(rb"^[ \t]*(?://|/?\*|#|--).*@generated\b"
+                              rb"|^// Code generated .* DO NOT EDIT\.\s*$", re.MULTILINE)
+SOURCE_MAP_COMMENT = re.compile(rb"^[ \t]*(?://|/\*)[#@] sourceMappingURL=", re.MULTILINE)
+
+SKIP_REASONS = {
+    "generated_name": "generated by name (.d.ts, .min.js)",
+    "binary": "binary (NUL bytes)",
+    "generated_marker": "marked @generated / DO NOT EDIT",
+    "source_map": "build output (sourceMappingURL comment)",
+    "minified": "minified (long average line)",
+}
+STAT_LABELS.update((f"skipped_{reason}", f"Files skipped as {label}")
+                   for reason, label in SKIP_REASONS.items())
+
+
+def classify(name, data=b""):
+    """Why a file should not be scanned, or None to scan it.
+
+    name is its file name or path; data is its first bytes, at least
+    SNIFF_BYTES of them unless the file is shorter, or all of it.
+    """
+    if str(name).endswith(GENERATED_SUFFIXES):
+        return "generated_name"
+    head = data[:SNIFF_BYTES]
+    if b"\0" in head:
+        return "binary"
+    if (b"@generated" in head or b"DO NOT EDIT" in head) and GENERATED_MARKER.search(head):
+        return "generated_marker"
+    tail = data[-SNIFF_BYTES:]
+    if b"sourceMappingURL" in tail and SOURCE_MAP_COMMENT.search(tail):
+        return "source_map"
+    if len(head) == SNIFF_BYTES and len(head) > MINIFIED_LINE_LENGTH * (head.count(b"\n") + 1):
+        return "minified"
+    return None
+
+
+def skip_file(tree, rel, data=None):
+    """True if classify() rejects a file, counting why; data as for classify().
+
+    Without data only the file's first SNIFF_BYTES are read, and only if its
+    name doesn't settle it.
+    """
+    reason = classify(rel)
+    if reason is None:
+        if data is None:
+            data = tree.read_bytes(rel, SNIFF_BYTES)
+        reason = classify(rel, data)
+    if reason is None:
+        return False
+    SCAN_STATS[f"skipped_{reason}"] += 1
+    return True
+
+
+# ── JS modules ─────────────────────────────────────────────
+#
+# How an import specifier names a file: extensionless paths, and a
+# package.json "exports" map whose entries may hide behind conditions.
+
+JS_MODULE_SUFFIXES = (".js", ".mjs", ".cjs", ".jsx", ".ts", ".mts", ".cts", ".tsx")
+EXPORT_CONDITIONS = ("import", "module", "default", "require", "node")
+
+
+def module_stem(rel):
+    """A module path without its JS extension: './blob.js' may be src/blob.ts."""
+    root, ext = os.path.splitext(rel)
+    return root if ext in JS_MODULE_SUFFIXES else rel
+
+
+def export_target(target):
+    """The file a package.json exports entry points at, skipping type-only conditions."""
+    if isinstance(target, str):
+        return target
+    if isinstance(target, dict):
+        for cond in EXPORT_CONDITIONS:
+            if cond in target:
+                return export_target(target[cond])
+    return None
+
+
+def subpath_exports(pkg):
+    """A package.json's exports as {"./subpath": target}, or None if it has no map."""
+    exports = pkg.get("exports")
+    if isinstance(exports, dict) and any(k.startswith(".") for k in exports):
+        return {k: export_target(v) for k, v in exports.items() if k.startswith(".")}
+    if exports is not None and export_target(exports) is not None:
+        return {".": export_target(exports)}
+    return None
+
+
+# ── Wrangler config ────────────────────────────────────────
+#
+# wrangler.toml, wrangler.json and wrangler.jsonc hold a Worker's name,
+# entry point, routes, vars and resource bindings. The API and infra
+# scanners both read them through WranglerConfig: one tomllib / JSON parse
+# per file, with source positions found afterwards in the raw text.
+
+WRANGLER_NAMES = ("wrangler.toml", "wrangler.json", "wrangler.jsonc")
+
+# (type, key path, key naming the binding) for each kind of resource binding
+WRANGLER_BINDINGS = (
+    ("r2_bucket", ("r2_buckets",), "binding"),
+    ("kv_namespace", ("kv_namespaces",), "binding"),
+    ("d1_database", ("d1_databases",), "binding"),
+    ("durable_object", ("durable_objects", "bindings"), "name"),
+    ("queue_producer", ("queues", "producers"), "binding"),
+    ("queue_consumer", ("queues", "consumers"), "queue"),
+    ("hyperdrive", ("hyperdrive",), "binding"),
+    ("analytics_engine", ("analytics_engine_datasets",), "binding"),
+    ("service_binding", ("services",), "binding"),
+)
+
+STAT_LABELS["wrangler_parse_error"] = "Wrangler configs that failed to parse (no bindings read)"
+
+# Strings are kept; comments and trailing commas become spaces, so offsets hold
+JSONC_NOISE = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/|,(?=(?:\s|//[^\n]*|/\*.*?\*/)*[}\]])',
+                         re.DOTALL)
+TOML_HEADER = re.compile(r'^[ \t]*(\[\[?)[ \t]*([^\[\]\n]+?)[ \t]*\]\]?[ \t]*(?:#.*)?$', re.MULTILINE)
+
+
+def _strip_jsonc(text):
+    return JSONC_NOISE.sub(lambda m: m.group(1) or re.sub(r"[^\n]", " ", m.group()), text)
+
+
+def _toml_sections(text):
+    """[(start, end, dotted table path, is array entry)], the root table first."""
+    headers = [(m.start(1), re.sub(r"\s*\.\s*", ".", m.group(2)).replace('"', "").replace("'", ""),
+                m.group(1) == "[[") for m in TOML_HEADER.finditer(text)]
+    ends = [start for start, _, _ in headers[1:]] + [len(text)]
+    return [(0, headers[0][0] if headers else len(text), "", False)] + [
+        (start, end, path, array) for (start, path, array), end in zip(headers, ends)]
+
+
+class WranglerBinding:
+    """One resource binding from a wrangler config.
+
+    env is the environment declaring it (None at the top level), fields the
+    config's table for it and pos its offset in the file, if found.
+    """
+
+    __slots__ = ("type", "env", "fields", "pos")
+
+    def __init__(self, type, env, fields, pos):
+        self.type = type
+        self.env = env
+        self.fields = fields
+        self.pos = pos
+
+
+class WranglerConfig:
+    """A parsed wrangler.toml / wrangler.json / wrangler.jsonc.
+
+    wrangler doesn't inherit bindings or vars into [env.*] sections, so each
+    environment's are listed with their env. main() and routes() likewise give
+    only what a table sets itself; worker() falls back to wrangler's
+    "<name>-<env>". A file that doesn't parse is counted and yields nothing.
+    """
+
+    __slots__ = ("rel", "text", "data", "lines", "_sections")
+
+    def __init__(self, rel, text):
+        self.rel = rel
+        self.text = text
+        toml = rel.endswith(".toml")
+        try:
+            data = tomllib.loads(text) if toml else json.loads(_strip_jsonc(text))
+        except ValueError:
+            SCAN_STATS["wrangler_parse_error"] += 1
+            data = {}
+        self.data = data if isinstance(data, dict) else {}
+        self.lines = LineIndex(text)
+        self._sections = _toml_sections(text) if toml else None
+
+    @classmethod
+    def read(cls, tree, rel, text=None):
+        """Parse a config from a tree, or from its text if already read.
+
+        Files classify() rejects parse as empty.
+        """
+        if text is None:
+            text = "" if skip_file(tree, rel) else tree.read_text(rel)
+        return cls(rel, text)
+
+    def envs(self):
+        """None (the top level), then each [env.*] name."""
+        envs = self.data.get("env")
+        return [None] + (list(envs) if isinstance(envs, dict) else [])
+
+    def table(self, env=None):
+        """The top-level table, or just what one environment sets."""
+        if env is None:
+            return self.data
+        envs = self.data.get("env")
+        table = envs.get(env) if isinstance(envs, dict) else None
+        return table if isinstance(table, dict) else {}
+
+    def worker(self, env=None):
+        name = self.data.get("name")
+        name = name if isinstance(name, str) else None
+        if env is None:
+            return name
+        own = self.table(env).get("name")
+        if isinstance(own, str):
+            return own
+        return f"{name}-{env}" if name else None
+
+    def main(self, env=None):
+        main = self.table(env).get("main")
+        return main if isinstance(main, str) else None
+
+    def routes(self, env=None):
+        """(pattern, is custom domain, offset) for the routes env itself sets."""
+        table = self.table(env)
+        routes = table.get("routes")
+        routes = list(routes) if isinstance(routes, list) else []
+        if "route" in table:
+            routes.append(table["route"])
+        for route in routes:
+            if isinstance(route, str):
+                yield route, False, self.locate(env, (), None, None, route)
+            elif isinstance(route, dict):
+                key = "hostname" if isinstance(route.get("hostname"), str) else "pattern"
+                if isinstance(route.get(key), str):
+                    yield (route[key], bool(route.get("custom_domain")) or key == "hostname",
+                           self.locate(env, (), None, key, route[key]))
+
+    def bindings(self):
+        """Every WranglerBinding, by type, top level before environments."""
+        for type, path, naming in WRANGLER_BINDINGS:
+            for env in self.envs():
+                entries = self.table(env)
+                for key in path:
+                    entries = entries.get(key) if isinstance(entries, dict) else None
+                if not isinstance(entries, list):
+                    continue
+                for i, entry in enumerate(entries):
+                    if isinstance(entry, dict):
+                        yield WranglerBinding(type, env, entry,
+                                              self.locate(env, path, i, naming, entry.get(naming)))
+
+    def vars(self):
+        """(name, value, env, offset) for every [vars] entry, per environment."""
+        for env in self.envs():
+            table = self.table(env).get("vars")
+            if isinstance(table, dict):
+                for name, value in table.items():
+                    yield name, value, env, self.locate(env, ("vars",), None, name, None)
+
+    def at(self, pos):
+        """{"line", "col"} for an offset from this config, or {} without one."""
+        return self.lines.at(pos) if pos is not None else {}
+
+    def locate(self, env, path, index, key, value):
+        """Offset of a setting in the raw text, or None.
+
+        Entry index of a [[path]] array is found by its header; anything
+        else by `key = "value"` (or just the key, or just the quoted value)
+        inside the table that holds it. In JSON, the search starts at the
+        environment's key.
+        """
+        if value is not None and not isinstance(value, str):
+            return None
+        text = self.text
+        if self._sections is None:
+            start, end = 0, len(text)
+            if env is not None:
+                m = re.search(r'"env"\s*:\s*\{.*?"' + re.escape(env) + r'"\s*:', text, re.DOTALL)
+                start = m.end() if m else 0
+            key_re = '"(' + re.escape(key) + r')"\s*:\s*' if key is not None else ""
+            value_re = '"' + re.escape(value) + '"' if value is not None else ""
+        else:
+            prefix = ("env", env) if env is not None else ()
+            if index is not None:
+                headers = [s[0] for s in self._sections if s[3] and s[2] == ".".join(prefix + path)]
+                if index < len(headers):
+                    return headers[index]
+            # An inline array sits in its parent table; vars are keys of their own
+            holder = ".".join(prefix + (path[:-1] if index is not None else path))
+            spans = [(s[0], s[1]) for s in self._sections if not s[3] and s[2] == holder]
+            start, end = spans[0] if spans else (0, len(text))
+            key_re = (r'(?<![\w-])["\']?(' + re.escape(key) + r')["\']?\s*=\s*'
+                      if key is not None else "")
+            value_re = "[\"']" + re.escape(value) + "[\"']" if value is not None else ""
+        m = re.compile(key_re + value_re).search(text, start, end)
+        if m is None:
+            return None
+        return m.start(1) if key_re else m.start()
+
+
+# ── Windowed reads ─────────────────────────────────────────
+
+class Window:
+    """One overlapping slice of a file streamed by windows().
+
+    start is the slice's character offset in the file, line0/col0 how many
+    lines and columns precede it (for LineIndex), and last whether it runs
+    to the end of the file. claimed is shared by every window of the file:
+    for each rule, the offset before which its matches are already taken.
+    """
+
+    __slots__ = ("text", "start", "line0", "col0", "last", "claimed")
+
+    def __init__(self, text, start, line0, col0, last, claimed):
+        self.text = text
+        self.start = start
+        self.line0 = line0
+        self.col0 = col0
+        self.last = last
+        self.claimed = claimed
+
+    def matches(self, rule):
+        """rule's matches that belong to this window, in order.
+
+        A window keeps matches starting before its last rule.span characters
+        and leaves the rest to the next window, which sees them whole. Matches
+        overlapping one already kept are skipped, as finditer would, and a
+        once-rule stops at its first match in the file.
+        """
+        text = self.text
+        pos = self.claimed.get(rule.id, self.start) - self.start
+        if pos > len(text):
+            return
+        end = len(text) if self.last else len(text) - rule.span
+        for m in rule.regex.finditer(text, pos):
+            if m.start() >= end:
+                break
+            self.claimed[rule.id] = self.start + max(m.end(), m.start() + 1)
+            yield m
+            if rule.once:
+                self.claimed[rule.id] = sys.maxsize
+                return
+        if not self.last:
+            self.claimed[rule.id] = max(self.claimed.get(rule.id, 0), self.start + end)
+
+
+def windows(chunks, size, overlap):
+    """Split a stream of text chunks into Windows of up to size characters.
+
+    Consecutive windows share overlap characters, so any match no longer
+    than that lies whole inside one window. Only the current window and
+    the chunk being read are held in memory. A stream of at most size
+    characters comes back as one window holding the whole text.
+    """
+    chunks = iter(chunks)
+    claimed = {}
+    buf = ""
+    start = line0 = col0 = 0
+    more = True
+    while True:
+        while more and len(buf) <= size:
+            chunk = next(chunks, None)
+            if chunk is None:
+                more = False
+            else:
+                buf += chunk
+        if not more and len(buf) <= size:
+            yield Window(buf, start, line0, col0, True, claimed)
+            return
+        text = buf[:size]
+        yield Window(text, start, line0, col0, False, claimed)
+        step = size - overlap
+        skipped = text[:step]
+        newline = skipped.rfind("\n")
+        if newline == -1:
+            col0 += step
+        else:
+            line0 += skipped.count("\n")
+            col0 = step - newline - 1
+        start += step
+        buf = buf[step:]
+
+
+# ── Rule time budget ───────────────────────────────────────
+
+DEFAULT_RULE_BUDGET = 2.0
+
+# Seconds one rule may spend on one file; 0 disables the guard.
+RULE_BUDGET = DEFAULT_RULE_BUDGET
+
+TIMEOUT_KEY = "rule_timeouts"
+
+
+class RuleTimeout(Exception):
+    """A rule ran past RULE_BUDGET seconds on one file."""
+
+
+def set_rule_budget(seconds):
+    """Set RULE_BUDGET (also used as the pool initializer for workers)."""
+    global RULE_BUDGET
+    RULE_BUDGET = seconds
+
+
+def add_budget_argument(parser):
+    parser.add_argument(
+        "--rule-budget", type=float, default=DEFAULT_RULE_BUDGET, metavar="SECONDS",
+        help=f"Abort any one rule after this long on one file and record it under "
+             f"{TIMEOUT_KEY} (default: {DEFAULT_RULE_BUDGET:g}; 0 disables)")
+
+
+def _raise_timeout(signum, frame):
+    raise RuleTimeout()
+
+
+@contextmanager
+def rule_budget():
+    """Raise RuleTimeout in the enclosed block once RULE_BUDGET seconds pass.
+
+    CPython's regex engine checks for pending signals while it backtracks,
+    so a SIGALRM interval timer can stop a runaway match part-way. Without
+    setitimer (Windows), or off the main thread, the block runs unguarded.
+    """
+    if (RULE_BUDGET <= 0 or not hasattr(signal, "setitimer")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, RULE_BUDGET)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def timeout_record(rule, rel):
+    """The finding recorded when rule was cut off on file rel."""
+    return {"rule": rule, "file": rel, "budget": RULE_BUDGET}
+
+
+# ── Rule engine ─────────────────────────────────────────────
+
+DEFAULT_RULE_SPAN = 4096
+
+# Text kept before a window's first owned match, for builders that look back
+RULE_LOOKBEHIND = 256
+
+
+class Rule:
+    """One detector pattern in a declarative rule table.
+
+    A rule only runs on files containing at least one of its literals
+    (matched case-insensitively, so the check is a cheap necessary condition
+    for the regex). build(m, ctx) turns each match into a finding dict, or
+    returns None to drop it; the engine adds the match's line and col.
+    Rules with once=True report a file-level fact from the first match
+    instead of iterating over every match. span bounds how far past a
+    match's start the rule reads (its match plus whatever build() looks
+    at), which sizes the overlap between windows of a large file.
+    supersedes names less specific rules that also fire on this rule's
+    matches: their findings overlapping one of this rule's in the same file
+    are dropped (see RuleSet).
+    """
+
+    __slots__ = ("id", "key", "literals", "regex", "build", "once", "span", "supersedes")
+
+    def __init__(self, id, key, literals, pattern, build, flags=0, once=False,
+                 span=DEFAULT_RULE_SPAN, supersedes=()):
+        self.id = id
+        self.key = key
+        self.literals = tuple(lit.lower() for lit in literals)
+        self.regex = re.compile(pattern, flags)
+        self.build = build
+        self.once = once
+        self.span = span
+        self.supersedes = tuple(supersedes)
+
+
+class LineIndex:
+    """Newline offsets for one file, mapping character offsets to line/col.
+
+    Built once per file; each lookup is a binary search, so every finding
+    can carry an exact 1-based location at negligible cost.
+    """
+
+    __slots__ = ("starts", "line0", "col0")
+
+    def __init__(self, content, line0=0, col0=0):
+        # For a window of a larger file: the lines, and columns on its first
+        # line, that come before it
+        self.starts = [0]
+        self.starts.extend(accumulate(len(line) + 1 for line in content.split("\n")[:-1]))
+        self.line0 = line0
+        self.col0 = col0
+
+    def line_col(self, pos):
+        line = bisect_right(self.starts, pos)
+        col = pos - self.starts[line - 1] + 1
+        if line == 1:
+            col += self.col0
+        return line + self.line0, col
+
+    def at(self, pos):
+        """{"line": n, "col": n} for a character offset, to splat into a finding."""
+        line, col = self.line_col(pos)
+        return {"line": line, "col": col}
+
+
+# Comments, string literals (JS/Go quotes and template/raw backticks) and the
+# bracket characters themselves; everything else is skipped by finditer.
+_BRACKET_TOKEN = re.compile(
+    r"""//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`|[{}()\[\]]""",
+    re.DOTALL)
+_CLOSER = {"}": "{", ")": "(", "]": "["}
+
+
+class BraceIndex:
+    """Matching {} / () / [] pairs for one file, computed in a single pass.
+
+    Brackets inside string literals and comments are ignored. Detectors ask
+    for "the block starting here" via close_of() instead of re-scanning
+    characters, and shallow() gives an object's text with nested groups
+    emptied, so top-level keys can be read without tripping on nesting.
+    """
+
+    __slots__ = ("close", "openers")
+
+    def __init__(self, content):
+        self.close = {}
+        stack = []
+        for m in _BRACKET_TOKEN.finditer(content):
+            tok = m.group()
+            if tok in "{([":
+                stack.append((tok, m.start()))
+            elif tok in _CLOSER:
+                # Drop unmatched openers until this closer finds its partner
+                while stack and stack[-1][0] != _CLOSER[tok]:
+                    stack.pop()
+                if stack:
+                    self.close[stack.pop()[1]] = m.start()
+        self.openers = sorted(self.close)
+
+    def close_of(self, pos):
+        """Position of the bracket closing the one at pos, or None."""
+        return self.close.get(pos)
+
+    def next_open(self, pos, end=None):
+        """First matched opener at or after pos (and before end), or None."""
+        i = bisect_left(self.openers, pos)
+        if i < len(self.openers) and (end is None or self.openers[i] < end):
+            return self.openers[i]
+        return None
+
+    def shallow(self, content, pos):
+        """Text between the bracket at pos and its partner, nested groups emptied."""
+        end = self.close.get(pos)
+        if end is None:
+            return ""
+        parts = []
+        cur = pos + 1
+        while True:
+            child = self.next_open(cur, end)
+            if child is None:
+                parts.append(content[cur:end])
+                return "".join(parts)
+            parts.append(content[cur:child + 1])
+            cur = self.close[child]
+
+
+class FileContext:
+    """Per-file state shared by every rule that runs on the file.
+
+    For a large file read in windows, content is the current Window's text
+    and file-level searches only see that window.
+    """
+
+    __slots__ = ("content", "rel", "found", "window", "_searches", "_braces", "_lines")
+
+    def __init__(self, content, rel, found, window=None):
+        self.content = content
+        self.rel = rel
+        self.found = found
+        self.window = window
+        self._searches = {}
+        self._braces = None
+        self._lines = None
+
+    @property
+    def lines(self):
+        """LineIndex for the file, built on first use."""
+        if self._lines is None:
+            w = self.window
+            self._lines = LineIndex(self.content, *((w.line0, w.col0) if w else ()))
+        return self._lines
+
+    @property
+    def braces(self):
+        """BraceIndex for the file, built on first use."""
+        if self._braces is None:
+            self._braces = BraceIndex(self.content)
+        return self._braces
+
+    def search(self, regex):
+        """Memoized regex.search(content), for file-level conditions."""
+        if regex not in self._searches:
+            self._searches[regex] = regex.search(self.content)
+        return self._searches[regex]
+
+    def memo(self, build):
+        """Memoized build(ctx), for file-level facts several rules share."""
+        if build not in self._searches:
+            self._searches[build] = build(self)
+        return self._searches[build]
+
+
+def _outside(spans, others):
+    """The (start, end, finding) spans that overlap none of others.
+
+    others must be in order and not overlap each other, as one rule's
+    matches are, so each check is a binary search.
+    """
+    ends = [end for _, end, _ in others]
+    kept = []
+    for span in spans:
+        i = bisect_right(ends, span[0])
+        if i < len(others) and others[i][0] < span[1]:
+            continue
+        kept.append(span)
+    return kept
+
+
+class RuleSet:
+    """A rule table compiled into a single literal prefilter.
+
+    The file is lowercased once and checked for every rule literal; only
+    rules with a literal present run their regex, so files that mention
+    none of the literals never touch a regex. (Plain substring checks on the
+    lowered text beat a combined IGNORECASE alternation several times over
+    in CPython's re, and handle overlapping literals exactly.)
+
+    The same check runs on undecoded bytes (literals_in_bytes), so files
+    that fail it are never decoded at all.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.literals = sorted({lit for r in self.rules for lit in r.literals})
+        self._encoded = [(lit, lit.encode("utf-8")) for lit in self.literals]
+        ids = {r.id for r in self.rules}
+        self._supersedes = [(r.id, [s for s in r.supersedes if s in ids])
+                            for r in self.rules if ids.intersection(r.supersedes)]
+        # Window overlap that lets every rule see its matches whole
+        self.overlap = max((r.span for r in self.rules), default=0) + RULE_LOOKBEHIND
+
+    def literals_in(self, content):
+        lowered = content.lower()
+        return {lit for lit in self.literals if lit in lowered}
+
+    def literals_in_bytes(self, data):
+        """literals_in() on UTF-8 bytes, without decoding them.
+
+        data is bytes or an iterable of byte chunks. Chunks are lowered one
+        at a time and carry over the tail the longest literal could straddle,
+        so a streamed or mapped file is never held whole. bytes.lower() only
+        folds ASCII, which is all the literals are.
+        """
+        if PROFILER.enabled:
+            start = time.perf_counter()
+        if isinstance(data, bytes):
+            data = (data,)
+        keep = max((len(raw) for _, raw in self._encoded), default=1) - 1
+        found = set()
+        tail = b""
+        size = 0
+        for chunk in data:
+            size += len(chunk)
+            lowered = tail + chunk.lower()
+            found.update(lit for lit, raw in self._encoded if raw in lowered)
+            tail = lowered[-keep:] if keep else b""
+        if PROFILER.enabled:
+            self._charge_prefilter(start, size, found)
+        return found
+
+    def run(self, content, rel, result, window=None, found=None):
+        """Run the applicable rules over content, appending findings to result[key].
+
+        With a window, content is that Window's text (see run_windows). found
+        is the literal set if the caller already has it (literals_in_bytes).
+        """
+        if PROFILER.enabled:
+            return self._run_profiled(content, rel, result, window, found)
+        if found is None:
+            found = self.literals_in(content)
+        if not found:
+            return
+        ctx = FileContext(content, rel, found, window)
+        # Windowed runs stage into the caller's dict (see run_windows)
+        staged = defaultdict(list) if window is None else result
+        for rule in self.rules:
+            if any(lit in found for lit in rule.literals):
+                self._apply(rule, ctx, staged)
+        if window is None:
+            self._merge(staged, result)
+
+    def run_windows(self, chunks, rel, result, size):
+        """run() over a file streamed as text chunks, size characters at a time.
+
+        Windows overlap by self.overlap, so each match is found whole in
+        exactly one of them and memory stays bounded by the window size.
+        Findings from every window are staged and merged once, as run() over
+        the whole text would; a rule that times out in any window keeps
+        nothing for the file.
+        """
+        staged = defaultdict(list)
+        for window in windows(chunks, size, self.overlap):
+            self.run(window.text, rel, staged, window)
+        self._merge(staged, result)
+
+    def _merge(self, staged, result):
+        """Add one file's findings, staged per rule id, to result[rule.key].
+
+        Rules go in rule order. A rule that timed out keeps nothing, and
+        findings whose span overlaps one of a rule that supersedes theirs
+        are dropped (and counted), so one call site yields one finding.
+        """
+        timeouts = {t["rule"]: t for t in staged.pop(TIMEOUT_KEY, ())}
+        for winner, losers in self._supersedes:
+            if winner in timeouts or not staged.get(winner):
+                continue
+            for loser in losers:
+                if staged.get(loser):
+                    kept = _outside(staged[loser], staged[winner])
+                    SCAN_STATS["superseded"] += len(staged[loser]) - len(kept)
+                    staged[loser] = kept
+        for rule in self.rules:
+            if rule.id not in timeouts and staged.get(rule.id):
+                result[rule.key].extend(finding for _, _, finding in staged[rule.id])
+        if timeouts:
+            result[TIMEOUT_KEY].extend(timeouts.values())
+
+    def _apply(self, rule, ctx, result):
+        """Run one rule over the file; returns how many findings it added.
+
+        Findings are staged in result[rule.id] as (start, end, finding), with
+        the match's character span in the file, for _merge().
+
+        A rule that runs past the time budget keeps none of its findings for
+        the file and is recorded under result[TIMEOUT_KEY] instead.
+        """
+        found = result[rule.id]
+        before = len(found)
+        offset = ctx.window.start if ctx.window is not None else 0
+        try:
+            with rule_budget():
+                if ctx.window is not None:
+                    matches = ctx.window.matches(rule)
+                elif rule.once:
+                    m = ctx.search(rule.regex)
+                    matches = (m,) if m else ()
+                else:
+                    matches = rule.regex.finditer(ctx.content)
+                for m in matches:
+                    finding = rule.build(m, ctx)
+                    if finding is not None:
+                        finding.update(ctx.lines.at(m.start()))
+                        found.append((offset + m.start(), offset + m.end(), finding))
+        except RuleTimeout:
+            del found[before:]
+            result[TIMEOUT_KEY].append(timeout_record(rule.id, ctx.rel))
+            return 0
+        return len(found) - before
+
+    def _charge_prefilter(self, start, size, found):
+        entry = PROFILER.rule("(literal prefilter)")
+        entry["seconds"] += time.perf_counter() - start
+        entry["files"] += 1
+        entry["prefiltered"] += bool(found)
+        entry["bytes"] += size
+
+    def _run_profiled(self, content, rel, result, window=None, found=None):
+        # Same as run(), charging each rule (and the shared prefilter, unless
+        # the caller ran it on bytes) with its time, the files it saw and
+        # passed, and the findings it made.
+        if found is None:
+            start = time.perf_counter()
+            found = self.literals_in(content)
+            self._charge_prefilter(start, len(content), found)
+        ctx = FileContext(content, rel, found, window)
+        staged = defaultdict(list) if window is None else result
+        for rule in self.rules:
+            entry = PROFILER.rule(rule.id)
+            entry["files"] += 1
+            entry["bytes"] += len(content)
+            if not any(lit in found for lit in rule.literals):
+                continue
+            start = time.perf_counter()
+            entry["prefiltered"] += 1
+            entry["matches"] += self._apply(rule, ctx, staged)
+            entry["seconds"] += time.perf_counter() - start
+        if window is None:
+            self._merge(staged, result)
+
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Scan this many repos in parallel (default: CPU count)",
+    )
+
+
+def add_stream_arguments(parser, default_path):
+    parser.add_argument(
+        "--stream",
+        nargs="?",
+        type=Path,
+        const=default_path,
+        default=None,
+        help=f"Append each repo's result to an NDJSON checkpoint as it completes "
+             f"(default: {default_path}, or {_since_stream(default_path)} with --since) "
+             f"and build the map from it at the end",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Implies --stream; skip repos already in the stream from an interrupted run",
+    )
+
+
+def _since_stream(default_path):
+    return default_path.with_name(f"{default_path.stem}.since{default_path.suffix}")
+
+
+def stream_path(args, default_path):
+    """The NDJSON stream to use for this run, or None when not streaming.
+
+    --since runs default to a stream of their own, since they checkpoint
+    deltas rather than whole results.
+    """
+    if args.stream is not None:
+        return args.stream
+    if not args.resume:
+        return None
+    return _since_stream(default_path) if getattr(args, "since", None) else default_path
+
+
+def stream_mode(args):
+    """What kind of results this run streams: "full", or "since REF" for deltas."""
+    since = getattr(args, "since", None)
+    return f"since {since}" if since else "full"
+
+
+class StreamMismatch(Exception):
+    """A stream being resumed was written by a different kind of run."""
+
+
+def read_stream(path):
+    """Yield (repo, result) from an NDJSON scan stream.
+
+    The header line is skipped, and a torn final line (from a crash
+    mid-write) is ignored.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if "repo" in record:
+                yield record["repo"], record["result"]
+
+
+def _open_stream(path, resume, mode):
+    """Open a stream for appending; returns (file, names already present).
+
+    A new stream starts with a {"mode": mode} header. Resuming one whose
+    header names another mode raises StreamMismatch; streams from before
+    headers were written count as "full".
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    names = set()
+    if resume and path.exists():
+        good_end = 0
+        found = None
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if "repo" in record:
+                    names.add(record["repo"])
+                elif found is None:
+                    found = record.get("mode")
+                good_end += len(line)
+        found = found or "full"
+        if good_end and found != mode:
+            raise StreamMismatch(f"{path} checkpoints a {found} scan; "
+                                 f"can't resume it as a {mode} scan")
+        with open(path, "r+b") as f:
+            f.truncate(good_end)
+        out = open(path, "a", encoding="utf-8")
+        if not good_end:
+            out.write(json.dumps({"mode": mode}) + "\n")
+        return out, names
+    out = open(path, "w", encoding="utf-8")
+    out.write(json.dumps({"mode": mode}) + "\n")
+    return out, names
+
+
+def _run_scans(scan_fn, repos, jobs, already_done=0, total=None):
+    """Yield (name, result) as repos finish; failures are reported and skipped.
+
+    At most two scans per worker are in flight, so finished results don't
+    pile up in the parent while slower repos are still running.
+    """
+    total = total if total is not None else len(repos)
+    count = already_done
+
+    def progress(name):
+        sys.stdout.write(f"\r   [{count}/{total}] {name:40s}")
+        sys.stdout.flush()
+
+    def failed(name, exc):
+        sys.stdout.write("\n")
+        print(f"   ! {name}: scan failed: {exc!r}", file=sys.stderr)
+
+    if jobs <= 1 or len(repos) <= 1:
+        for name, path in repos:
+            count += 1
+            try:
+                result = scan_fn(path)
+            except Exception as exc:
+                failed(name, exc)
+                result = _FAILED
+            progress(name)
+            if result is not _FAILED:
+                yield name, result
+        return
+
+    workers = min(jobs, len(repos))
+    todo = iter(repos)
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_rule_budget,
+                             initargs=(RULE_BUDGET,)) as pool:
+        def fill():
+            while len(pending) < workers * 2:
+                nxt = next(todo, None)
+                if nxt is None:
+                    return
+                pending[pool.submit(scan_fn, nxt[1])] = nxt[0]
+
+        fill()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = pending.pop(future)
+                count += 1
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    failed(name, exc)
+                    result = _FAILED
+                progress(name)
+                if result is not _FAILED:
+                    yield name, result
+            fill()
+
+
+def _split_off(runs, into):
+    for name, (result, extra) in runs:
+        into[name] = extra
+        yield name, result
+
+
+def scan_repos(scan_fn, repos, jobs=1, stream=None, resume=False, profile=None, stats=None,
+               mode="full"):
+    """Run scan_fn(repo_path) for every (name, repo_path) pair.
+
+    With jobs > 1 the repos fan out to a process pool. Progress is printed as
+    repos complete, and a repo whose scan raises is reported and left out
+    instead of aborting the run. Results are returned as a {name: result}
+    dict in input order, so the output matches a serial run exactly.
+
+    With a stream path, each result is appended to that NDJSON file as soon
+    as its repo completes, so an interrupted run keeps everything finished
+    so far. resume=True skips repos already in the stream; mode (see
+    stream_mode()) is recorded in the stream's header, and resuming a stream
+    of another mode raises StreamMismatch. The returned dict is then read
+    back from the stream as the finishing step. Streaming bounds what the
+    parent holds while scans run, not overall: the returned dict, and the
+    map each scanner builds from it, still hold every repo's result.
+
+    Given a profile dict, each repo is scanned with the profiler enabled and
+    its counters are stored under profile[name]. Likewise a stats dict gets
+    each repo's SCAN_STATS under stats[name]. Repos skipped by resume have
+    neither.
+    """
+    if stats is not None:
+        scan_fn = partial(_counted, scan_fn)
+    if profile is not None:
+        scan_fn = partial(_profiled, scan_fn)
+
+    def run(todo, *progress):
+        runs = _run_scans(scan_fn, todo, jobs, *progress)
+        if profile is not None:
+            runs = _split_off(runs, profile)
+        if stats is not None:
+            runs = _split_off(runs, stats)
+        return runs
+
+    if stream is None:
+        done = dict(run(repos))
+        return {name: done.pop(name) for name, _ in repos if name in done}
+
+    out, present = _open_stream(stream, resume, mode)
+    todo = [(name, path) for name, path in repos if name not in present]
+    if present:
+        print(f"   Resuming: {len(repos) - len(todo)} repos already in {stream}")
+    with out:
+        for name, result in run(todo, len(repos) - len(todo), len(repos)):
+            out.write(json.dumps({"repo": name, "result": result}, default=list) + "\n")
+            out.flush()
+
+    wanted = {name for name, _ in repos}
+    done = {name: result for name, result in read_stream(stream) if name in wanted}
+    return {name: done.pop(name) for name, _ in repos if name in done}
+
+
+# ── Per-file findings cache ────────────────────────────────
+
+DEFAULT_CACHE_MB = 256
+
+
+def file_digest(path):
+    """Hex digest of a file's bytes (used to version caches by scanner source)."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def add_cache_arguments(parser, default_dir):
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-scan every file instead of reusing cached per-file findings",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_dir,
+        help=f"Where to keep the findings cache (default: {default_dir})",
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        help=f"Evict least-recently-used entries above this size (default: {DEFAULT_CACHE_MB})",
+    )
+
+
+class FindingsCache:
+    """Persistent per-file findings cache backed by SQLite.
+
+    Entries are keyed by a digest of the scanner version, the file's
+    repo-relative path and its content, so a scanner whose rules change gets
+    a fresh keyspace. A second table remembers each file's (size, mtime) and
+    the key it last hashed to, so an unchanged file costs one stat() rather
+    than a read, a hash and a full detector run. Files read from git are
+    keyed by blob id instead, which needs neither. Once the stored findings
+    exceed max_bytes the least-recently-used entries are evicted. Stat rows
+    carry the version too: one written by another scanner version is a miss,
+    since the key it remembers hashes that version's findings.
+
+    Safe to pickle into worker processes: the connection is opened lazily
+    in whichever process uses the cache.
+    """
+
+    def __init__(self, path, version, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.path = str(path)
+        self.version = version
+        self.max_bytes = max_bytes
+        self._db = None
+        self._pending = []
+        self._touched = set()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_db=None, _pending=[], _touched=set())
+        return state
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS findings ("
+                             "key TEXT PRIMARY KEY, data TEXT, size INTEGER, used REAL)")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(stats)")]
+            if columns and "version" not in columns:
+                # Written before stat rows were versioned; they only cost a rehash
+                self._db.execute("DROP TABLE stats")
+            self._db.execute("CREATE TABLE IF NOT EXISTS stats ("
+                             "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, key TEXT, "
+                             "version TEXT)")
+            self._db.commit()
+        return self._db
+
+    def key(self, rel, data):
+        """Key for a file's content, given as bytes or an iterable of byte chunks."""
+        h = hashlib.sha1(self.version.encode())
+        h.update(rel.encode("utf-8", "surrogateescape"))
+        h.update(b"\0")
+        for chunk in (data,) if isinstance(data, bytes) else data:
+            h.update(chunk)
+        return h.hexdigest()
+
+    def key_for_blob(self, rel, oid):
+        """Key for a file known by its git blob id, so it never has to be read."""
+        h = hashlib.sha1(self.version.encode())
+        h.update(rel.encode("utf-8", "surrogateescape"))
+        h.update(b"\0blob ")
+        h.update(oid.encode())
+        return h.hexdigest()
+
+    def key_for_stat(self, path, st):
+        """Return the cached key for path if its size, mtime and the scanner version are unchanged."""
+        row = self.db.execute("SELECT size, mtime, key, version FROM stats WHERE path = ?",
+                              (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns and row[3] == self.version:
+            return row[2]
+        return None
+
+    def get(self, key):
+        row = self.db.execute("SELECT data FROM findings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._touched.add(key)
+        return json.loads(row[0])
+
+    def put(self, key, findings=None, path=None, st=None):
+        """Store findings under key if given, and record path → key if given."""
+        self._pending.append((path, st.st_size if st else None, st.st_mtime_ns if st else None,
+                              key, None if findings is None else json.dumps(findings)))
+
+    def flush(self):
+        """Write pending entries and LRU timestamps in one transaction."""
+        if not self._pending and not self._touched:
+            return
+        now = time.time()
+        with self.db:
+            for path, size, mtime, key, data in self._pending:
+                if path is not None:
+                    self.db.execute("INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?)",
+                                    (path, size, mtime, key, self.version))
+                if data is not None:
+                    self.db.execute("INSERT OR REPLACE INTO findings VALUES (?, ?, ?, ?)",
+                                    (key, data, len(data), now))
+            self.db.executemany("UPDATE findings SET used = ? WHERE key = ?",
+                                [(now, key) for key in self._touched])
+        self._pending = []
+        self._touched = set()
+
+    def evict(self):
+        """Drop least-recently-used findings until the cache fits max_bytes."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM findings").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        dropped = 0
+        with self.db:
+            for key, size in self.db.execute(
+                    "SELECT key, size FROM findings ORDER BY used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM findings WHERE key = ?", (key,))
+                total -= size
+                dropped += 1
+            self.db.execute("DELETE FROM stats WHERE key NOT IN (SELECT key FROM findings)")
+        return dropped
+
+
+def cached_scan(cache, tree, repo_path, rel, scan, limit):
+    """One file's findings through a FindingsCache; scan(data) computes them on a miss.
+
+    data is the file's first limit + 1 bytes when they were read for hashing,
+    else None. Files from git are keyed by blob id, checkout files by size
+    and mtime, then by content. Returns None for a file that can't be
+    stat()ed. Findings with a rule timeout are not stored, so they are retried.
+    The SCAN_STATS a scan counts are stored with its findings and counted
+    again on a hit, so a warm run reports the same stats as a cold one.
+    """
+    oid = tree.blob_id(rel)
+    if oid is not None:
+        key = cache.key_for_blob(rel, oid)
+        entry = cache.get(key)
+        if entry is None:
+            entry = _counted_scan(scan, None)
+            if TIMEOUT_KEY not in entry[0]:
+                cache.put(key, entry)
+        else:
+            SCAN_STATS.update(entry[1])
+        return entry[0]
+
+    path = os.path.join(repo_path, rel)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = cache.key_for_stat(path, st)
+    entry = cache.get(key) if key is not None else None
+    if entry is not None:
+        SCAN_STATS.update(entry[1])
+        return entry[0]
+    data = tree.read_bytes(rel, limit + 1)
+    # A file too big to read whole is hashed as a stream
+    key = cache.key(rel, data if len(data) <= limit else tree.iter_bytes(rel))
+    entry = cache.get(key)
+    if entry is None:
+        entry = _counted_scan(scan, data)
+        if TIMEOUT_KEY not in entry[0]:
+            cache.put(key, entry, path, st)
+    else:
+        SCAN_STATS.update(entry[1])
+        cache.put(key, path=path, st=st)
+    return entry[0]
+
+
+def _counted_scan(scan, data):
+    """[findings, the SCAN_STATS counted while finding them], as cached_scan stores them."""
+    before = SCAN_STATS.copy()
+    found = scan(data)
+    return [found, dict(SCAN_STATS - before)]
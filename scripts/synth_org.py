@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Synthetic Org Generator
+
+Builds a fake org of N Storacha-shaped repos for benchmarking the scanners:
+- JS monorepos: capability({ can: ... }) packages, Server.provide services,
+  Cloudflare Worker entry points, wrangler.toml bindings, .dev.vars, tests,
+  deep node_modules trees and .wrangler/ dev bundles
+- Go services: go.mod drivers, mux.HandleFunc routes, HTTP clients, vendor/
+- Infra repos: SST stacks, Terraform, SQL migrations, docker-compose, .sst/
+  build artifacts
+JS and infra repos carry a .gitignore covering their build output.
+- Docs repos: Markdown only
+
+Repo i depends only on (seed, i), so the first 100 repos of a 1000-repo org
+are the same as a 100-repo org and benchmarks can scan prefixes of one tree.
+
+Run: python3 aidev/scripts/synth_org.py OUT_DIR [--repos N] [--seed S] [--scale X] [--git]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+from pathlib import Path
+
+NAMESPACES = ["blob", "space", "upload", "store", "access", "index", "claim", "filecoin",
+              "usage", "plan", "provider", "assert", "egress", "pdp", "replica", "consumer"]
+VERBS = ["add", "remove", "list", "get", "info", "allocate", "accept", "put", "deliver",
+         "offer", "record", "report", "submit", "aggregate", "claim", "revoke"]
+WORDS = ["upload", "blob", "index", "claims", "gateway", "egress", "billing", "space",
+         "content", "delegation", "storage", "retrieval", "piece", "deal", "shard", "car",
+         "block", "receipt", "invocation", "agent", "session", "account", "provider"]
+JS_DB_PACKAGES = ["@aws-sdk/client-dynamodb", "@aws-sdk/client-s3", "@aws-sdk/client-sqs",
+                  "pg", "ioredis", "drizzle-orm", "better-sqlite3", "@upstash/redis"]
+GO_DRIVERS = ["github.com/lib/pq v1.10.9", "github.com/redis/go-redis/v9 v9.5.1",
+              "github.com/aws/aws-sdk-go-v2 v1.26.1", "github.com/ipfs/go-datastore v0.6.0",
+              "github.com/cockroachdb/pebble v1.1.0", "go.etcd.io/bbolt v1.3.9"]
+ENV_VARS = ["DATABASE_URL", "REDIS_URL", "S3_BUCKET", "QUEUE_URL", "DYNAMO_TABLE",
+            "UPLOAD_SERVICE_URL", "INDEXER_DID", "CLAIMS_ENDPOINT", "GATEWAY_URL"]
+
+# Share of each repo kind, cycled deterministically through the org
+KINDS = ["js"] * 5 + ["go"] * 2 + ["infra"] * 2 + ["docs"]
+
+
+def write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def ident(rnd):
+    return rnd.choice(WORDS) + "".join(w.title() for w in rnd.sample(WORDS, 2))
+
+
+def js_filler(rnd, lines):
+    """Ordinary JS that matches no detector, to pad repos to realistic sizes."""
+    out = [f"import {{ {ident(rnd)} }} from './{rnd.choice(WORDS)}.js'", ""]
+    while len(out) < lines:
+        name = ident(rnd)
+        args = ", ".join(rnd.sample(WORDS, rnd.randint(1, 3)))
+        out.append(f"export function {name} ({args}) {{")
+        for _ in range(rnd.randint(3, 12)):
+            a, b = rnd.sample(WORDS, 2)
+            out.append(f"  const {a}{rnd.randint(0, 99)} = {b}?.{ident(rnd)} ?? {rnd.randint(0, 9999)}")
+        out.append(f"  return {{ ok: {rnd.choice(WORDS)} }}")
+        out.append("}")
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def go_filler(rnd, pkg, lines):
+    out = [f"package {pkg}", "", 'import "fmt"', ""]
+    while len(out) < lines:
+        name = ident(rnd).title()
+        out.append(f"func {name}(in string) (string, error) {{")
+        for _ in range(rnd.randint(3, 10)):
+            out.append(f"\t{rnd.choice(WORDS)}{rnd.randint(0, 99)} := fmt.Sprintf(\"%s-{rnd.randint(0, 999)}\", in)")
+            out.append(f"\t_ = {out[-1].split()[0].strip()}")
+        out.append("\treturn in, nil")
+        out.append("}")
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def capability_file(rnd, ns):
+    out = ["import { capability, Schema, ok } from '@ucanto/validator'",
+           "import { equalWith, SpaceDID } from './utils.js'", ""]
+    for verb in rnd.sample(VERBS, rnd.randint(3, 6)):
+        fields = rnd.sample(WORDS, rnd.randint(1, 3))
+        nb = ",\n".join(f"      {f}: Schema.{rnd.choice(['link', 'string', 'integer'])}()" for f in fields)
+        out.append(f"""export const {verb} = capability({{
+  can: '{ns}/{verb}',
+  with: SpaceDID,
+  nb: Schema.struct({{
+{nb}
+  }}),
+  derives: equalWith,
+}})
+""")
+    return "\n".join(out)
+
+
+def service_file(rnd, ns, package):
+    verbs = rnd.sample(VERBS, rnd.randint(2, 4))
+    out = ["import * as Server from '@ucanto/server'",
+           f"import * as {ns.title()} from '{package}/{ns}'", ""]
+    out.append(f"export const {ns}Service = (context) => ({{")
+    for verb in verbs:
+        out.append(f"  {verb}: Server.provide({ns.title()}.{verb}, async ({{ capability, invocation }}) => {{")
+        out.append(f"    const res = await context.{ident(rnd)}.{verb}(capability.nb)")
+        out.append("    return res")
+        out.append("  }),")
+    out.append("})")
+    return "\n".join(out) + "\n"
+
+
+def worker_entry(rnd, name):
+    routes = "\n".join(f"router.{rnd.choice(['get', 'post', 'put'])}('/{rnd.choice(NAMESPACES)}/:{rnd.choice(WORDS)}', handle{i})"
+                       for i in range(rnd.randint(2, 6)))
+    env = rnd.choice(["UPLOAD_SERVICE_URL", "CLAIMS_ENDPOINT", "GATEWAY_URL"])
+    return f"""import * as Server from '@ucanto/server'
+import {{ connect }} from '@ucanto/client'
+import * as HTTP from '@ucanto/transport/http'
+import {{ CAR }} from '@ucanto/transport'
+import {{ Router }} from 'itty-router'
+
+const router = Router()
+{routes}
+
+export default {{
+  async fetch (request, env, ctx) {{
+    if (request.method === 'POST') {{
+      await env.{name.upper().replace('-', '_')}_QUEUE.send({{ at: Date.now() }})
+      await fetch(env.{env})
+    }}
+    const conn = connect({{
+      id: env.SERVICE_PRINCIPAL,
+      codec: CAR.outbound,
+      channel: HTTP.open({{ url: new URL(env.{env}) }}),
+    }})
+    return router.handle(request, env, ctx, conn)
+  }},
+  async queue (batch, env) {{}}
+}}
+"""
+
+
+def wrangler_toml(rnd, name):
+    parts = [f'name = "{name}"', 'main = "src/index.js"', 'compatibility_date = "2024-01-01"',
+             f'routes = [{{ pattern = "{name}.storacha.network/*", zone_name = "storacha.network" }}]', ""]
+    for i in range(rnd.randint(1, 3)):
+        parts += ["[[r2_buckets]]", f'binding = "BUCKET_{i}"', f'bucket_name = "{name}-bucket-{i}"', ""]
+    parts += ["[[kv_namespaces]]", 'binding = "CACHE"', f'id = "{rnd.getrandbits(64):016x}"', ""]
+    if rnd.random() < 0.5:
+        parts += ["[[d1_databases]]", 'binding = "DB"', f'database_name = "{name}-db"', ""]
+    parts += ["[[queues.producers]]", f'binding = "{name.upper().replace("-", "_")}_QUEUE"',
+              f'queue = "{name}-queue"', "",
+              "[[queues.consumers]]", f'queue = "{name}-queue"', "",
+              "[[services]]", 'binding = "INDEXER"', 'service = "indexing-service"', "",
+              "[vars]", f'UPLOAD_SERVICE_URL = "https://up.storacha.network"',
+              f'INDEXER_DID = "did:web:indexer.storacha.network"', ""]
+    for env in ("staging", "production"):
+        parts += [f"[env.{env}]", f'name = "{name}-{env}"', "",
+                  f"[[env.{env}.r2_buckets]]", 'binding = "BUCKET_0"',
+                  f'bucket_name = "{name}-{env}-bucket"', ""]
+    return "\n".join(parts) + "\n"
+
+
+def node_modules(rnd, root, scale):
+    """A deep dependency tree; every scanner should prune it."""
+    budget = int(rnd.randint(80, 200) * scale)
+    stack = [Path("node_modules")]
+    while budget > 0 and stack:
+        base = stack.pop(0)
+        for _ in range(rnd.randint(2, 5)):
+            pkg = f"@{rnd.choice(['ucanto', 'ipld', 'storacha', 'web3-storage'])}/{rnd.choice(WORDS)}-{rnd.randint(0, 99)}"
+            pdir = base / pkg
+            write(root, pdir / "package.json",
+                  json.dumps({"name": pkg, "version": "1.0.0", "dependencies": {"pg": "^8.0.0"}}))
+            write(root, pdir / "dist" / "index.js",
+                  capability_file(rnd, rnd.choice(NAMESPACES)) + js_filler(rnd, 40))
+            budget -= 2
+            if len(stack) < 20:
+                stack.append(pdir / "node_modules")
+
+
+def ignored_output(rnd, root, out_dir, files, scale):
+    """Build output under out_dir that .gitignore covers but no SKIP_DIRS entry does."""
+    write(root, ".gitignore", f"node_modules/\n{out_dir.split('/')[0]}/\n*.log\n")
+    for i in range(int(files * scale)):
+        write(root, f"{out_dir}/bundle-{rnd.randint(0, 0xffff):04x}{i}/index.js",
+              capability_file(rnd, rnd.choice(NAMESPACES)) + js_filler(rnd, rnd.randint(200, 600)))
+
+
+def js_repo(rnd, root, name, scale):
+    nss = rnd.sample(NAMESPACES, rnd.randint(2, 5))
+    write(root, "package.json", json.dumps({
+        "name": f"{name}-monorepo", "private": True, "workspaces": ["packages/*"],
+        "devDependencies": {"mocha": "^10.0.0", "typescript": "^5.0.0"},
+    }, indent=2))
+    write(root, "packages/capabilities/package.json", json.dumps({
+        "name": f"@storacha/{name}-capabilities", "version": "1.0.0",
+        "dependencies": {"@ucanto/core": "^9.0.0", "@ucanto/validator": "^9.0.0"},
+    }, indent=2))
+    for ns in nss:
+        write(root, f"packages/capabilities/src/{ns}.js", capability_file(rnd, ns))
+    write(root, "packages/capabilities/src/index.js",
+          "\n".join(f"export * as {ns.title()} from './{ns}.js'" for ns in nss) + "\n")
+    write(root, "packages/service/package.json", json.dumps({
+        "name": f"@storacha/{name}-service", "version": "1.0.0",
+        "dependencies": {"@ucanto/server": "^10.0.0", f"@storacha/{name}-capabilities": "workspace:^",
+                         **{p: "^3.0.0" for p in rnd.sample(JS_DB_PACKAGES, 2)}},
+    }, indent=2))
+    for ns in nss:
+        write(root, f"packages/service/src/service/{ns}.js", service_file(rnd, ns, f"@storacha/{name}-capabilities"))
+    write(root, "packages/service/src/server.js",
+          "import * as Server from '@ucanto/server'\n\n"
+          "export const createServer = (context) => Server.create({\n"
+          "  id: context.signer,\n  codec: context.codec,\n  service: context.service,\n})\n")
+    write(root, "src/index.js", worker_entry(rnd, name))
+    write(root, "wrangler.toml", wrangler_toml(rnd, name))
+    write(root, ".dev.vars", "\n".join(f"{v}=http://localhost:{rnd.randint(3000, 9000)}"
+                                       for v in rnd.sample(ENV_VARS, 4)) + "\n")
+    for i in range(int(rnd.randint(15, 45) * scale)):
+        pkg = rnd.choice(["capabilities", "service"])
+        write(root, f"packages/{pkg}/src/lib/{rnd.choice(WORDS)}-{i}.js",
+              js_filler(rnd, rnd.randint(30, 200)))
+    for ns in nss:
+        write(root, f"packages/service/test/{ns}.test.js",
+              f"import {{ {ns}Service }} from '../src/service/{ns}.js'\n" + js_filler(rnd, 40))
+    node_modules(rnd, root, scale)
+    ignored_output(rnd, root, ".wrangler/tmp", 4, scale)
+
+
+def go_repo(rnd, root, name, scale):
+    drivers = rnd.sample(GO_DRIVERS, 2)
+    write(root, "go.mod", f"module github.com/storacha/{name}\n\ngo 1.22\n\nrequire (\n"
+          + "".join(f"\t{d}\n" for d in drivers) + ")\n")
+    write(root, f"cmd/{name}/main.go", f"""package main
+
+import (
+\t"net/http"
+
+\t"github.com/storacha/{name}/pkg/server"
+)
+
+func main() {{
+\tmux := http.NewServeMux()
+\tserver.Register(mux)
+\thttp.ListenAndServe(":3000", mux)
+}}
+""")
+    routes = []
+    handlers = []
+    for i in range(rnd.randint(3, 8)):
+        method = rnd.choice(["GET", "POST", "PUT", "DELETE"])
+        ns, verb = rnd.choice(NAMESPACES), rnd.choice(VERBS)
+        h = f"{method.title()}{ns.title()}{verb.title()}Handler"
+        routes.append(f'\tmux.HandleFunc("{method} /{ns}/{verb}/{{id}}", {h})')
+        handlers.append(f"func {h}(w http.ResponseWriter, r *http.Request) {{\n\tw.WriteHeader(200)\n}}\n")
+    write(root, "pkg/server/routes.go", "package server\n\nimport \"net/http\"\n\n"
+          "func Register(mux *http.ServeMux) {\n" + "\n".join(routes) + "\n}\n\n" + "\n".join(handlers))
+    write(root, "pkg/client/client.go", f"""package client
+
+import (
+\t"context"
+\t"net/http"
+)
+
+func Fetch(ctx context.Context, base string) (*http.Response, error) {{
+\treq, err := http.NewRequest("POST", base+"/{rnd.choice(NAMESPACES)}", nil)
+\tif err != nil {{
+\t\treturn nil, err
+\t}}
+\treturn http.DefaultClient.Do(req.WithContext(ctx))
+}}
+""")
+    for i in range(int(rnd.randint(10, 30) * scale)):
+        pkg = rnd.choice(WORDS)
+        write(root, f"pkg/{pkg}/{rnd.choice(WORDS)}_{i}.go", go_filler(rnd, pkg, rnd.randint(30, 150)))
+    for i in range(int(rnd.randint(10, 40) * scale)):
+        write(root, f"vendor/github.com/{rnd.choice(WORDS)}/{rnd.choice(WORDS)}/lib_{i}.go",
+              go_filler(rnd, "lib", 60))
+    write(root, ".env.example", "\n".join(f"{v}=" for v in rnd.sample(ENV_VARS, 3)) + "\n")
+
+
+def infra_repo(rnd, root, name, scale):
+    write(root, "package.json", json.dumps({
+        "name": f"{name}", "private": True,
+        "dependencies": {"sst": "^2.0.0", **{p: "^3.0.0" for p in rnd.sample(JS_DB_PACKAGES, 3)}},
+    }, indent=2))
+    write(root, "sst.config.ts", f"""export default {{
+  config () {{ return {{ name: '{name}', region: 'us-west-2' }} }},
+  stacks (app) {{ app.stack(UploadDbStack) }}
+}}
+""")
+    for i in range(rnd.randint(2, 5)):
+        table = f"{rnd.choice(WORDS)}-{i}"
+        fields = ",\n".join(f"      {w}: '{rnd.choice(['string', 'number'])}'" for w in rnd.sample(WORDS, 3))
+        write(root, f"stacks/{rnd.choice(WORDS).title()}{i}Stack.js", f"""import {{ Table, Bucket, Queue }} from 'sst/constructs'
+
+export function Stack{i} ({{ stack }}) {{
+  const table = new Table(stack, '{table}', {{
+    fields: {{
+{fields}
+    }},
+    primaryIndex: {{ partitionKey: 'id' }},
+  }})
+  const bucket = new Bucket(stack, '{table}-bucket')
+  const queue = new Queue(stack, '{table}-queue')
+  return {{ table, bucket, queue }}
+}}
+""")
+    tf = []
+    for i in range(rnd.randint(3, 10)):
+        kind = rnd.choice(["aws_dynamodb_table", "aws_s3_bucket", "aws_sqs_queue", "aws_lambda_function",
+                           "aws_iam_role", "aws_route53_record", "aws_elasticache_cluster"])
+        tf.append(f'resource "{kind}" "{rnd.choice(WORDS)}_{i}" {{\n  name = "{name}-{i}"\n}}\n')
+    write(root, "deploy/main.tf", "\n".join(tf))
+    for i in range(int(rnd.randint(3, 12) * scale)):
+        table = f"{rnd.choice(WORDS)}_{i}"
+        cols = ",\n".join(f"  {w} {rnd.choice(['TEXT', 'INTEGER', 'BYTEA', 'TIMESTAMP'])}"
+                          for w in rnd.sample(WORDS, 4))
+        sql = f"CREATE TABLE IF NOT EXISTS {table} (\n  id TEXT PRIMARY KEY,\n{cols}\n);\n"
+        if i and rnd.random() < 0.5:
+            sql += f"ALTER TABLE {rnd.choice(WORDS)}_{i - 1} ADD COLUMN {rnd.choice(WORDS)} TEXT;\n"
+        write(root, f"migrations/{i:04d}_{table}.sql", sql)
+    write(root, "docker-compose.yml", "services:\n  postgres:\n    image: postgres:16\n"
+          "  redis:\n    image: redis:7\n  localstack:\n    image: localstack/localstack\n")
+    write(root, ".env.template", "\n".join(f"{v}=" for v in rnd.sample(ENV_VARS, 4)) + "\n")
+    for i in range(int(rnd.randint(5, 15) * scale)):
+        write(root, f"infra/lib/{rnd.choice(WORDS)}-{i}.ts", js_filler(rnd, rnd.randint(20, 80)))
+    node_modules(rnd, root, scale / 2)
+    ignored_output(rnd, root, ".sst/artifacts", 3, scale)
+
+
+def docs_repo(rnd, root, name, scale):
+    write(root, "README.md", f"# {name}\n\nDocumentation for the {rnd.choice(WORDS)} platform.\n")
+    for i in range(int(rnd.randint(5, 20) * scale)):
+        paras = "\n\n".join(" ".join(rnd.choices(WORDS, k=60)) for _ in range(rnd.randint(3, 10)))
+        write(root, f"docs/{rnd.choice(WORDS)}-{i}.md", f"# {rnd.choice(WORDS).title()}\n\n{paras}\n")
+
+
+BUILDERS = {"js": js_repo, "go": go_repo, "infra": infra_repo, "docs": docs_repo}
+
+
+def repo_name(seed, i):
+    rnd = random.Random(f"{seed}:{i}:name")
+    kind = KINDS[i % len(KINDS)]
+    return f"{rnd.choice(WORDS)}-{kind}-{i:04d}"
+
+
+def generate_repo(out_dir, seed, i, scale=1.0, git=False):
+    """Write repo i of the org under out_dir and return its path."""
+    name = repo_name(seed, i)
+    root = Path(out_dir) / name
+    rnd = random.Random(f"{seed}:{i}")
+    BUILDERS[KINDS[i % len(KINDS)]](rnd, root, name, scale)
+    if git:
+        env = {**os.environ, "GIT_AUTHOR_NAME": "synth", "GIT_AUTHOR_EMAIL": "synth@example.com",
+               "GIT_COMMITTER_NAME": "synth", "GIT_COMMITTER_EMAIL": "synth@example.com",
+               "GIT_AUTHOR_DATE": "2024-01-01T00:00:00Z", "GIT_COMMITTER_DATE": "2024-01-01T00:00:00Z"}
+        for cmd in (["init", "-q"], ["add", "-A", "-f", "."], ["commit", "-q", "-m", "synthetic"]):
+            subprocess.run(["git", "-C", str(root), *cmd], check=True, env=env)
+    return root
+
+
+def generate_org(out_dir, repos, seed=0, scale=1.0, git=False):
+    """Create repos 0..repos-1 under out_dir, skipping ones that already exist."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(repos):
+        path = out_dir / repo_name(seed, i)
+        if not path.exists():
+            generate_repo(out_dir, seed, i, scale, git)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Storacha-shaped org.")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--repos", type=int, default=100, help="Number of repos (default: 100)")
+    parser.add_argument("--seed", default="0", help="Generation seed (default: 0)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplier on files per repo (default: 1.0)")
+    parser.add_argument("--git", action="store_true",
+                        help="Commit each repo so --source git can scan it")
+    args = parser.parse_args()
+
+    paths = generate_org(args.out_dir, args.repos, args.seed, args.scale, args.git)
+    print(f"{len(paths)} repos in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
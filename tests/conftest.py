@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scanners are run as scripts from scripts/, importing scanlib as a sibling
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
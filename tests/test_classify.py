@@ -0,0 +1,27 @@
+import scanlib
+from scanlib import SNIFF_BYTES, WorkTree, classify, skip_file
+
+
+def test_classify_reasons():
+    assert classify("dist/x.min.js") == "generated_name"
+    assert classify("a.js", b"ab\0cd") == "binary"
+    assert classify("a.go", b"// Code generated by protoc. DO NOT EDIT.\npackage a\n") == "generated_marker"
+    assert classify("a.js", b"x()\n//# sourceMappingURL=a.js.map\n") == "source_map"
+    assert classify("a.js", b"x" * SNIFF_BYTES) == "minified"
+    assert classify("a.js", b"export const a = 1\n") is None
+
+
+def test_long_files_of_normal_lines_are_not_minified():
+    assert classify("a.js", b"const a = 1\n" * SNIFF_BYTES) is None
+
+
+def test_skip_file_counts_why(tmp_path):
+    (tmp_path / "a.js").write_bytes(b"x" * SNIFF_BYTES * 2)
+    (tmp_path / "b.js").write_text("export const b = 1\n")
+    tree = WorkTree(tmp_path)
+    scanlib.SCAN_STATS.clear()
+    assert skip_file(tree, "a.js")
+    assert not skip_file(tree, "b.js")
+    assert skip_file(tree, "missing.min.js")        # settled by name, never read
+    assert dict(scanlib.SCAN_STATS) == {"skipped_minified": 1, "skipped_generated_name": 1}
+    scanlib.SCAN_STATS.clear()
@@ -0,0 +1,113 @@
+import scanlib
+from scanlib import FindingsCache, WorkTree, cached_scan
+
+
+def scan_with(cache, repo, rel, result):
+    calls = []
+
+    def scan(data):
+        calls.append(data)
+        return result
+
+    found = cached_scan(cache, WorkTree(repo), str(repo), rel, scan, 1000)
+    cache.flush()
+    return found, calls
+
+
+def test_unchanged_file_is_served_from_stat(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.js").write_text("x")
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+    assert scan_with(cache, repo, "a.js", [{"n": 1}])[1]
+    found, calls = scan_with(cache, repo, "a.js", [{"n": 2}])
+    assert found == [{"n": 1}]
+    assert calls == []
+
+
+def test_new_version_misses_stat_rows(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.js").write_text("x")
+    scan_with(FindingsCache(tmp_path / "cache.sqlite", "v1"), repo, "a.js", [{"n": 1}])
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v2")
+    found, calls = scan_with(cache, repo, "a.js", [{"n": 2}])
+    assert found == [{"n": 2}]
+    assert calls == [b"x"]
+
+
+def test_changed_content_is_rescanned(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.js").write_text("x")
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+    scan_with(cache, repo, "a.js", [{"n": 1}])
+    (repo / "a.js").write_text("yy")
+    assert scan_with(cache, repo, "a.js", [{"n": 2}])[0] == [{"n": 2}]
+
+
+def test_timeouts_are_not_stored(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.js").write_text("x")
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+    scan_with(cache, repo, "a.js", {scanlib.TIMEOUT_KEY: ["r"]})
+    assert scan_with(cache, repo, "a.js", [])[1]
+
+
+def test_unversioned_stats_table_is_replaced(tmp_path):
+    import sqlite3
+    db = sqlite3.connect(tmp_path / "cache.sqlite")
+    db.execute("CREATE TABLE stats (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, key TEXT)")
+    db.execute("INSERT INTO stats VALUES ('p', 1, 1, 'k')")
+    db.commit()
+    db.close()
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+    assert cache.db.execute("SELECT COUNT(*) FROM stats").fetchone()[0] == 0
+
+
+def test_evict_drops_least_recently_used(tmp_path):
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1", max_bytes=30)
+    for n in range(5):
+        cache.put(f"k{n}", ["x" * 10])
+        cache.flush()
+    assert cache.evict() > 0
+    assert cache.get("k4") == ["x" * 10]
+    assert cache.get("k0") is None
+
+
+def test_hits_replay_the_stats_their_scan_counted(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.js").write_text("x")
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+
+    def scan(data):
+        scanlib.SCAN_STATS["superseded"] += 2
+        return {"routes": []}
+
+    counts = []
+    for _ in range(2):
+        scanlib.SCAN_STATS.clear()
+        cached_scan(cache, WorkTree(repo), str(repo), "a.js", scan, 1000)
+        cache.flush()
+        counts.append(dict(scanlib.SCAN_STATS))
+    scanlib.SCAN_STATS.clear()
+    assert counts == [{"superseded": 2}, {"superseded": 2}]
+
+
+def test_api_scan_is_the_same_cold_and_warm(tmp_path):
+    import scan_api_surface
+    repo = tmp_path / "repo"
+    (repo / "src").mkdir(parents=True)
+    (repo / "src" / "server.js").write_text(
+        "import { Server } from '@ucanto/server'\n"
+        "export const handler = Server.provide(Blob.add, async () => {})\n"
+        "app.get('/health', ok)\n")
+    (repo / "src" / "bundle.js").write_text("x" * scanlib.SNIFF_BYTES)
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+    runs = [scanlib._counted(lambda path: scan_api_surface.scan_repo(path, cache), repo)
+            for _ in range(2)]
+    assert runs[0] == runs[1]
+    assert runs[0][1] == {"skipped_minified": 1}
+    assert any(runs[0][0].values())
@@ -0,0 +1,98 @@
+import os
+import subprocess
+
+import pytest
+
+import scan_api_surface
+from scanlib import GitTree, WorkTree, open_tree
+
+SKIP = {"node_modules"}
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True,
+                   env={**os.environ, "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@t",
+                        "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@t"})
+
+
+def write(repo, files):
+    for rel, text in files.items():
+        path = repo / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    write(tmp_path, {
+        ".gitignore": "*.log\n",
+        "src/a.js": "import { b } from './b'\n",
+        "src/b.js": "export const b = 1\n",
+        "big.txt": "0123456789" * 1000,
+    })
+    (tmp_path / "link.js").symlink_to("src/a.js")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "one")
+    git(tmp_path, "tag", "one")
+    write(tmp_path, {"src/b.js": "export const b = 2\n", "src/c.js": "x\n", "debug.log": "x\n"})
+    return tmp_path
+
+
+def test_lists_committed_blobs_only(repo):
+    with GitTree(repo) as tree:
+        assert [rel for rel, _ in tree.files(SKIP)] == [".gitignore", "big.txt", "src/a.js", "src/b.js"]
+        assert tree.exists("src") and tree.exists("src/b.js")
+        assert not tree.exists("src/c.js") and not tree.exists("link.js")
+        assert [str(p) for p in tree.rglob("src/*.js")] == ["src/a.js", "src/b.js"]
+
+
+def test_reads_contents_at_the_ref(repo):
+    with GitTree(repo, "one") as tree:
+        assert tree.read_text("src/b.js") == "export const b = 1\n"
+        assert tree.read_bytes("big.txt", 5) == b"01234"
+        # A partial read leaves cat-file ready for the next object
+        assert tree.read_bytes("src/a.js") == b"import { b } from './b'\n"
+        chunks = tree.iter_bytes("big.txt", 4096)
+        assert next(chunks) == b"0123456789" * 409 + b"012345"
+        chunks.close()
+        assert b"".join(tree.iter_bytes("big.txt", 4096)) == b"0123456789" * 1000
+        assert tree.read_bytes("missing") == b""
+
+
+def test_blob_id_is_the_git_object_id(repo):
+    oid = subprocess.run(["git", "-C", str(repo), "rev-parse", "one:src/a.js"],
+                         capture_output=True, text=True).stdout.strip()
+    with GitTree(repo) as tree:
+        assert tree.blob_id("src/a.js") == oid
+        assert tree.blob_id("src/c.js") is None
+
+
+def test_paths_limit_the_listing(repo):
+    with open_tree(repo, "HEAD", ["src/b.js", "gone.js"]) as tree:
+        assert [rel for rel, _ in tree.files(SKIP)] == ["src/b.js"]
+
+
+def test_bad_ref_is_an_error(repo):
+    with pytest.raises(RuntimeError, match="ls-tree"):
+        GitTree(repo, "no-such-ref")
+
+
+def test_open_tree_without_a_ref_reads_the_checkout(repo):
+    with open_tree(repo) as tree:
+        assert isinstance(tree, WorkTree)
+        assert tree.read_text("src/b.js") == "export const b = 2\n"
+
+
+def test_scanning_the_commit_ignores_working_tree_changes(repo):
+    write(repo, {"src/a.js": "app.get('/new', h)\n", "src/c.js": "app.get('/untracked', h)\n"})
+    git(repo, "commit", "-q", "-am", "two")
+    write(repo, {"src/a.js": "app.get('/edited', h)\n"})
+
+    def paths(ref):
+        return [(r["file"], r["path"]) for r in scan_api_surface.scan_repo(repo, ref=ref)["routes"]]
+
+    assert paths("HEAD") == [("src/a.js", "/new")]
+    assert paths("one") == []
+    # The checkout also follows the link.js symlink, which git trees skip
+    assert paths(None) == [("link.js", "/edited"), ("src/a.js", "/edited"), ("src/c.js", "/untracked")]
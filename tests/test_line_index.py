@@ -0,0 +1,20 @@
+from collections import defaultdict
+
+from scanlib import LineIndex, Rule, RuleSet
+
+
+def test_offsets_map_to_one_based_lines_and_columns():
+    lines = LineIndex("ab\ncd\n\nef")
+    assert lines.at(0) == {"line": 1, "col": 1}
+    assert lines.at(2) == {"line": 1, "col": 3}     # the newline itself
+    assert lines.at(4) == {"line": 2, "col": 2}
+    assert lines.at(6) == {"line": 3, "col": 1}
+    assert lines.at(8) == {"line": 4, "col": 2}
+
+
+def test_engine_adds_line_and_col_to_findings():
+    rule = Rule("call", "calls", ["fetch("], r"fetch\((\w+)\)", lambda m, ctx: {"name": m.group(1)})
+    result = defaultdict(list)
+    RuleSet([rule]).run("x\n  fetch(a)\nfetch(b)", "a.js", result)
+    assert result["calls"] == [{"name": "a", "line": 2, "col": 3},
+                               {"name": "b", "line": 3, "col": 1}]
@@ -0,0 +1,101 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+QUERY = Path(__file__).resolve().parent.parent / "tools" / "query.py"
+
+
+@pytest.fixture(scope="module")
+def query():
+    spec = importlib.util.spec_from_file_location("query", QUERY)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_capability_query_falls_back_to_ref_text_when_unresolved(query):
+    api = {
+        "capability_catalog": [{"can": "blob/add", "export_name": "add", "repo": "lib",
+                                "file": "caps.js", "with": "SpaceDID"}],
+        "per_repo": {"svc": {"capability_handlers": [
+            {"pattern": "Server.provide", "capability_ref": "Blob.add", "file": "h.js"},
+            {"pattern": "Server.provide", "capability_ref": "Other.list", "file": "o.js",
+             "can": "other/list"},
+        ]}},
+        "service_graph": [
+            {"from": "svc", "to": "lib", "via": "ucanto", "capability": "BlobCaps.add"},
+        ],
+    }
+    ix = query.build_indexes(api, {}, {})
+    out = query._cap_by_name(ix, "blob/add")
+    assert "Handled by" in out
+    assert "Blob.add" in out and "Other.list" not in out
+    assert "BlobCaps.add" in out
+
+
+def test_capability_query_uses_the_resolved_can(query):
+    api = {
+        "capability_catalog": [{"can": "blob/add", "export_name": "add", "repo": "lib",
+                                "file": "caps.js", "with": "SpaceDID"}],
+        "per_repo": {"svc": {"capability_handlers": [
+            {"pattern": "Server.provide", "capability_ref": "Renamed.thing", "file": "h.js",
+             "can": "blob/add"},
+        ]}},
+        "service_graph": [],
+    }
+    out = query._cap_by_name(query.build_indexes(api, {}, {}), "blob/add")
+    assert "Renamed.thing" in out
+
+
+GRAPH = {
+    "lib": {
+        "imports": {"packages/caps/src/index.js": ["packages/caps/src/blob.js"]},
+        "external": {},
+        "packages": {"@org/caps": "packages/caps", "@org/root": ""},
+    },
+    "svc": {
+        "imports": {"src/server.js": ["src/handlers.js"]},
+        "external": {"src/handlers.js": ["@org/caps"], "src/other.js": ["left-pad"]},
+        "packages": {},
+    },
+}
+
+
+def test_owning_package_picks_the_innermost(query):
+    packages = GRAPH["lib"]["packages"]
+    assert query._owning_package(packages, "packages/caps/src/blob.js") == "@org/caps"
+    assert query._owning_package(packages, "README.md") == "@org/root"
+    assert query._owning_package({"a": "pkg"}, "other/x.js") is None
+
+
+def test_reach_follows_imports_across_repos(query):
+    reached = set(query._reach(GRAPH, [("lib", "packages/caps/src/blob.js")]))
+    assert reached == {
+        ("lib", "packages/caps/src/blob.js"),
+        ("lib", "packages/caps/src/index.js"),
+        ("svc", "src/handlers.js"),
+        ("svc", "src/server.js"),
+    }
+
+
+
+
+def test_changes_reports_findings_in_importing_files(query, monkeypatch):
+    monkeypatch.setattr(query, "_load_import_graph", lambda: GRAPH)
+    api = {
+        "capability_catalog": [{"can": "blob/add", "export_name": "add", "repo": "lib",
+                                "file": "packages/caps/src/blob.js", "with": "SpaceDID"}],
+        "per_repo": {
+            "lib": {"capabilities": [{"can": "blob/add", "export_name": "add",
+                                      "file": "packages/caps/src/blob.js", "line": 3}]},
+            "svc": {"routes": [{"method": "GET", "path": "/x", "framework": "hono",
+                                "file": "src/server.js", "line": 7}]},
+        },
+        "service_graph": [],
+    }
+    out = query.query_changes(query.build_indexes(api, {}, {}), ["lib/packages/caps/src/blob.js"])
+    assert "**Affected files:** 4 (3 through imports)" in out
+    assert "| `blob/add` | lib | `packages/caps/src/blob.js:3` |" in out
+    assert "- svc: GET /x (hono) `src/server.js:7`" in out
+    assert query.query_changes(query.build_indexes(api, {}, {}), []) == "No changed files."
@@ -0,0 +1,75 @@
+import re
+import time
+from collections import defaultdict
+
+import pytest
+
+import scanlib
+from scanlib import Rule, RuleSet, rule_budget
+
+
+def build(m, ctx):
+    return {"name": m.group(1), "file": ctx.rel}
+
+
+RULES = [
+    Rule("call", "calls", ["fetch("], r"fetch\(([\w.]+)\)", build, span=64),
+    Rule("route", "routes", ["app.get("], r"app\.get\('([^']+)'", build, span=64),
+]
+
+
+def run(rules, content):
+    result = defaultdict(list)
+    rules.run(content, "a.js", result)
+    return result
+
+
+def test_literal_prefilter_skips_rules_without_literals():
+    rules = RuleSet(RULES)
+    assert rules.literals_in("nothing here") == set()
+    assert rules.literals_in("FETCH(x)") == {"fetch("}
+    assert run(rules, "nothing here") == {}
+
+
+def test_bytes_prefilter_sees_literals_across_chunks():
+    rules = RuleSet(RULES)
+    assert rules.literals_in_bytes([b"xx FET", b"CH(y) app.", b"get('/')"]) == {"fetch(", "app.get("}
+    assert rules.literals_in_bytes(b"fetch") == set()
+
+
+def test_only_rules_with_a_literal_present_run():
+    result = run(RuleSet(RULES), "fetch(url)\n")
+    assert [f["name"] for f in result["calls"]] == ["url"]
+    assert "routes" not in result
+
+
+def test_once_rule_reports_the_first_match_only():
+    once = Rule("uses", "uses", ["fetch("], r"fetch\((\w+)\)", build, once=True)
+    assert [f["name"] for f in run(RuleSet([once]), "fetch(a) fetch(b)")["uses"]] == ["a"]
+
+
+def test_rule_budget_stops_a_runaway_match(monkeypatch):
+    monkeypatch.setattr(scanlib, "RULE_BUDGET", 0.2)
+    start = time.perf_counter()
+    with pytest.raises(scanlib.RuleTimeout):
+        with rule_budget():
+            re.match(r"(a+)+$", "a" * 40 + "b")
+    assert time.perf_counter() - start < 5
+
+
+def test_timed_out_rule_keeps_nothing(monkeypatch):
+    monkeypatch.setattr(scanlib, "RULE_BUDGET", 0.2)
+    slow = Rule("slow", "calls", ["a"], r"(a+)+$", build)
+    result = run(RuleSet([slow, RULES[0]]), "fetch(x) " + "a" * 40 + "b")
+    assert [f["name"] for f in result["calls"]] == ["x"]
+    assert result[scanlib.TIMEOUT_KEY] == [{"rule": "slow", "file": "a.js", "budget": 0.2}]
+
+
+def test_supersedes_drops_the_less_specific_finding_and_counts_it():
+    call_env = Rule("call_env", "calls", ["fetch(env."], r"fetch\(env\.(\w+)\)", build, span=64,
+                    supersedes=["call"])
+    scanlib.SCAN_STATS.clear()
+    result = run(RuleSet(RULES + [call_env]), "fetch(url)\nfetch(env.API)\n")
+    assert [(f["name"], f["line"]) for f in result["calls"]] == [("url", 1), ("API", 2)]
+    assert scanlib.SCAN_STATS["superseded"] == 1
+    scanlib.SCAN_STATS.clear()
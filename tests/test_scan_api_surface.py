@@ -0,0 +1,26 @@
+import scan_api_surface
+
+FILES = {
+    "lib/package.json": '{"name": "@org/caps", "exports": {".": "./src/index.js", "./blob": "./src/blob.js"}}',
+    "lib/src/blob.js": "import { capability, Schema } from '@ucanto/validator'\n"
+                       "export const add = capability({\n  can: 'blob/add',\n  with: Schema.did(),\n})\n",
+    "lib/src/index.js": "export * as Blob from './blob.js'\n",
+    "svc/src/server.js": "import * as Server from '@ucanto/server'\n"
+                         "import { Blob } from '@org/caps'\n"
+                         "import * as Caps from '@org/caps/blob'\n"
+                         "export const a = Server.provide(Blob.add, async () => {})\n"
+                         "export const b = Server.provide(Caps.add, async () => {})\n"
+                         "export const c = Server.provide(Other.list, async () => {})\n",
+}
+
+
+def test_handler_refs_resolve_through_package_imports(tmp_path):
+    for rel, text in FILES.items():
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(text)
+    repos = {name: tmp_path / name for name in ("lib", "svc")}
+    results = {name: scan_api_surface.scan_repo(path) for name, path in repos.items()}
+    assert scan_api_surface.resolve_capability_refs(results, repos) == 2
+    handlers = results["svc"]["capability_handlers"]
+    assert [(h["capability_ref"], h.get("can")) for h in handlers] == [
+        ("Blob.add", "blob/add"), ("Caps.add", "blob/add"), ("Other.list", None)]
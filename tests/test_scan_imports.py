@@ -0,0 +1,64 @@
+import scan_imports
+from scanlib import FindingsCache
+
+FILES = {
+    "package.json": '{"name": "root", "private": true}',
+    "src/app.ts": "import { a } from './lib/a'\n"
+                  "import util from './util'\n"
+                  "import { caps } from '@org/caps'\n"
+                  "import { blob } from '@org/caps/blob'\n"
+                  "import * as x from '@org/caps/x/deep'\n"
+                  "import old from '@org/old/helper'\n"
+                  "import fs from 'node:fs'\n"
+                  "import { z } from 'zod/v4'\n"
+                  "const lazy = () => import('./lib/a.js')\n"
+                  "const self = require('./app')\n",
+    "src/lib/a.ts": "export const a = 1\n",
+    "src/util/index.js": "export default {}\n",
+    "packages/caps/package.json": '{"name": "@org/caps", "exports": {".": "./src/index.js", '
+                                  '"./blob": "./src/blob.js", "./x/*": "./src/x/*.js"}}',
+    "packages/caps/src/index.js": "export * from './blob.js'\n",
+    "packages/caps/src/blob.js": "export const blob = 1\n",
+    "packages/caps/src/x/deep.js": "export const deep = 1\n",
+    "packages/old/package.json": '{"name": "@org/old", "main": "lib/main.js"}',
+    "packages/old/src/helper.js": "export default 1\n",
+    "go.mod": "module github.com/org/svc\n\ngo 1.22\n",
+    "cmd/main.go": 'package main\n\nimport (\n\t"fmt"\n\t"github.com/org/svc/pkg/store"\n'
+                   '\tipld "github.com/ipld/go-ipld-prime"\n)\n',
+    "pkg/store/store.go": 'package store\n\nimport "context"\n',
+    "pkg/store/kv.go": "package store\n",
+    "src/app.test.ts": "import { a } from './lib/a'\n",
+}
+
+
+def make(tmp_path):
+    for rel, text in FILES.items():
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(text)
+    return tmp_path
+
+
+def test_specifiers_resolve_to_repo_files_or_packages(tmp_path):
+    graph = scan_imports.scan_repo(make(tmp_path))
+    assert graph["imports"] == {
+        "cmd/main.go": ["pkg/store/kv.go", "pkg/store/store.go"],
+        "packages/caps/src/index.js": ["packages/caps/src/blob.js"],
+        "src/app.ts": ["src/lib/a.ts", "src/util/index.js", "packages/caps/src/index.js",
+                       "packages/caps/src/blob.js", "packages/caps/src/x/deep.js",
+                       "packages/old/src/helper.js"],
+    }
+    assert graph["external"] == {"cmd/main.go": ["github.com/ipld/go-ipld-prime"],
+                                 "src/app.ts": ["zod"]}
+    assert graph["packages"] == {"root": "", "@org/caps": "packages/caps", "@org/old": "packages/old",
+                                 "github.com/org/svc": ""}
+
+
+def test_cached_scan_gives_the_same_graph(tmp_path):
+    repo = make(tmp_path / "repo")
+    cache = FindingsCache(tmp_path / "cache.sqlite", "v1")
+    cold = scan_imports.scan_repo(repo, cache)
+    (repo / "src/lib/b.ts").write_text("export const b = 1\n")
+    (repo / "src/lib/a.ts").write_text("import { b } from './b'\n")
+    warm = scan_imports.scan_repo(repo, cache)
+    assert warm["imports"] == {**cold["imports"], "src/lib/a.ts": ["src/lib/b.ts"]}
+    assert scan_imports.scan_repo(repo) == warm
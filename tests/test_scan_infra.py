@@ -0,0 +1,66 @@
+import scan_infra
+from scanlib import PROFILER, WorkTree
+
+
+def test_profile_charges_each_scanner_for_the_shared_read(tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("services:\n  db:\n    image: postgres:16\n")
+    tree = WorkTree(tmp_path)
+    scanners = scan_infra.scanners_for("docker-compose.yml", "docker-compose.yml")
+    PROFILER.enabled = True
+    PROFILER.reset()
+    try:
+        scan_infra.scan_file(tree, "docker-compose.yml", scanners)
+        profile = PROFILER.snapshot(0)
+    finally:
+        PROFILER.enabled = False
+        PROFILER.reset()
+    assert profile["files"] == 1
+    for scanner in scanners:
+        assert profile["scanners"][scanner.__name__]["files"] == 1
+        assert profile["scanners"][scanner.__name__]["bytes"] == profile["bytes"]
+
+
+INFRA_FILES = {
+    "wrangler.toml": 'name = "w"\n[[r2_buckets]]\nbinding = "CARS"\nbucket_name = "cars"\n'
+                     '[[services]]\nbinding = "IDX"\nservice = "indexer"\n',
+    "docker-compose.yml": "services:\n  db:\n    image: postgres:16\n",
+    "go.mod": "module x\n\nrequire github.com/lib/pq v1.0.0\n",
+    "package.json": '{"dependencies": {"pg": "1", "@aws-sdk/client-dynamodb": "3"}}',
+    ".env": "DATABASE_URL=postgres://x\n",
+    "main.tf": 'resource "aws_dynamodb_table" "t" {}\nresource "aws_lambda_function" "f" {}\n',
+    "migrations/1.sql": "CREATE TABLE a (id int);\n",
+}
+
+
+def test_every_finding_type_has_a_kind(tmp_path):
+    for rel, text in INFRA_FILES.items():
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(text)
+    findings = scan_infra.scan_repo(tmp_path)
+    assert len({f["type"] for f in findings}) == 10
+    assert all(f["type"] in scan_infra.FINDING_KINDS for f in findings)
+    declared = (
+        [f"go_driver_{db}" for db in scan_infra.GO_DB_DRIVERS.values()]
+        + [f"js_dep_{db}" for db in scan_infra.JS_DB_PACKAGES.values()]
+        + [f"terraform_{cat}" for _, cat in scan_infra.TERRAFORM_CATEGORIES] + ["terraform_other"]
+        + [f"env_{cat}" for _, cat in scan_infra.INFRA_ENV_PATTERNS]
+    )
+    assert set(declared) <= set(scan_infra.FINDING_KINDS)
+
+
+def test_summarize_groups_details_by_category():
+    summary = scan_infra.summarize({
+        "a": [{"type": "r2_bucket", "bucket_name": "cars"},
+              {"type": "service_binding", "binding": "IDX"},
+              {"type": "terraform_dynamodb", "name": "t"},
+              {"type": "js_dep_dynamodb", "package": "@aws-sdk/client-dynamodb"},
+              {"type": "sql_table", "table_name": "x"},
+              {"type": "rule_timeout", "rule": "r"},
+              {"type": "not_a_kind"}],
+        "b": [{"type": "terraform_s3", "name": "cars"}],
+    })
+    assert {cat: {d: sorted(r) for d, r in items.items()} for cat, items in summary.items()} == {
+        "S3/R2 Buckets": {"cars": ["a", "b"]},
+        "Service Bindings": {"IDX → ?": ["a"]},
+        "DynamoDB": {"t": ["a"], "@aws-sdk/client-dynamodb": ["a"]},
+    }
@@ -0,0 +1,21 @@
+import pytest
+
+from scanlib import scan_repos
+
+
+def double(path):
+    if path == "boom":
+        raise ValueError(path)
+    return path * 2
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 8])
+def test_scan_repos_keeps_input_order_and_drops_failures(jobs, capsys):
+    repos = [("c", "c"), ("boom", "boom"), ("a", "a"), ("b", "b")]
+    assert list(scan_repos(double, repos, jobs).items()) == [("c", "cc"), ("a", "aa"), ("b", "bb")]
+    assert "boom: scan failed: ValueError('boom')" in capsys.readouterr().err
+
+
+def test_parallel_matches_serial():
+    repos = [(str(n), str(n)) for n in range(20)]
+    assert scan_repos(double, repos, 4) == scan_repos(double, repos, 1)
@@ -0,0 +1,154 @@
+import pytest
+
+from scan_infra import SqlTokenizer, parse_ddl, replay_schema, sql_statements
+
+
+def tables(sql, chunk=None):
+    """Table names each DDL statement creates, tokenizing sql in chunks of chunk chars."""
+    chunks = [sql] if chunk is None else [sql[i:i + chunk] for i in range(0, len(sql), chunk)]
+    found = []
+    for tokens, _, _ in sql_statements(SqlTokenizer(chunks)):
+        found += [f["table_name"] for f in parse_ddl(tokens) if f["type"] == "sql_table"]
+    return found
+
+
+CASES = {
+    "standard string ending in a backslash":
+        ("INSERT INTO paths VALUES ('C:\\');\nCREATE TABLE a (id int);", ["a"]),
+    "standard string ending in a backslash, as a default":
+        ("CREATE TABLE a (p text DEFAULT 'C:\\');\nCREATE TABLE b (id int);", ["a", "b"]),
+    "doubled quote":
+        ("INSERT INTO t VALUES ('it''s; CREATE TABLE no (x int)');\nCREATE TABLE a (id int);", ["a"]),
+    "E string with a backslash escape":
+        ("INSERT INTO t VALUES (E'it\\'s; CREATE TABLE no (x int)');\nCREATE TABLE a (id int);", ["a"]),
+    "MySQL backslash escapes after a backquoted name":
+        ("CREATE TABLE `a` (id int);\nINSERT INTO `a` VALUES ('it\\'s; CREATE TABLE no (x int)');\n"
+         "CREATE TABLE b (id int);", ["a", "b"]),
+    "line comment":
+        ("-- CREATE TABLE no (x int);\nCREATE TABLE a (id int); -- trailing ' quote\n"
+         "CREATE TABLE b (id int);", ["a", "b"]),
+    "block comment":
+        ("/* CREATE TABLE no (x int); ' */ CREATE TABLE a (id int);", ["a"]),
+    "dollar-quoted body":
+        ("CREATE FUNCTION f() AS $fn$ CREATE TABLE no (x int); ' $fn$;\nCREATE TABLE a (id int);", ["a"]),
+    "COPY data":
+        ("COPY t (x) FROM stdin;\n1\tCREATE TABLE no (x int); '\n\\.\nCREATE TABLE a (id int);", ["a"]),
+    "quoted identifier with a doubled quote and a semicolon":
+        ('CREATE TABLE "we""ird;" (id int);\nCREATE TABLE a (id int);', ['we"ird;', "a"]),
+    "unterminated string at the end":
+        ("CREATE TABLE a (id int);\nINSERT INTO t VALUES ('open", ["a"]),
+    "unterminated comment at the end":
+        ("CREATE TABLE a (id int);\n/* open", ["a"]),
+}
+
+
+@pytest.mark.parametrize("sql, expected", CASES.values(), ids=CASES.keys())
+@pytest.mark.parametrize("chunk", [None, 1, 2, 3, 7])
+def test_tokenizer_edge_cases(sql, expected, chunk):
+    assert tables(sql, chunk) == expected
+
+
+def test_positions_are_one_based_lines_and_columns():
+    tokens = list(SqlTokenizer(["-- c\n  CREATE TABLE\n\t\"a\" (x int);"]))
+    assert tokens[0] == ("word", "CREATE", 2, 3)
+    assert tokens[2] == ("ident", "a", 3, 2)
+
+
+def test_replay_after_standard_backslash_string():
+    sql = ("CREATE TABLE users (id int PRIMARY KEY, dir text DEFAULT 'C:\\');\n"
+           "ALTER TABLE users ADD COLUMN email text;\n"
+           "CREATE UNIQUE INDEX users_email ON users (email);\n")
+    findings = []
+    for tokens, line, col in sql_statements(SqlTokenizer([sql])):
+        findings += [{**f, "file": "0001.sql", "line": line, "col": col} for f in parse_ddl(tokens)]
+    [users] = replay_schema(findings)
+    assert [c["name"] for c in users["columns"]] == ["id", "dir", "email"]
+    assert users["primary_key"] == ["id"]
+    assert users["indexes"] == [{"name": "users_email", "columns": ["email"], "unique": True}]
+
+
+def test_replay_applies_migrations_in_natural_filename_order():
+    def finding(file, **f):
+        return {"file": file, "line": 1, "col": 1, **f}
+
+    findings = [
+        finding("10_drop.sql", type="sql_alter_table", table_name="t",
+                actions=[{"op": "drop_column", "name": "b"}]),
+        finding("2_add.sql", type="sql_alter_table", table_name="t",
+                actions=[{"op": "add_column", "column": {"name": "b", "type": "int"},
+                          "primary_key": False, "unique": False}]),
+        finding("1_init.sql", type="sql_table", table_name="t",
+                columns=[{"name": "a", "type": "int"}]),
+    ]
+    [t] = replay_schema(findings)
+    assert t["columns"] == [{"name": "a", "type": "int"}]
+    assert t["files"] == ["1_init.sql", "2_add.sql", "10_drop.sql"]
+
+
+def ddl(sql):
+    """The findings each statement of sql makes."""
+    return [f for tokens, _, _ in sql_statements(SqlTokenizer([sql])) for f in parse_ddl(tokens)]
+
+
+def replay(*files):
+    """replay_schema over (filename, sql) pairs."""
+    findings = []
+    for rel, sql in files:
+        for tokens, line, col in sql_statements(SqlTokenizer([sql])):
+            findings += [{**f, "file": rel, "line": line, "col": col} for f in parse_ddl(tokens)]
+    return replay_schema(findings)
+
+
+def test_constraint_words_as_column_names():
+    [kv] = ddl("CREATE TABLE kv (key TEXT PRIMARY KEY, value BLOB, index varchar(10), "
+               "unique boolean, check int);")
+    assert [(c["name"], c["type"]) for c in kv["columns"]] == [
+        ("key", "TEXT"), ("value", "BLOB"), ("index", "varchar(10)"), ("unique", "boolean"),
+        ("check", "int")]
+    assert kv["primary_key"] == ["key"]
+    assert "indexes" not in kv
+
+
+def test_table_constraints():
+    [t] = ddl("CREATE TABLE IF NOT EXISTS t (a int, b int, KEY by_a (a), INDEX (b), "
+              "UNIQUE KEY ab USING BTREE (a, b), CONSTRAINT t_pk PRIMARY KEY (a), "
+              "FOREIGN KEY (b) REFERENCES u (id), CHECK (a > 0));")
+    assert t["if_not_exists"] is True
+    assert [c["name"] for c in t["columns"]] == ["a", "b"]
+    assert t["primary_key"] == ["a"]
+    assert t["primary_key_name"] == "t_pk"
+    assert t["indexes"] == [
+        {"name": "by_a", "columns": ["a"], "unique": False},
+        {"name": None, "columns": ["b"], "unique": False},
+        {"name": "ab", "columns": ["a", "b"], "unique": True},
+    ]
+
+
+def test_add_column_is_always_a_column():
+    [alter] = ddl("ALTER TABLE kv ADD COLUMN index TEXT, ADD COLUMN IF NOT EXISTS key int, "
+                  "ADD INDEX by_value (value);")
+    assert alter["actions"] == [
+        {"op": "add_column", "column": {"name": "index", "type": "TEXT"},
+         "primary_key": False, "unique": False},
+        {"op": "add_column", "column": {"name": "key", "type": "int"},
+         "primary_key": False, "unique": False},
+        {"op": "add_index", "index": {"name": "by_value", "columns": ["value"], "unique": False}},
+    ]
+
+
+def test_replay_rename_retype_and_drop_index():
+    [t] = replay(
+        ("0001_init.sql", "CREATE TABLE kv (key TEXT PRIMARY KEY, value BLOB);\n"
+                          "CREATE INDEX kv_value ON kv (value);\n"),
+        ("0002_alter.sql", "ALTER TABLE kv RENAME COLUMN value TO data;\n"
+                           "ALTER TABLE kv ALTER COLUMN data TYPE bytea;\n"
+                           "DROP INDEX IF EXISTS kv_value;\n"
+                           "ALTER TABLE kv RENAME TO store;\n"),
+        ("0003_again.sql", "CREATE TABLE IF NOT EXISTS store (other int);\n"),
+    )
+    assert t["table_name"] == "store"
+    assert t["columns"] == [{"name": "key", "type": "TEXT"}, {"name": "data", "type": "bytea"}]
+    assert t["primary_key"] == ["key"]
+    assert t["indexes"] == []
+    assert t["file"] == "0001_init.sql"
+    assert t["files"] == ["0001_init.sql", "0002_alter.sql"]
@@ -0,0 +1,89 @@
+import argparse
+import json
+from pathlib import Path
+
+import pytest
+
+import scan_infra
+from scanlib import StreamMismatch, read_stream, scan_repos, stream_mode, stream_path
+
+REPOS = [("a", "a"), ("b", "b"), ("c", "c")]
+
+
+def args(*argv):
+    parser = argparse.ArgumentParser()
+    scan_infra.add_stream_arguments(parser, Path("data/map.ndjson"))
+    scan_infra.add_since_argument(parser)
+    return parser.parse_args(argv)
+
+
+def interrupted(stream, mode, results):
+    """A stream as a run of mode leaves it when killed after results."""
+    with open(stream, "w") as f:
+        f.write(json.dumps({"mode": mode}) + "\n")
+        for name, result in results:
+            f.write(json.dumps({"repo": name, "result": result}) + "\n")
+        f.write('{"repo": "c", "res')
+
+
+def test_since_runs_default_to_their_own_stream():
+    assert stream_path(args("--resume"), Path("data/map.ndjson")) == Path("data/map.ndjson")
+    assert stream_path(args("--resume", "--since", "HEAD"), Path("data/map.ndjson")) \
+        == Path("data/map.since.ndjson")
+    assert stream_path(args(), Path("data/map.ndjson")) is None
+    assert stream_mode(args("--since", "HEAD~2")) == "since HEAD~2"
+    assert stream_mode(args()) == "full"
+
+
+def test_resume_skips_finished_repos_and_drops_torn_line(tmp_path):
+    stream = tmp_path / "map.ndjson"
+    interrupted(stream, "full", [("a", ["old"])])
+    scanned = []
+
+    def scan(path):
+        scanned.append(path)
+        return [path]
+
+    results = scan_repos(scan, REPOS, stream=stream, resume=True)
+    assert scanned == ["b", "c"]
+    assert results == {"a": ["old"], "b": ["b"], "c": ["c"]}
+
+
+def test_headerless_stream_resumes_as_full(tmp_path):
+    stream = tmp_path / "map.ndjson"
+    stream.write_text(json.dumps({"repo": "a", "result": ["old"]}) + "\n")
+    results = scan_repos(lambda path: [path], REPOS, stream=stream, resume=True)
+    assert results["a"] == ["old"]
+    with pytest.raises(StreamMismatch):
+        scan_repos(lambda path: [path], REPOS, stream=stream, resume=True, mode="since HEAD")
+
+
+def test_delta_stream_is_not_resumed_as_full(tmp_path):
+    stream = tmp_path / "map.ndjson"
+    interrupted(stream, "since HEAD", [("a", {"changed": [], "found": []})])
+    with pytest.raises(StreamMismatch):
+        scan_repos(lambda path: [path], REPOS, stream=stream, resume=True)
+
+
+def test_patch_result_over_resumed_delta_stream(tmp_path):
+    stream = tmp_path / "map.since.ndjson"
+    previous = {
+        "a": [{"type": "s3_bucket", "file": "x.ts"}, {"type": "s3_bucket", "file": "y.ts"}],
+        "b": [{"type": "sqs_queue", "file": "q.ts"}],
+        "c": [{"type": "sqs_queue", "file": "c.ts"}],
+    }
+    interrupted(stream, "since HEAD", [("a", {"changed": ["x.ts"],
+                                              "found": [{"type": "kv_namespace", "file": "x.ts"}]})])
+
+    def scan(path):
+        return {"changed": ["q.ts"], "found": []} if path == "b" else None
+
+    deltas = scan_repos(scan, REPOS, stream=stream, resume=True, mode="since HEAD")
+    patched = {name: scan_infra.patch_result(previous.get(name), deltas.get(name))
+               for name, _ in REPOS}
+    assert patched == {
+        "a": [{"type": "s3_bucket", "file": "y.ts"}, {"type": "kv_namespace", "file": "x.ts"}],
+        "b": [],
+        "c": [{"type": "sqs_queue", "file": "c.ts"}],
+    }
+    assert [name for name, _ in read_stream(stream)] == ["a", "b", "c"]
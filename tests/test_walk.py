@@ -0,0 +1,58 @@
+import scan_infra
+from scanlib import GitIgnore, PathSpec, WorkTree, walk_repo
+
+
+def write(root, files):
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def test_gitignore_nested_files_negation_and_dir_only(tmp_path):
+    write(tmp_path, {".gitignore": "build/\n*.log\nout\n!keep.log\n", "pkg/.gitignore": "/gen\n!out\n"})
+    ignore = GitIgnore(tmp_path)
+    assert ignore.ignored("build", is_dir=True)
+    assert not ignore.ignored("build")              # dir-only pattern, checked as a file
+    assert ignore.ignored("a/b/x.log")
+    assert not ignore.ignored("keep.log")
+    assert ignore.ignored("pkg/gen", is_dir=True)
+    assert not ignore.ignored("pkg/sub/gen", is_dir=True)  # anchored to pkg/
+    assert ignore.ignored("out", is_dir=True)
+    assert not ignore.ignored("pkg/out", is_dir=True)      # deeper file re-includes
+
+
+def test_walk_prunes_ignored_and_skipped_dirs_in_sorted_order(tmp_path):
+    write(tmp_path, {rel: "" for rel in ["b.js", "a.js", "dist/x.js", "node_modules/y.js",
+                                          "src/c.js", "src/z/d.js", ".env"]})
+    (tmp_path / ".gitignore").write_text("dist/\n")
+    rels = [rel for _, rel, _ in walk_repo(tmp_path, {"node_modules"})]
+    assert rels == [".env", ".gitignore", "a.js", "b.js", "src/c.js", "src/z/d.js"]
+
+
+def test_rglob_skips_ignored_directories(tmp_path):
+    write(tmp_path, {".gitignore": "/generated\n", "generated/wrangler.toml": "",
+                     "apps/web/wrangler.toml": "", "wrangler.toml": ""})
+    found = [str(p) for p in WorkTree(tmp_path).rglob("wrangler.toml")]
+    assert found == ["wrangler.toml", "apps/web/wrangler.toml"]
+
+
+def test_pathspec_anchoring_and_double_star():
+    spec = PathSpec(["sst.config.*", "stacks/**/*.ts", "/cdk/?.js", "lib/[ab].ts"])
+    assert spec.match("sst.config.ts")
+    assert spec.match("apps/web/sst.config.js")
+    assert spec.match("stacks/Api.ts")
+    assert spec.match("stacks/a/b/Api.ts")
+    assert not spec.match("infra/stacks/Api.ts")
+    assert not spec.match("stacks/Api.js")
+    assert spec.match("cdk/a.js") and not spec.match("cdk/ab.js")
+    assert spec.match("lib/b.ts") and not spec.match("lib/c.ts")
+
+
+def test_sst_scanner_picks_files_from_one_walk(tmp_path):
+    write(tmp_path, {rel: "" for rel in ["sst.config.ts", "stacks/Api.ts", "stacks/deep/Db.js",
+                                          "infra/Queue.ts", "src/stacks/Api.ts", "stacks/README.md"]})
+    tree = WorkTree(tmp_path)
+    picked = [rel for rel, fname in tree.files(set())
+              if scan_infra.scan_sst_config in scan_infra.scanners_for(rel, fname)]
+    assert picked == ["sst.config.ts", "infra/Queue.ts", "stacks/Api.ts", "stacks/deep/Db.js"]
@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+import scan_infra
+from scanlib import LineIndex, Rule, RuleSet, WorkTree, windows
+
+
+def test_line_index_with_window_offsets():
+    shifted = LineIndex("xy\nz", line0=3, col0=5)
+    assert shifted.at(1) == {"line": 4, "col": 7}
+    assert shifted.at(3) == {"line": 5, "col": 1}
+
+
+def test_windows_cover_the_stream_with_overlap():
+    text = "".join(f"line {n}\n" for n in range(200))
+    chunks = [text[i:i + 37] for i in range(0, len(text), 37)]
+    ws = list(windows(chunks, 300, 50))
+    assert ws[-1].last and not any(w.last for w in ws[:-1])
+    assert all(text[w.start:w.start + len(w.text)] == w.text for w in ws)
+    assert all(b.start == a.start + 250 for a, b in zip(ws, ws[1:]))
+    for w in ws:
+        assert LineIndex(w.text, w.line0, w.col0).at(0) == LineIndex(text).at(w.start)
+
+
+def test_short_stream_is_one_window():
+    [w] = windows(["abc", "def"], 100, 10)
+    assert (w.text, w.start, w.last) == ("abcdef", 0, True)
+
+
+def test_windowed_run_matches_whole_run():
+    rule = Rule("call", "calls", ["fetch("], r"fetch\((\w+)\)", lambda m, ctx: {"name": m.group(1)},
+                span=64)
+    rules = RuleSet([rule])
+    text = "".join(f"// {n}\nfetch(u{n})\n" for n in range(300))
+    whole = defaultdict(list)
+    rules.run(text, "a.js", whole)
+    windowed = defaultdict(list)
+    rules.run_windows([text[i:i + 100] for i in range(0, len(text), 100)], "a.js", windowed, 700)
+    assert windowed == whole
+    assert len(whole["calls"]) == 300
+
+
+def test_terraform_past_the_read_limit_is_scanned_whole(tmp_path):
+    filler = "# " + "x" * 78 + "\n"
+    body = filler * (scan_infra.READ_LIMIT // len(filler) + 10)
+    (tmp_path / "main.tf").write_text(
+        f'resource "aws_s3_bucket" "first" {{}}\n{body}resource "aws_s3_bucket" "last" {{}}\n')
+    found = scan_infra.scan_terraform(WorkTree(tmp_path), "main.tf")
+    assert [(f["name"], f["line"]) for f in found] == [("first", 1), ("last", body.count("\n") + 2)]
@@ -0,0 +1,68 @@
+from scanlib import SCAN_STATS, WranglerConfig
+
+JSONC = """{
+  // the worker
+  "name": "w",
+  "main": "src/index.js",
+  "vars": {"MODE": "prod", /* trailing */ },
+  "r2_buckets": [
+    {"binding": "CARS", "bucket_name": "cars"}, // the only one
+  ],
+  "env": {
+    "staging": {"r2_buckets": [{"binding": "CARS", "bucket_name": "cars-staging"},]}, /* last */
+  },
+  "routes": ["a.example.com/*"], // note
+}
+"""
+
+TOML = """name = "w"
+main = "src/index.js"
+
+[[r2_buckets]]
+binding = "CARS"
+bucket_name = "cars"
+
+[env.staging]
+name = "w-stage"
+
+[[env.staging.r2_buckets]]
+binding = "CARS"
+bucket_name = "cars-staging"
+"""
+
+
+def test_jsonc_with_comments_after_trailing_commas():
+    SCAN_STATS.clear()
+    config = WranglerConfig("wrangler.jsonc", JSONC)
+    assert "wrangler_parse_error" not in SCAN_STATS
+    assert config.worker() == "w"
+    assert config.worker("staging") == "w-staging"
+    assert list(config.vars()) == [("MODE", "prod", None, JSONC.index('MODE'))]
+    assert [(b.env, b.fields["bucket_name"]) for b in config.bindings()] == [
+        (None, "cars"), ("staging", "cars-staging")]
+    [(pattern, custom, pos)] = config.routes()
+    assert (pattern, custom, config.at(pos)["line"]) == ("a.example.com/*", False, 12)
+
+
+def test_comment_markers_inside_strings_are_kept():
+    config = WranglerConfig("wrangler.json", '{"name": "w", "main": "a//b,/*c*/.js",}')
+    assert config.main() == "a//b,/*c*/.js"
+
+
+def test_toml_environments_and_positions():
+    config = WranglerConfig("wrangler.toml", TOML)
+    assert config.envs() == [None, "staging"]
+    assert config.worker("staging") == "w-stage"
+    assert config.main("staging") is None
+    bindings = list(config.bindings())
+    assert [(b.env, b.fields["bucket_name"]) for b in bindings] == [
+        (None, "cars"), ("staging", "cars-staging")]
+    assert [config.at(b.pos)["line"] for b in bindings] == [4, 11]
+
+
+def test_unparseable_config_is_counted_and_empty():
+    SCAN_STATS.clear()
+    config = WranglerConfig("wrangler.json", '{"name": ')
+    assert SCAN_STATS["wrangler_parse_error"] == 1
+    assert config.worker() is None and list(config.bindings()) == []
+    SCAN_STATS.clear()
@@ -3,13 +3,15 @@
 
 Layer 5 of the knowledge system — answers structural questions that require
 joining data across the 3 scanner JSON files (api-surface-map, infrastructure-map,
-product-map).
+product-map), plus import-graph for `changes`.
 
 Usage:
     python tools/query.py capability blob/add
     python tools/query.py capability --repo upload-service
     python tools/query.py impact indexing-service
     python tools/query.py impact @storacha/capabilities
+    python tools/query.py changes upload-service/packages/capabilities/src/blob.js
+    python tools/query.py changes --git origin/main...HEAD
     python tools/query.py infra freeway
     python tools/query.py infra --type dynamodb
     python tools/query.py graph upload-service
@@ -19,11 +21,13 @@ Usage:
 """
 
 import json
+import subprocess
 import sys
 from collections import defaultdict
 from pathlib import Path
 
 BASE = Path(__file__).resolve().parent.parent / "data"
+PROJECT_ROOT = BASE.parent.parent  # repos are siblings of aidev/
 
 # ---------------------------------------------------------------------------
 # Data loading & index building
@@ -47,11 +51,25 @@ def build_indexes(api, infra, product):
     for c in api.get("capability_catalog", []):
         ix["repo_caps"][c["repo"]].append(c)
 
+    # repo -> raw API findings, by result key
+    ix["api_per_repo"] = api.get("per_repo", {})
+
     # repo -> capability handlers
     ix["repo_handlers"] = {}
     for repo, data in api.get("per_repo", {}).items():
         ix["repo_handlers"][repo] = data.get("capability_handlers", [])
 
+    # can -> handlers, by the can the scanner resolved each handler's ref to;
+    # the rest are matched on their ref text at query time
+    ix["cap_handlers"] = defaultdict(list)
+    ix["unresolved_handlers"] = []
+    for repo, hs in ix["repo_handlers"].items():
+        for h in hs:
+            if h.get("can"):
+                ix["cap_handlers"][h["can"]].append({"repo": repo, **h})
+            else:
+                ix["unresolved_handlers"].append({"repo": repo, **h})
+
     # repo -> ucanto connections (outbound service calls)
     ix["repo_connections"] = {}
     for repo, data in api.get("per_repo", {}).items():
@@ -72,6 +90,15 @@ def build_indexes(api, infra, product):
         ix["graph_from"][e["from"]].append(e)
         ix["graph_to"][e["to"]].append(e)
 
+    # can -> ucanto edges invoking it
+    ix["cap_edges"] = defaultdict(list)
+    ix["unresolved_edges"] = []
+    for e in ix["graph_edges"]:
+        if e.get("can"):
+            ix["cap_edges"][e["can"]].append(e)
+        else:
+            ix["unresolved_edges"].append(e)
+
     # infra summary: category -> {resource -> [repos]}
     ix["infra_summary"] = infra.get("summary", {})
 
@@ -133,6 +160,13 @@ def build_indexes(api, infra, product):
 # Query implementations
 # ---------------------------------------------------------------------------
 
+def _where(finding):
+    """file:line when the scanner recorded a location, else just the file."""
+    if "line" in finding:
+        return f"{finding['file']}:{finding['line']}"
+    return finding["file"]
+
+
 def query_capability(ix, args):
     """Look up a capability or list capabilities for a repo."""
     if "--repo" in args:
@@ -160,28 +194,26 @@ def _cap_by_name(ix, cap_name):
     lines.append("|------|--------|------|------|")
     for d in defs:
         w = d.get("with", "")[:40]
-        lines.append(f"| {d['repo']} | {d['export_name']} | `{w}` | `{d['file']}` |")
+        lines.append(f"| {d['repo']} | {d['export_name']} | `{w}` | `{_where(d)}` |")
 
-    # Find handlers
-    handlers = []
-    for repo, hs in ix["repo_handlers"].items():
-        for h in hs:
-            ref = h.get("capability_ref", "")
-            # Match: exact cap name in ref, or export_name in ref
-            if cap_name in ref or any(d["export_name"] in ref for d in defs):
-                handlers.append({"repo": repo, **h})
+    # Find handlers: joined on the can the scanner resolved their ref to, or
+    # for refs it couldn't resolve, by the capability or export name in the ref
+    cans = list(dict.fromkeys(d["can"] for d in defs))
+    handlers = [h for can in cans for h in ix["cap_handlers"].get(can, [])]
+    handlers += [h for h in ix["unresolved_handlers"]
+                 if _names_capability(h.get("capability_ref", ""), cap_name, defs)]
 
     if handlers:
         lines.append("\n### Handled by\n")
         lines.append("| Repo | Pattern | Capability Ref | File |")
         lines.append("|------|---------|---------------|------|")
         for h in handlers:
-            lines.append(f"| {h['repo']} | {h['pattern']} | {h['capability_ref']} | `{h['file']}` |")
+            lines.append(f"| {h['repo']} | {h['pattern']} | {h['capability_ref']} | `{_where(h)}` |")
 
     # Find service graph edges involving this capability
-    edges = [e for e in ix["graph_edges"]
-             if cap_name in e.get("capability", "") or
-             any(d["export_name"] in e.get("capability", "") for d in defs)]
+    edges = [e for can in cans for e in ix["cap_edges"].get(can, [])]
+    edges += [e for e in ix["unresolved_edges"]
+              if _names_capability(e.get("capability", ""), cap_name, defs)]
     if edges:
         lines.append("\n### Service Graph Edges\n")
         lines.append("| From | To | Via | Capability |")
@@ -192,6 +224,11 @@ def _cap_by_name(ix, cap_name):
     return "\n".join(lines)
 
 
+def _names_capability(ref, cap_name, defs):
+    """Whether an unresolved ref mentions the capability or one of its exports."""
+    return cap_name in ref or any(d["export_name"] in ref for d in defs)
+
+
 def _cap_by_repo(ix, repo):
     lines = [f"## Capabilities for repo: `{repo}`\n"]
 
@@ -201,15 +238,16 @@ def _cap_by_repo(ix, repo):
         lines.append("| Capability | Export | File |")
         lines.append("|-----------|--------|------|")
         for c in caps:
-            lines.append(f"| `{c['can']}` | {c['export_name']} | `{c['file']}` |")
+            lines.append(f"| `{c['can']}` | {c['export_name']} | `{_where(c)}` |")
 
     handlers = ix["repo_handlers"].get(repo, [])
     if handlers:
         lines.append("\n### Handlers\n")
-        lines.append("| Pattern | Capability Ref | File |")
-        lines.append("|---------|---------------|------|")
+        lines.append("| Pattern | Capability Ref | Capability | File |")
+        lines.append("|---------|---------------|------------|------|")
         for h in handlers:
-            lines.append(f"| {h.get('pattern', '')} | {h.get('capability_ref', '')} | `{h.get('file', '?')}` |")
+            can = f"`{h['can']}`" if h.get("can") else ""
+            lines.append(f"| {h.get('pattern', '')} | {h.get('capability_ref', '')} | {can} | `{h.get('file', '?')}` |")
 
     conns = ix["repo_connections"].get(repo, [])
     if conns:
@@ -335,7 +373,7 @@ def _impact_repo(ix, repo, lines):
         for r in infra:
             by_type[r["type"]].append(r)
         for t, resources in sorted(by_type.items()):
-            names = [r.get("name") or r.get("driver") or r.get("table_name") or "?" for r in resources]
+            names = [r.get("name") or r.get("driver") or r.get("table_name") or r.get("index_name") or "?" for r in resources]
             lines.append(f"- **{t}** ({len(resources)}): {', '.join(names[:5])}" +
                         (f" +{len(names)-5} more" if len(names) > 5 else ""))
         lines.append("")
@@ -353,6 +391,206 @@ def _impact_repo(ix, repo, lines):
     return "\n".join(lines)
 
 
+def query_changes(ix, args):
+    """Show what a set of changed files reaches: findings, capabilities, repos."""
+    repo, rng, paths = None, None, []
+    it = iter(args)
+    for a in it:
+        if a == "--repo":
+            repo = next(it, None)
+        elif a == "--git":
+            rng = next(it, None)
+        else:
+            paths.append(a)
+    if rng:
+        try:
+            repo, diffed = _git_changed(repo, rng)
+        except (OSError, subprocess.CalledProcessError) as e:
+            return f"git diff failed: {e}"
+        paths += diffed
+    if repo:
+        changed = [(repo, p) for p in paths]
+    else:
+        changed = [tuple(p.split("/", 1)) for p in paths if "/" in p]
+    if not changed:
+        return "No changed files."
+
+    graph = _load_import_graph()
+    affected = _reach(graph, changed)
+    findings = _findings_in(ix, affected)
+
+    n_repos = len({r for r, _ in changed})
+    lines = [f"## Change Impact: {len(changed)} changed files in {n_repos} repos\n"]
+    via_imports = len(affected) - len(set(changed))
+    lines.append(f"**Affected files:** {len(affected)} ({via_imports} through imports)")
+    if not graph:
+        lines.append("_No import-graph.json: only the changed files themselves were checked._")
+    lines.append("")
+
+    # Capabilities defined in affected files, and everything handling or invoking them
+    cans = list(dict.fromkeys(c["can"] for _, c in findings["capabilities"]))
+    handlers = findings["capability_handlers"] + [
+        (h["repo"], h) for can in cans for h in ix["cap_handlers"].get(can, [])]
+    handlers = list({(r, h["file"], h.get("line")): (r, h) for r, h in handlers}.values())
+    edges = [e for can in cans for e in ix["cap_edges"].get(can, [])]
+
+    if cans:
+        lines.append(f"### Capability definitions ({len(cans)})\n")
+        lines.append("| Capability | Repo | File |")
+        lines.append("|-----------|------|------|")
+        for r, c in findings["capabilities"]:
+            lines.append(f"| `{c['can']}` | {r} | `{_where(c)}` |")
+        lines.append("")
+    if handlers:
+        lines.append(f"### Capability handlers ({len(handlers)})\n")
+        lines.append("| Capability | Repo | Pattern | File |")
+        lines.append("|-----------|------|---------|------|")
+        for r, h in handlers:
+            cap = f"`{h['can']}`" if h.get("can") else h.get("capability_ref") or h.get("factory_name", "")
+            lines.append(f"| {cap} | {r} | {h['pattern']} | `{_where(h)}` |")
+        lines.append("")
+    if findings["routes"] or findings["entry_points"]:
+        lines.append("### Routes and entry points\n")
+        for r, f in findings["routes"]:
+            lines.append(f"- {r}: {f['method']} {f['path']} ({f['framework']}) `{_where(f)}`")
+        for r, f in findings["entry_points"]:
+            lines.append(f"- {r}: [{f['type']}] `{_where(f)}`")
+        lines.append("")
+    calls = findings["ucanto_connections"] + findings["http_service_calls"] + \
+        findings["queue_sends"] + findings["go_service_calls"]
+    if calls or edges:
+        lines.append("### Service calls and graph edges\n")
+        for r, f in calls:
+            target = (f.get("can") or f.get("capability") or f.get("queue_binding") or f.get("binding")
+                      or f.get("url_ref") or f.get("url") or f.get("target_url") or f.get("target_id")
+                      or f.get("connection_var") or f.get("url_expr") or f.get("path") or "")
+            lines.append(f"- {r}: {f['type']} {target} `{_where(f)}`")
+        for e in edges:
+            lines.append(f"- {e['from']} → {e['to']} via {e['via']} ({e.get('can', '')})")
+        lines.append("")
+    if findings["infra"] or findings["wrangler_routes"]:
+        lines.append("### Infrastructure bindings\n")
+        for r, f in findings["infra"]:
+            name = (f.get("name") or f.get("table_name") or f.get("binding") or f.get("package")
+                    or f.get("var") or "?")
+            lines.append(f"- {r}: {f['type']} {name} `{f['file']}`")
+        for r, f in findings["wrangler_routes"]:
+            name = f.get("hostname") or f.get("pattern") or f.get("main") or "?"
+            lines.append(f"- {r}: {f['type']} {name} `{f['file']}`")
+        lines.append("")
+
+    repos = {r for r, _ in affected} | {r for r, _ in handlers} | {e["from"] for e in edges}
+    lines.append(f"### Affected repos ({len(repos)})\n")
+    for r in sorted(repos):
+        product = ix["repo_product"].get(r)
+        lines.append(f"- {r}" + (f" ({product})" if product else ""))
+
+    rdeps = set().union(*(ix["repo_rdeps"].get(r, set()) for r in repos)) - repos
+    if rdeps:
+        lines.append(f"\n### Depended on by ({len(rdeps)} repos)\n")
+        lines.append(", ".join(sorted(rdeps)))
+    downstream = [d for d in ix["downstream"] if repos & _noted_repos(d)]
+    if downstream:
+        lines.append("\n### Downstream consumers at risk\n")
+        for d in downstream:
+            lines.append(f"- **{d['repo']}** ({d['product']}): {d['note']}")
+
+    return "\n".join(lines)
+
+
+def _git_changed(repo, rng):
+    """(repo, [paths]) changed in a git range, in --repo's checkout or the current one."""
+    cwd = PROJECT_ROOT / repo if repo else None
+    if repo is None:
+        top = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=cwd,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        repo = Path(top).name
+    out = subprocess.run(["git", "diff", "--name-only", rng], cwd=cwd,
+                         capture_output=True, text=True, check=True).stdout
+    return repo, [p for p in out.splitlines() if p]
+
+
+def _load_import_graph():
+    """per_repo of import-graph.json, or {} if scan_imports.py hasn't been run."""
+    try:
+        return load_json("import-graph.json").get("per_repo", {})
+    except FileNotFoundError:
+        return {}
+
+
+def _reach(graph, changed):
+    """Changed (repo, file) pairs plus every file that imports one, transitively.
+
+    Crosses repos through packages: a file inside a repo's npm package or Go
+    module reaches the files of other repos that import that package.
+    """
+    importers = {}
+    consumers = None
+    package_consumers = {}
+    seen = dict.fromkeys(changed)
+    todo = list(changed)
+    while todo:
+        repo, rel = todo.pop()
+        g = graph.get(repo)
+        if g is None:
+            continue
+        if repo not in importers:
+            importers[repo] = defaultdict(list)
+            for src, targets in g["imports"].items():
+                for t in targets:
+                    importers[repo][t].append(src)
+        nxt = [(repo, src) for src in importers[repo].get(rel, [])]
+        package = _owning_package(g.get("packages", {}), rel)
+        if package is not None:
+            if consumers is None:
+                consumers = defaultdict(list)
+                for r, other in graph.items():
+                    for src, pkgs in other["external"].items():
+                        for p in pkgs:
+                            consumers[p].append((r, src))
+            if package not in package_consumers:
+                package_consumers[package] = [c for p, cs in consumers.items()
+                                              if p == package or p.startswith(package + "/")
+                                              for c in cs]
+            nxt += [c for c in package_consumers[package] if c[0] != repo]
+        for item in nxt:
+            if item not in seen:
+                seen[item] = None
+                todo.append(item)
+    return list(seen)
+
+
+def _owning_package(packages, rel):
+    """Name of the innermost package whose directory holds rel, or None."""
+    best = None
+    for name, d in packages.items():
+        if (not d or rel.startswith(d + "/")) and (best is None or len(d) > len(packages[best])):
+            best = name
+    return best
+
+
+def _findings_in(ix, affected):
+    """{key: [(repo, finding)]} for the API and infra findings in the affected files."""
+    wanted = defaultdict(set)
+    for repo, rel in affected:
+        wanted[repo].add(rel)
+    found = defaultdict(list)
+    for repo, files in wanted.items():
+        for key, items in ix["api_per_repo"].get(repo, {}).items():
+            for f in items:
+                if isinstance(f, dict) and f.get("file") in files:
+                    found[key].append((repo, f))
+        for f in ix["infra_repo"].get(repo, []):
+            if f.get("file") in files:
+                found["infra"].append((repo, f))
+    return found
+
+
+def _noted_repos(consumer):
+    """The repos a downstream consumer's note says it depends on."""
+    return {r.strip() for r in consumer.get("note", "").split(":", 1)[-1].split(",")}
+
+
 def query_infra(ix, args):
     """Show infrastructure for a repo or filter by type."""
     if "--type" in args:
@@ -369,16 +607,18 @@ def _infra_by_repo(ix, repo):
     if not resources:
         return f"No infrastructure found for repo `{repo}`."
 
+    # SQL statements are shown replayed, under SQL Tables below
     by_type = defaultdict(list)
     for r in resources:
-        by_type[r["type"]].append(r)
+        if not r["type"].startswith("sql_"):
+            by_type[r["type"]].append(r)
 
     for t in sorted(by_type):
         lines.append(f"### {t} ({len(by_type[t])})\n")
         lines.append("| Name | File |")
         lines.append("|------|------|")
         for r in by_type[t]:
-            name = r.get("name") or r.get("driver") or r.get("table_name") or "?"
+            name = r.get("name") or r.get("driver") or r.get("table_name") or r.get("index_name") or "?"
             lines.append(f"| {name} | `{r.get('file', '?')}` |")
         lines.append("")
 
@@ -389,12 +629,25 @@ def _infra_by_repo(ix, repo):
         for s in schemas:
             cols = ", ".join(f"{c['name']} {c['type']}" for c in s.get("columns", []))
             lines.append(f"- **{s['table_name']}**: {cols}")
+            if s.get("primary_key"):
+                lines.append(f"  Primary key: {', '.join(s['primary_key'])}")
+            for index in s.get("indexes", []):
+                lines.append(f"  {_index_desc(index)}")
             lines.append(f"  File: `{s.get('file', '?')}`")
+            if len(s.get("files", [])) > 1:
+                lines.append(f"  Altered in: {', '.join(f'`{f}`' for f in s['files'][1:])}")
         lines.append("")
 
     return "\n".join(lines)
 
 
+def _index_desc(index):
+    """An index of a replayed SQL schema, e.g. "Unique index users_email (email)"."""
+    kind = "Unique index" if index.get("unique") else "Index"
+    name = f" {index['name']}" if index.get("name") else ""
+    return f"{kind}{name} ({', '.join(index.get('columns', []))})"
+
+
 def _infra_by_type(ix, infra_type):
     """Find all services using a given infra type (dynamodb, s3, redis, etc.)."""
     lines = [f"## Infrastructure type: `{infra_type}`\n"]
@@ -591,7 +844,7 @@ def query_repo(ix, args):
         lines.append(f"### Capabilities ({len(caps)} defined, {len(handlers)} handled)\n")
         if caps:
             for c in caps:
-                lines.append(f"- `{c['can']}` → `{c['file']}`")
+                lines.append(f"- `{c['can']}` → `{_where(c)}`")
         if handlers:
             lines.append("\n**Handlers:**")
             for h in handlers:
@@ -614,10 +867,11 @@ def query_repo(ix, args):
     if infra:
         by_type = defaultdict(list)
         for r in infra:
-            by_type[r["type"]].append(r)
+            if not r["type"].startswith("sql_"):
+                by_type[r["type"]].append(r)
         lines.append(f"### Infrastructure ({len(infra)} resources)\n")
         for t in sorted(by_type):
-            names = [r.get("name") or r.get("driver") or r.get("table_name") or "?" for r in by_type[t]]
+            names = [r.get("name") or r.get("driver") or r.get("table_name") or r.get("index_name") or "?" for r in by_type[t]]
             lines.append(f"- **{t}**: {', '.join(names)}")
         lines.append("")
 
@@ -627,7 +881,8 @@ def query_repo(ix, args):
         lines.append(f"### SQL Tables ({len(schemas)})\n")
         for s in schemas:
             cols = ", ".join(f"{c['name']} {c['type']}" for c in s.get("columns", []))
-            lines.append(f"- **{s['table_name']}**: {cols}")
+            pk = f" (PK: {', '.join(s['primary_key'])})" if s.get("primary_key") else ""
+            lines.append(f"- **{s['table_name']}**: {cols}{pk}")
 
     # Published packages
     publishes = info.get("publishes", [])
@@ -646,6 +901,8 @@ def query_repo(ix, args):
 COMMANDS = {
     "capability": ("capability <name> | --repo <repo>", query_capability),
     "impact": ("impact <repo-or-package>", query_impact),
+    "changes": ("changes <repo>/<file>... | --repo <repo> <file>... | [--repo <repo>] --git <range>",
+                query_changes),
     "infra": ("infra <repo> | --type <type>", query_infra),
     "graph": ("graph <repo> | --from <a> --to <b>", query_graph),
     "product": ("product <name>", query_product),